@@ -0,0 +1,88 @@
+"""
+In-process LRU cache with TTL expiration used in front of PokemonService lookups
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class PokemonCache:
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        """
+        :param maxsize: maximal number of stored entries. Least recently used entries are evicted first.
+        :param ttl: number of seconds after which an entry expires. None means that entries never expire.
+        """
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return value stored under given key or None if it is missing or expired.
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and entry[0] is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        """
+        Store value under given key, evicting the least recently used entries if the cache is full.
+        """
+
+        if self.maxsize <= 0:
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *keys):
+        """
+        Remove given keys from the cache. Missing keys are ignored.
+        """
+
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Remove all entries and reset hit/miss counters.
+        """
+
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        :return: dictionary with hit/miss counters and the current size of the cache
+        """
+
+        with self._lock:
+            return dict(hits=self.hits, misses=self.misses, size=len(self._entries), maxsize=self.maxsize)
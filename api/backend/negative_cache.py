@@ -0,0 +1,114 @@
+"""
+Cache of names and ids confirmed to be missing in the external API
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from api.mongo import MissingPokemon
+
+
+class NegativeCache:
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 3600, persistent: bool = False):
+        """
+        :param maxsize: maximal number of names and ids kept in memory. Least recently added are evicted first.
+        :param ttl: number of seconds for which a name or id is considered missing
+        :param persistent: if True, missing names and ids are also stored in the database, so they survive restarts
+        and are shared by all processes
+        """
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.persistent = persistent
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key) -> bool:
+        """
+        Check if given name or id is known to be missing in the external API.
+        """
+
+        key = str(key)
+
+        with self._lock:
+            expires_at = self._entries.get(key)
+
+            if expires_at is not None and expires_at < time.time():
+                del self._entries[key]
+                expires_at = None
+
+        if expires_at is None and self.persistent:
+            missing = MissingPokemon.objects(id=key, expires_at__gt=datetime.utcnow()).first()
+
+            if missing:
+                expires_at = (missing.expires_at - datetime.utcnow()).total_seconds() + time.time()
+                self._remember(key, expires_at)
+
+        with self._lock:
+            if expires_at is None:
+                self.misses += 1
+                return False
+
+            self.hits += 1
+            return True
+
+    def add(self, key):
+        """
+        Remember given name or id as missing in the external API.
+        """
+
+        key = str(key)
+        self._remember(key, time.time() + self.ttl)
+
+        if self.persistent:
+            MissingPokemon.objects(id=key).update_one(set__expires_at=datetime.utcnow() + timedelta(seconds=self.ttl),
+                                                      upsert=True)
+
+    def discard(self, *keys):
+        """
+        Forget given names and ids, e.g. once they were saved to the database.
+        """
+
+        keys = [str(key) for key in keys]
+
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+        if self.persistent:
+            MissingPokemon.objects(id__in=keys).delete()
+
+    def clear(self):
+        """
+        Forget all names and ids kept in memory and reset hit/miss counters.
+        """
+
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        :return: dictionary with hit/miss counters and the number of names and ids kept in memory
+        """
+
+        with self._lock:
+            return dict(hits=self.hits, misses=self.misses, size=len(self._entries), maxsize=self.maxsize)
+
+    def _remember(self, key: str, expires_at: float):
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = expires_at
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
@@ -2,34 +2,149 @@
 Class which handles all operations within PokemonAPI queries
 """
 
-import json
 import logging
-from datetime import datetime
-from typing import List
+import re
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
 
-import requests
-from mongoengine.errors import FieldDoesNotExist, ValidationError
+from mongoengine import Q
+from mongoengine.errors import FieldDoesNotExist, ValidationError, NotUniqueError
+from pymongo import InsertOne, UpdateOne
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
-from api.mongo import Pokemon, Sprite, Encounter
-from api.utils.exceptions import NonExistingPokemon, InvalidPayload
+from api.backend import rollups
+from api.backend.cache import PokemonCache
+from api.backend.shared_cache import SQLitePokemonCache, RedisPokemonCache
+from api.backend.negative_cache import NegativeCache
+from api.backend.providers import LocalMirrorProvider, FallbackProvider
+from api.backend.refresh import Refresher
+from api.backend.single_flight import SingleFlight
+from api.backend.upstream import UpstreamClient
+from api.backend.write_behind import EncounterQueue
+from api.mongo import Pokemon, PokemonAlias, Sprite, Encounter, Version, EncounterRollup
+from api.utils import rate_limit
+from api.utils.exceptions import NonExistingPokemon, InvalidPayload, UpstreamUnavailable, RateLimited
+from api.utils.metrics import UPSTREAM_FETCHES, REFRESHES
+from api.utils.timing import span
 
 
 class PokemonService:
 
+    # Read-through cache of get_by_name/get_by_id results, replaced in init_app according to the app config
+    cache = PokemonCache()
+
+    # Names and ids which don't exist in the external API
+    negative_cache = NegativeCache()
+
+    # Coalesces concurrent external API fetches of the same Pokemon
+    single_flight = SingleFlight()
+
+    # Source of Pokemons missing in the database: pooled client of the external API, a local mirror or both
+    upstream = UpstreamClient()
+
+    # Maximal number of concurrent external API fetches of a single get_many call
+    batch_workers = 8
+
+    # Queue of accepted encounters written to the database in the background, None if encounters are saved directly
+    encounter_queue = None
+
+    # Functions called without arguments after Pokemons are saved, e.g. scheduling rebuild of the list snapshot
+    on_pokemons_saved = []
+
+    # Number of seconds after which stored Pokemons are refreshed from the external API, None if they never are
+    refresh_ttl = None
+    refresher = None
+
+    # Fields of encounters set by the server, which can't be posted by clients
+    SERVER_ENCOUNTER_FIELDS = ('id', '_id', 'pokemon_id', 'timestamp')
+
+    # Fields of stored Pokemons replaced by a refresh
+    REFRESHED_FIELDS = ('name', 'name_key', 'base_experience', 'height', 'weight', 'sprite_mask', 'sprite_overrides')
+
+    @staticmethod
+    def init_app(app):
+        """
+        Configure service components using settings from the Flask application config.
+        :param app: Flask application instance
+        """
+
+        if app.config['POKEMON_CACHE_BACKEND'] == 'sqlite':
+            PokemonService.cache = SQLitePokemonCache(app.config['POKEMON_CACHE_PATH'],
+                                                      maxsize=app.config['POKEMON_CACHE_SIZE'],
+                                                      ttl=app.config['POKEMON_CACHE_TTL'])
+        elif app.config['POKEMON_CACHE_BACKEND'] == 'redis':
+            PokemonService.cache = RedisPokemonCache.from_url(app.config['POKEMON_CACHE_URL'],
+                                                              ttl=app.config['POKEMON_CACHE_TTL'])
+        else:
+            PokemonService.cache = PokemonCache(maxsize=app.config['POKEMON_CACHE_SIZE'],
+                                                ttl=app.config['POKEMON_CACHE_TTL'])
+        PokemonService.negative_cache = NegativeCache(maxsize=app.config['POKEMON_NEGATIVE_CACHE_SIZE'],
+                                                      ttl=app.config['POKEMON_NEGATIVE_CACHE_TTL'],
+                                                      persistent=app.config['POKEMON_NEGATIVE_CACHE_PERSISTENT'])
+        PokemonService.single_flight = SingleFlight(lock_dir=app.config['POKEMON_FETCH_LOCK_DIR'])
+        PokemonService.upstream = UpstreamClient(base_url=app.config['POKEAPI_URL'],
+                                                 connect_timeout=app.config['POKEAPI_CONNECT_TIMEOUT'],
+                                                 read_timeout=app.config['POKEAPI_READ_TIMEOUT'],
+                                                 retries=app.config['POKEAPI_RETRIES'],
+                                                 backoff=app.config['POKEAPI_BACKOFF'],
+                                                 pool_size=app.config['POKEAPI_POOL_SIZE'],
+                                                 breaker_threshold=app.config['POKEAPI_BREAKER_THRESHOLD'],
+                                                 breaker_cooldown=app.config['POKEAPI_BREAKER_COOLDOWN'])
+
+        if app.config['POKEMON_MIRROR_PATH']:
+            mirror = LocalMirrorProvider(app.config['POKEMON_MIRROR_PATH'])
+            PokemonService.upstream = FallbackProvider(mirror, PokemonService.upstream) \
+                if app.config['POKEMON_MIRROR_FALLBACK'] else mirror
+        PokemonService.batch_workers = app.config['POKEMON_BATCH_WORKERS']
+        PokemonService.on_pokemons_saved = []
+
+        if PokemonService.encounter_queue is not None:
+            PokemonService.encounter_queue.close()
+
+        PokemonService.encounter_queue = EncounterQueue(writer=PokemonService.save_encounters,
+                                                        maxsize=app.config['ENCOUNTER_QUEUE_SIZE'],
+                                                        batch_size=app.config['ENCOUNTER_QUEUE_BATCH_SIZE'],
+                                                        workers=app.config['ENCOUNTER_QUEUE_WORKERS']) \
+            if app.config['ENCOUNTER_WRITE_BEHIND'] else None
+
+        if PokemonService.refresher is not None:
+            PokemonService.refresher.close()
+
+        PokemonService.refresh_ttl = app.config['POKEMON_REFRESH_TTL']
+        PokemonService.refresher = Refresher(refresh=PokemonService.refresh_pokemon,
+                                             workers=app.config['POKEMON_REFRESH_WORKERS'],
+                                             max_pending=app.config['POKEMON_REFRESH_QUEUE_SIZE']) \
+            if PokemonService.refresh_ttl is not None else None
+
     @staticmethod
     def get_by_name(pokemon_name: str) -> Pokemon:
         """
         Searching database for Pokemon with given name value. Raise NonExistingPokemon error if not found.
+        Names are compared in their normalized form (see Pokemon.normalize_name), and aliases are resolved as well.
+        Results are kept in PokemonService.cache until they expire or the Pokemon is modified.
         :param pokemon_name: name of Pokemon that needs to be returned
         :return: Pokemon Object with given name
         """
 
-        pokemon = Pokemon.objects.exclude("encounters").filter(name=pokemon_name).first()
+        name_key = Pokemon.normalize_name(pokemon_name)
+        key = ('name', name_key)
+        pokemon = PokemonService.cache.get(key)
 
-        if not pokemon:
-            raise NonExistingPokemon
+        if pokemon is None:
+            pokemon = PokemonService._find_many([name_key]).get(name_key)
+
+            if not pokemon:
+                raise NonExistingPokemon
 
-        return pokemon.to_mongo().to_dict()
+            PokemonService.cache.set(key, pokemon)
+
+        PokemonService._refresh_if_stale(pokemon)
+
+        return dict(pokemon)
 
     @staticmethod
     def get_by_id(pokemon_id: int) -> Pokemon:
@@ -39,85 +154,634 @@ class PokemonService:
         :return: Pokemon Object with given id
         """
 
-        pokemon = Pokemon.objects(id=pokemon_id).first()
+        # Documents are cached in their raw form, so every caller gets its own Pokemon instance
+        key = ('id', str(pokemon_id))
+        son = PokemonService.cache.get(key)
 
-        if not pokemon:
-            raise NonExistingPokemon
+        if son is None:
+            pokemon = Pokemon.objects(id=pokemon_id).first()
 
-        return pokemon
+            if not pokemon:
+                raise NonExistingPokemon
+
+            PokemonService.cache.set(key, pokemon.to_mongo().to_dict())
+            PokemonService._refresh_if_stale(pokemon.to_mongo())
+            return pokemon
+
+        PokemonService._refresh_if_stale(son)
+
+        return Pokemon._from_son(son)
 
     @staticmethod
-    def get_all_pokemons() -> List[dict]:
+    def get_many(pokemon_names_or_ids: List) -> List[dict]:
+        """
+        Resolve many Pokemons at once. Stored ones are found with a single database query, missing ones are fetched
+        from the external API concurrently.
+        :param pokemon_names_or_ids: list of names or ids of Pokemons
+        :return: list of dictionaries with 'query' (requested name or id), 'status' (200 if Pokemon was stored, 201 if
+        it was fetched, 404 if it doesn't exist, 429 if the client exceeded its external API rate limit, 503 if the
+        external API is unavailable) and 'pokemon' (Pokemon document or None) keys, in the order of given names and ids
+        """
+
+        # Names and ids are compared as strings, so 23 and '23' are resolved once
+        queries = {str(query): query for query in reversed(pokemon_names_or_ids)}
+        statuses = {}
+
+        pokemons = PokemonService._find_many(list(queries))
+        missing = [query for query in queries if query not in pokemons]
+
+        for pokemon in pokemons.values():
+            PokemonService._refresh_if_stale(pokemon)
+
+        def fetch(query):
+            try:
+                PokemonService.add_pokemon_from_external_api(queries[query])
+            except NonExistingPokemon:
+                statuses[query] = 404
+            except UpstreamUnavailable:
+                statuses[query] = 503
+            else:
+                statuses[query] = 201
+
+        # Fetches run outside of the request, so the external API budget of the client is checked here, for names and
+        # ids which aren't known to be missing
+        for query in list(missing):
+            if PokemonService._key(query) in PokemonService.negative_cache:
+                statuses[query] = 404
+                missing.remove(query)
+                continue
+
+            try:
+                rate_limit.check_upstream()
+            except RateLimited:
+                statuses[query] = 429
+                missing.remove(query)
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(len(missing), PokemonService.batch_workers)) as executor:
+                list(executor.map(fetch, missing))
+
+            pokemons.update(PokemonService._find_many([query for query in missing if statuses[query] == 201]))
+
+        return [dict(query=query, status=statuses.get(str(query), 200), pokemon=pokemons.get(str(query)))
+                for query in pokemon_names_or_ids]
+
+    @staticmethod
+    def _find_many(queries: List[str]) -> dict:
+        """
+        Find stored Pokemons by names, aliases or ids with a single database query, plus one more for aliases of
+        names which weren't found.
+        :param queries: names or ids (as strings) of Pokemons
+        :return: dictionary mapping given names and ids to found Pokemon documents
+        """
+
+        keys = {query: PokemonService._key(query) for query in queries}
+        ids = [int(key) for key in keys.values() if PokemonService._is_id(key)]
+        names = [key for key in keys.values() if not PokemonService._is_id(key)]
+
+        if not ids and not names:
+            return {}
+
+        # Documents saved before name_key was introduced are still found by their name, until they are backfilled
+        found = {}
+        for pokemon in Pokemon.objects(Q(id__in=ids) | Q(name_key__in=names) | Q(name__in=names)).as_pymongo():
+            found[str(pokemon['_id'])] = found[pokemon.get('name_key', pokemon['name'])] = pokemon
+
+        aliases = {alias['_id']: alias['pokemon_id'] for alias in
+                   PokemonAlias.objects(id__in=[name for name in names if name not in found]).as_pymongo()}
+        if aliases:
+            by_id = {pokemon['_id']: pokemon for pokemon in Pokemon.objects(id__in=list(aliases.values())).as_pymongo()}
+            found.update({alias: by_id[pokemon_id] for alias, pokemon_id in aliases.items() if pokemon_id in by_id})
+
+        return {query: found[key] for query, key in keys.items() if key in found}
+
+    @staticmethod
+    def _key(query: str) -> str:
+        """
+        :return: id or normalized name of the Pokemon, by which it's stored, fetched and cached
+        """
+
+        key = query.strip()
+        return key if PokemonService._is_id(key) else Pokemon.normalize_name(key)
+
+    @staticmethod
+    def _is_id(key: str) -> bool:
+        # str.isdigit accepts also digits like '²', which int() can't parse
+        return re.fullmatch(r'\d+', key, re.ASCII) is not None
+
+    @staticmethod
+    def get_all_pokemons(limit: int = None, after_id: int = None, projection: dict = None) -> List[dict]:
         """
         Return all Pokemons saved in the database in a required format.
+        :param limit: maximal number of returned Pokemons, all of them are returned if not given
+        :param after_id: only Pokemons with id greater than given value are returned
+        :param projection: pymongo projection of returned fields, whole documents are returned if not given
         :return: Response object containing list of all Pokemon documents saved in the database
         """
 
-        return [pokemon.to_mongo().to_dict() for pokemon in Pokemon.objects()]
+        return list(PokemonService.iter_pokemons(limit=limit, after_id=after_id, projection=projection))
+
+    @staticmethod
+    def iter_pokemons(limit: int = None, after_id: int = None, batch_size: int = 500,
+                      projection: dict = None) -> Iterator[dict]:
+        """
+        Lazily iterate over Pokemons ordered by id.
+        Documents are pulled from the database cursor in batches, so memory usage does not depend on catalog size.
+        They are read with pymongo directly, without building mongoengine documents.
+        :param limit: maximal number of returned Pokemons, all of them are returned if not given
+        :param after_id: only Pokemons with id greater than given value are returned
+        :param batch_size: number of documents fetched from the database in a single round trip
+        :param projection: pymongo projection of returned fields, whole documents are returned if not given
+        :return: iterator over raw Pokemon documents
+        """
+
+        query = {'_id': {'$gt': after_id}} if after_id is not None else {}
+        pokemons = Pokemon._get_collection().find(query, projection).sort('_id').batch_size(batch_size)
+
+        if limit is not None:
+            pokemons = pokemons.limit(limit)
+
+        return iter(pokemons)
 
     @staticmethod
-    def get_all_encounters(pokemon_id: int) -> List[dict]:
+    def get_all_encounters(pokemon_id: int, projection: dict = None) -> List[dict]:
         """
-        Return all encounters for given pokemon id.
+        Return all encounters for given pokemon id, ordered by their timestamp.
+        Raise NonExistingPokemon error if Pokemon with given id is not in the database.
+        :param projection: pymongo projection of returned fields, all fields except pokemon_id are returned if not
+        given
         :return: Response object containing list of encounter jsons
         """
-        return [encounter.to_mongo().to_dict() for encounter in PokemonService.get_by_id(pokemon_id).encounters]
+
+        pokemon_id = PokemonService._check_pokemon_exists(pokemon_id)
+
+        return list(Encounter._get_collection().find({'pokemon_id': pokemon_id}, projection or {'pokemon_id': 0})
+                    .sort('timestamp'))
+
+    @staticmethod
+    def get_encounter_stats(dimension: str, pokemon_id: int = None, since: int = None, until: int = None,
+                            limit: int = None) -> List[dict]:
+        """
+        Return encounter counters of given Pokemon, or of all Pokemons if pokemon_id is not given.
+        Raise NonExistingPokemon error if Pokemon with given id is not in the database.
+        :param dimension: 'place', 'hour' or 'day'
+        :param since: for hours and days, only periods ending after this timestamp are returned
+        :param until: for hours and days, only periods starting before this timestamp are returned
+        :param limit: maximal number of returned counters
+        :return: list of {'key', 'count'} dictionaries, places from the most frequent, hours and days chronologically
+        """
+
+        scope = EncounterRollup.GLOBAL if pokemon_id is None else str(PokemonService._check_pokemon_exists(pokemon_id))
+
+        return rollups.get_counts(scope, dimension, since=since, until=until, limit=limit)
+
+    @staticmethod
+    def _check_pokemon_exists(pokemon_id) -> int:
+        """
+        Raise NonExistingPokemon error if Pokemon with given id is neither cached nor in the database.
+        :return: id of the Pokemon as an integer
+        """
+
+        try:
+            pokemon_id = int(pokemon_id)
+        except ValueError:
+            raise NonExistingPokemon
+
+        if PokemonService.cache.get(('id', str(pokemon_id))) is None and \
+                not Pokemon._get_collection().count_documents({'_id': pokemon_id}, limit=1):
+            raise NonExistingPokemon
+
+        return pokemon_id
 
     @staticmethod
     def add_pokemon_from_external_api(pokemon_name_or_id: str) -> dict:
         """
-        Fetching pokemon object from https://pokeapi.co/api/v2/pokemon/{pokemon_name} API.
-        If its exists -> save it to the database, if not, raise NonExistingPokemon error.
+        Fetching pokemon object from PokemonService.upstream, https://pokeapi.co/api/v2/pokemon/{pokemon_name} API
+        or its local mirror. If its exists -> save it to the database, if not, raise NonExistingPokemon error.
+        Raise UpstreamUnavailable error if the API can't be reached.
+        Concurrent calls for the same name or id are coalesced, so only one of them reaches the external API
+        and the others wait for its outcome. Names and ids recently confirmed as missing are rejected without
+        calling the API. Names are normalized first, so all spellings of a name share a single fetch.
+        Raise RateLimited error if the current client exceeded its external API rate limit (see api.utils.rate_limit).
         :param pokemon_name_or_id: name of the pokemon that needs to be fetched
         """
 
-        url = f'https://pokeapi.co/api/v2/pokemon/{pokemon_name_or_id}/'
-        response = requests.get(url)
+        key = PokemonService._key(str(pokemon_name_or_id))
 
-        if response.status_code == 404:
+        if key in PokemonService.negative_cache:
             raise NonExistingPokemon
 
-        PokemonService.save_pokemon(pokemon=json.loads(response.content))
+        rate_limit.check_upstream()
+
+        started, outcome = time.perf_counter(), 'fetched'
+        try:
+            PokemonService.single_flight.do(key, PokemonService._fetch_and_save_pokemon, key)
+        except NonExistingPokemon:
+            outcome = 'not_found'
+            raise
+        except UpstreamUnavailable:
+            outcome = 'unavailable'
+            raise
+        finally:
+            UPSTREAM_FETCHES.labels(outcome=outcome).observe(time.perf_counter() - started)
+
+    @staticmethod
+    def _fetch_and_save_pokemon(pokemon_name_or_id: str):
+        """
+        Fetch Pokemon from the external API and save it, unless it was already saved by a call that finished
+        before this one started, e.g. in another process.
+        :param pokemon_name_or_id: id or normalized name of the pokemon that needs to be fetched
+        """
+
+        if PokemonService._find_many([pokemon_name_or_id]):
+            return
+
+        try:
+            pokemon = PokemonService.upstream.get_pokemon(pokemon_name_or_id)
+        except NonExistingPokemon:
+            PokemonService.negative_cache.add(pokemon_name_or_id)
+            raise
+
+        try:
+            PokemonService.save_pokemon(pokemon=pokemon)
+        except NotUniqueError:
+            # Same Pokemon was saved in the meantime by a fetch using its other identifier (name instead of id)
+            pass
 
     @staticmethod
-    def save_pokemon(pokemon: dict) -> Pokemon:
+    def is_stale(pokemon: dict) -> bool:
+        """
+        :param pokemon: raw Pokemon document
+        :return: True if the Pokemon was fetched from the external API more than refresh_ttl seconds ago
+        """
+
+        if PokemonService.refresh_ttl is None:
+            return False
+
+        fetched_at = pokemon.get('fetched_at')
+
+        return fetched_at is None or fetched_at < datetime.utcnow() - timedelta(seconds=PokemonService.refresh_ttl)
+
+    @staticmethod
+    def _refresh_if_stale(pokemon: dict):
+        """
+        Schedule a background refresh of the read Pokemon if it's stale. The read itself isn't delayed.
+        """
+
+        if PokemonService.refresher is not None and PokemonService.is_stale(pokemon):
+            PokemonService.refresher.submit(pokemon['_id'])
+
+    @staticmethod
+    def refresh_pokemon(pokemon_id: int):
+        """
+        Fetch stored Pokemon from the external API again and replace its REFRESHED_FIELDS, keeping the others, e.g.
+        encounter_count. Refreshes of the same Pokemon are coalesced like fetches of missing ones, and a Pokemon
+        refreshed in the meantime, e.g. by another process, is skipped.
+        :param pokemon_id: id of the Pokemon
+        """
+
+        PokemonService.single_flight.do(f'refresh:{pokemon_id}', PokemonService._fetch_and_update_pokemon, pokemon_id)
+
+    @staticmethod
+    def _fetch_and_update_pokemon(pokemon_id: int):
+        collection = Pokemon._get_collection()
+        stored = collection.find_one({'_id': pokemon_id}, {'name': 1, 'fetched_at': 1})
+
+        if stored is None or not PokemonService.is_stale(stored):
+            # Cached copy may still be the stale one
+            if stored is not None:
+                PokemonService.invalidate_cache(pokemon_id=pokemon_id, pokemon_name=stored['name'])
+            REFRESHES.labels(outcome='skipped').inc()
+            return
+
+        try:
+            pokemon = PokemonService.build_pokemon(PokemonService.upstream.get_pokemon(pokemon_id))
+        except NonExistingPokemon:
+            # Stored Pokemon is still served, the refresh is tried again once the Pokemon is read after another TTL
+            collection.update_one({'_id': pokemon_id}, {'$set': {'fetched_at': datetime.utcnow()}})
+            REFRESHES.labels(outcome='not_found').inc()
+            logging.getLogger('PokemonAPI').warning(f'Pokemon {pokemon_id} is no longer in the external API')
+            return
+        except UpstreamUnavailable:
+            REFRESHES.labels(outcome='unavailable').inc()
+            return
+
+        update = {field: pokemon[field] for field in PokemonService.REFRESHED_FIELDS}
+        update['fetched_at'] = pokemon.fetched_at
+
+        try:
+            before = collection.find_one_and_update({'_id': pokemon_id}, {'$set': update, '$unset': {'sprites': ''}},
+                                                    return_document=ReturnDocument.BEFORE)
+        except DuplicateKeyError:
+            REFRESHES.labels(outcome='conflict').inc()
+            logging.getLogger('PokemonAPI').warning(f'Pokemon {pokemon_id} was renamed to {pokemon.name} in the '
+                                                    f'external API, which is taken by another stored Pokemon')
+            return
+
+        if before is None:
+            return
+
+        PokemonService.invalidate_cache(pokemon_id=pokemon_id, pokemon_name=before['name'])
+
+        if 'sprites' in before or any(before.get(field) != update[field] for field in PokemonService.REFRESHED_FIELDS):
+            PokemonService.after_pokemons_saved({pokemon_id: pokemon.name})
+            REFRESHES.labels(outcome='updated').inc()
+            logging.getLogger('PokemonAPI').info(f'{pokemon.name} refreshed from the external API')
+        else:
+            REFRESHES.labels(outcome='unchanged').inc()
+
+    @staticmethod
+    def add_alias(alias: str, pokemon_name_or_id) -> dict:
+        """
+        Make the alias resolve to a stored Pokemon in all lookups by name.
+        Raise NonExistingPokemon error if the Pokemon is not in the database.
+        :param alias: alternate form of the Pokemon name
+        :param pokemon_name_or_id: name or id of the Pokemon
+        :return: raw document of the Pokemon
+        """
+
+        pokemon = PokemonService._find_many([str(pokemon_name_or_id)]).get(str(pokemon_name_or_id))
+
+        if pokemon is None:
+            raise NonExistingPokemon
+
+        alias_key = Pokemon.normalize_name(alias)
+        PokemonAlias(id=alias_key, pokemon_id=pokemon['_id']).save()
+
+        PokemonService.cache.invalidate(('name', alias_key))
+        PokemonService.negative_cache.discard(alias_key)
+
+        return pokemon
+
+    @staticmethod
+    def build_pokemon(pokemon: dict) -> Pokemon:
         """
-        Create Pokemon object from given dictionary.
+        Create Pokemon object from given dictionary in the external API format, without saving it.
         If dictionary contain keys that are not specified in the schema, they will be omitted.
         :param pokemon: dictionary with Pokemon information.
+        :return: Pokemon object
         """
 
-        Pokemon(
+        sprite_mask, sprite_overrides = Sprite.compact(pokemon['id'],
+                                                       Sprite.pick_specified_fields(pokemon['sprites']))
+
+        return Pokemon(
             id=pokemon['id'],
             name=pokemon['name'],
+            name_key=Pokemon.normalize_name(pokemon['name']),
             weight=pokemon['weight'],
             height=pokemon['height'],
             base_experience=pokemon['base_experience'],
-            sprites=Sprite.pick_specified_fields(pokemon['sprites'])
-        ).save()
+            sprite_mask=sprite_mask,
+            sprite_overrides=sprite_overrides,
+            fetched_at=datetime.utcnow()
+        )
+
+    @staticmethod
+    def save_pokemon(pokemon: dict) -> Pokemon:
+        """
+        Create Pokemon object from given dictionary and save it to the database.
+        If dictionary contain keys that are not specified in the schema, they will be omitted.
+        :param pokemon: dictionary with Pokemon information.
+        """
+
+        PokemonService.build_pokemon(pokemon).save()
+
+        PokemonService.after_pokemons_saved({pokemon['id']: pokemon['name']})
 
         logging.getLogger('PokemonAPI').info(f"{pokemon['name']} created in the database")
 
     @staticmethod
     def add_pokemon_encounter(pokemon_id: id, encounter_json: dict):
         """
-        Find Pokemon with given id and append an encounter to Pokemon.encounters field. Save afterwards.
+        Save an encounter of Pokemon with given id in the encounter collection.
+        Payload is validated before reaching the database. Existence of the Pokemon is confirmed by the same atomic
+        update which increments Pokemon.encounter_count, so the Pokemon document is neither loaded nor rewritten. The
+        increment is reverted if the encounter can't be saved.
+        If Pokemon is not in the database, it will be fetched from the external API first.
         :param pokemon_id: id of encountered pokemon
         :param encounter_json: json with encounter information. It has to be in line with EncounterJsonSchema
         """
 
-        try:
-            pokemon = PokemonService.get_by_id(pokemon_id)
-        except NonExistingPokemon:
+        encounter = PokemonService.build_encounter(pokemon_id, encounter_json)
+        pokemon = PokemonService._increment_encounter_count(pokemon_id)
+
+        if not pokemon:
             PokemonService.add_pokemon_from_external_api(pokemon_id)
-            pokemon = PokemonService.get_by_id(pokemon_id)
+            pokemon = PokemonService._increment_encounter_count(pokemon_id)
+
+            if not pokemon:
+                raise NonExistingPokemon
 
         try:
-            encounter = Encounter(**encounter_json)
-            encounter.timestamp = int(datetime.now().timestamp())
-            pokemon.encounters.append(encounter)
-            pokemon.save()
-        except (FieldDoesNotExist, ValidationError) as exc:
-            raise InvalidPayload(exc.args[0])  # Passing detailed message about the payload error
+            encounter.save(validate=False, force_insert=True)
+        except Exception:
+            Pokemon.objects(id=pokemon.id).update_one(dec__encounter_count=1)
+            raise
+
+        PokemonService.after_encounters_added({pokemon.id: pokemon.name}, [encounter])
+
+    @staticmethod
+    def queue_pokemon_encounter(pokemon_id: int, encounter_json: dict):
+        """
+        Validate an encounter and put it into PokemonService.encounter_queue, which saves it in the background.
+        Raise InvalidPayload error if encounter_json doesn't meet the Encounter schema and EncounterQueueFull error
+        if the queue can't accept more encounters.
+        :param pokemon_id: id of encountered pokemon
+        :param encounter_json: json with encounter information. It has to be in line with EncounterJsonSchema
+        """
+
+        PokemonService.encounter_queue.submit(PokemonService.build_encounter(pokemon_id, encounter_json))
+
+    @staticmethod
+    def add_pokemon_encounters(records: List[dict]) -> List[dict]:
+        """
+        Save many encounters at once. Records are validated against the Encounter schema in one pass, Pokemons
+        missing in the database are fetched from the external API once per id, and all valid encounters are inserted
+        with a single unordered bulk write.
+        :param records: encounter jsons extended with 'pokemon_id' key
+        :return: list of errors of rejected records, as dictionaries with 'index' (position of the record), 'status'
+        (400 for invalid record, 404 for non-existing Pokemon, 503 if the external API is unavailable) and 'message'
+        """
+
+        encounters, errors = {}, []
+
+        for index, record in enumerate(records):
+            record = dict(record)
+
+            try:
+                if 'pokemon_id' not in record:
+                    raise InvalidPayload("Field 'pokemon_id' is required.")
+                pokemon_id = record.pop('pokemon_id')
+
+                # Converting 23.7 or true to an id would save the encounter under another Pokemon
+                if not (isinstance(pokemon_id, int) and not isinstance(pokemon_id, bool) or
+                        isinstance(pokemon_id, str) and PokemonService._is_id(pokemon_id)):
+                    raise InvalidPayload("Field 'pokemon_id' must be an integer.")
+
+                encounter = PokemonService.build_encounter(int(pokemon_id), record)
+            except InvalidPayload as exc:
+                errors.append(dict(index=index, status=400, message=exc.args[0]))
+            else:
+                encounters[index] = encounter
+
+        return sorted(errors + PokemonService.save_encounters(encounters), key=lambda error: error['index'])
+
+    @staticmethod
+    def save_encounters(encounters: Dict[int, Encounter]) -> List[dict]:
+        """
+        Save already validated encounters with a single unordered bulk write. Pokemons missing in the database are
+        fetched from the external API once per id.
+        :param encounters: dictionary mapping positions of records to their Encounter objects
+        :return: list of errors of rejected encounters, in the format of add_pokemon_encounters
+        """
+
+        encounters, errors = dict(encounters), []
+
+        pokemons = {}
+        for lookup in PokemonService.get_many(sorted({encounter.pokemon_id for encounter in encounters.values()})):
+            pokemons[lookup['query']] = lookup
+
+        for index, encounter in list(encounters.items()):
+            status = pokemons[encounter.pokemon_id]['status']
+
+            if status not in (200, 201):
+                message = {404: "Pokemon was never encountered.",
+                           429: "Too many Pokemons fetched from the external API, try again later."}.get(
+                    status, "External API is unavailable.")
+                errors.append(dict(index=index, status=status, message=message))
+                del encounters[index]
+
+        if encounters:
+            indexes = list(encounters)
+            operations = [InsertOne(encounters[index].to_mongo()) for index in indexes]
+
+            try:
+                Encounter._get_collection().bulk_write(operations, ordered=False)
+            except BulkWriteError as exc:
+                for error in exc.details['writeErrors']:
+                    errors.append(dict(index=indexes[error['index']], status=400, message=error['errmsg']))
+                    del encounters[indexes[error['index']]]
+
+        counts = Counter(encounter.pokemon_id for encounter in encounters.values())
+
+        if counts:
+            Pokemon._get_collection().bulk_write(
+                [UpdateOne({'_id': pokemon_id}, {'$inc': {'encounter_count': count}})
+                 for pokemon_id, count in counts.items()],
+                ordered=False
+            )
+
+            PokemonService.after_encounters_added({pokemon_id: pokemons[pokemon_id]['pokemon']['name']
+                                                   for pokemon_id in counts},
+                                                  list(encounters.values()))
+
+        return errors
+
+    @staticmethod
+    def build_encounter(pokemon_id: int, encounter_json: dict) -> Encounter:
+        """
+        Create and validate an Encounter of Pokemon with given id, timestamped with the current time.
+        Raise InvalidPayload error if encounter_json doesn't meet the Encounter schema or sets one of
+        SERVER_ENCOUNTER_FIELDS, and NonExistingPokemon error if the id is not a number.
+        :param pokemon_id: id of encountered pokemon
+        :param encounter_json: json with encounter information. It has to be in line with EncounterJsonSchema
+        :return: validated, not yet saved Encounter object
+        """
+
+        for field in PokemonService.SERVER_ENCOUNTER_FIELDS:
+            if field in encounter_json:
+                raise InvalidPayload(f"Field '{field}' can't be set.")
+
+        try:
+            pokemon_id = int(pokemon_id)
+        except (TypeError, ValueError):
+            raise NonExistingPokemon
+
+        try:
+            with span('validate'):
+                encounter = Encounter(**encounter_json)
+                encounter.pokemon_id = pokemon_id
+                encounter.timestamp = int(datetime.now().timestamp())
+                encounter.validate()
+        except FieldDoesNotExist as exc:
+            raise InvalidPayload(str(exc))
+        except ValidationError as exc:
+            # Naming every field which failed, the message of the error itself is only the document name
+            raise InvalidPayload(' '.join(f"Field '{field}': {message}." for field, message in exc.to_dict().items()))
+
+        return encounter
+
+    @staticmethod
+    def _increment_encounter_count(pokemon_id: int) -> Pokemon:
+        """
+        Atomically increment encounter counter of Pokemon with given id.
+        :return: Pokemon object with its name loaded only or None if Pokemon is not in the database
+        """
+
+        return Pokemon.objects(id=pokemon_id).only('name').modify(inc__encounter_count=1, new=True)
+
+    @staticmethod
+    def after_pokemons_saved(pokemons: Dict[int, str]):
+        """
+        Bookkeeping done after Pokemons were saved to the database.
+        :param pokemons: dictionary mapping ids of saved pokemons to their names
+        """
+
+        for pokemon_id, pokemon_name in pokemons.items():
+            PokemonService.invalidate_cache(pokemon_id=pokemon_id, pokemon_name=pokemon_name)
+
+        PokemonService.negative_cache.discard(*pokemons.keys(), *pokemons.values())
+        Version.bump(Version.POKEMONS)
+
+        for listener in PokemonService.on_pokemons_saved:
+            listener()
+
+    @staticmethod
+    def after_encounters_added(pokemons: Dict[int, str], encounters: List[Encounter]):
+        """
+        Bookkeeping done after encounters were saved to the database.
+        :param pokemons: dictionary mapping ids of encountered pokemons to their names
+        :param encounters: saved Encounter objects
+        """
+
+        for pokemon_id, pokemon_name in pokemons.items():
+            PokemonService.invalidate_cache(pokemon_id=pokemon_id, pokemon_name=pokemon_name)
+
+        Version.bump(*(Version.ENCOUNTERS.format(pokemon_id) for pokemon_id in pokemons))
+        rollups.add_encounters(encounters)
+
+    @staticmethod
+    def get_pokemons_version() -> Version:
+        """
+        :return: Version of the Pokemon list, bumped whenever a Pokemon is saved
+        """
+
+        return Version.get(Version.POKEMONS)
+
+    @staticmethod
+    def get_encounters_version(pokemon_id) -> Optional[Version]:
+        """
+        :param pokemon_id: id of the Pokemon, e.g. as a string from the URL
+        :return: Version of encounters of Pokemon with given id, bumped whenever its encounter is saved, or None if
+        the id is not a number
+        """
+
+        try:
+            pokemon_id = int(pokemon_id)
+        except ValueError:
+            return None
+
+        return Version.get(Version.ENCOUNTERS.format(pokemon_id))
+
+    @staticmethod
+    def invalidate_cache(pokemon_id: int, pokemon_name: str):
+        """
+        Remove cached lookups of the Pokemon, so next get_by_name/get_by_id calls will reach the database.
+        :param pokemon_id: id of modified pokemon
+        :param pokemon_name: name of modified pokemon
+        """
+
+        PokemonService.cache.invalidate(('id', str(pokemon_id)), ('name', Pokemon.normalize_name(pokemon_name)))
 
 
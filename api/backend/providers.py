@@ -0,0 +1,121 @@
+"""
+Sources of Pokemon jsons in the external API format: the external API itself (api.backend.upstream.UpstreamClient),
+a local mirror of it, or a chain of both
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import List
+
+from api.mongo import Pokemon
+from api.utils.exceptions import NonExistingPokemon
+
+
+class PokemonProvider(ABC):
+    """
+    Interface of Pokemon sources used by PokemonService.
+    """
+
+    @abstractmethod
+    def get_pokemon(self, pokemon_name_or_id) -> dict:
+        """
+        Return Pokemon json in the external API format. Raise NonExistingPokemon error if the provider doesn't know
+        the Pokemon and UpstreamUnavailable error if the provider can't be reached.
+        :param pokemon_name_or_id: id or normalized name of the Pokemon
+        """
+
+
+class LocalMirrorProvider(PokemonProvider):
+
+    def __init__(self, path: str):
+        """
+        :param path: JSON file with a list of Pokemons (or a single one), directory of such files, or SQLite database
+        with pokemon(id INTEGER PRIMARY KEY, name TEXT, json TEXT) table. JSON files are loaded into memory
+        completely, SQLite database only with ids and names.
+        """
+
+        self.path = path
+        self._pokemons = {}
+        self._connection = None
+        self._lock = threading.Lock()
+
+        if os.path.isdir(path):
+            for file_name in sorted(os.listdir(path)):
+                if file_name.endswith('.json'):
+                    self._add(load_dump(os.path.join(path, file_name)))
+        elif path.endswith('.json'):
+            self._add(load_dump(path))
+        else:
+            self._connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+            self._ids = {}
+            for pokemon_id, name in self._connection.execute('SELECT id, name FROM pokemon'):
+                self._ids[str(pokemon_id)] = self._ids[Pokemon.normalize_name(name)] = pokemon_id
+
+    def get_pokemon(self, pokemon_name_or_id) -> dict:
+        key = str(pokemon_name_or_id)
+
+        if self._connection is None:
+            pokemon = self._pokemons.get(key)
+        else:
+            pokemon = self._read(self._ids[key]) if key in self._ids else None
+
+        if pokemon is None:
+            raise NonExistingPokemon
+
+        return pokemon
+
+    def _add(self, pokemons: List[dict]):
+        for pokemon in pokemons:
+            self._pokemons[str(pokemon['id'])] = self._pokemons[Pokemon.normalize_name(pokemon['name'])] = pokemon
+
+    def _read(self, pokemon_id: int) -> dict:
+        with self._lock:
+            row = self._connection.execute('SELECT json FROM pokemon WHERE id = ?', (pokemon_id,)).fetchone()
+
+        return json.loads(row[0]) if row else None
+
+
+class FallbackProvider(PokemonProvider):
+
+    def __init__(self, *providers: PokemonProvider):
+        """
+        :param providers: providers asked in the given order, until one of them knows the Pokemon
+        """
+
+        self.providers = providers
+
+    def get_pokemon(self, pokemon_name_or_id) -> dict:
+        for provider in self.providers[:-1]:
+            try:
+                return provider.get_pokemon(pokemon_name_or_id)
+            except NonExistingPokemon:
+                pass
+
+        return self.providers[-1].get_pokemon(pokemon_name_or_id)
+
+
+def load_dump(path: str) -> List[dict]:
+    """
+    Read Pokemons from a JSON file containing either a list of Pokemons or a single one, in the external API format.
+    """
+
+    with open(path, encoding='utf-8') as dump_file:
+        pokemons = json.load(dump_file)
+
+    return pokemons if isinstance(pokemons, list) else [pokemons]
+
+
+def write_sqlite_mirror(path: str, pokemons: List[dict]):
+    """
+    Create (or extend) SQLite database readable by LocalMirrorProvider.
+    :param pokemons: Pokemon jsons in the external API format
+    """
+
+    with sqlite3.connect(path) as connection:
+        connection.execute('CREATE TABLE IF NOT EXISTS pokemon (id INTEGER PRIMARY KEY, name TEXT UNIQUE, json TEXT)')
+        connection.executemany('INSERT OR REPLACE INTO pokemon VALUES (?, ?, ?)',
+                               [(pokemon['id'], pokemon['name'], json.dumps(pokemon)) for pokemon in pokemons])
+    connection.close()
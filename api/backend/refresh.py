@@ -0,0 +1,79 @@
+"""
+Background refresh of stored Pokemons whose data is older than the freshness TTL
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+class Refresher:
+
+    def __init__(self, refresh, workers: int = 2, max_pending: int = 100):
+        """
+        :param refresh: function fetching and updating the Pokemon with given id
+        :param workers: maximal number of concurrent refreshes
+        :param max_pending: maximal number of Pokemons waiting for a refresh, further submits are dropped
+        """
+
+        self.refresh = refresh
+        self.max_pending = max_pending
+
+        self.submitted = 0
+        self.dropped = 0
+
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pokemon-refresh')
+
+    def submit(self, pokemon_id: int) -> bool:
+        """
+        Schedule a refresh of the Pokemon, unless it's already scheduled or too many refreshes are pending.
+        :return: True if the refresh was scheduled by this call
+        """
+
+        with self._lock:
+            if pokemon_id in self._pending:
+                return False
+
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return False
+
+            self.submitted += 1
+            self._pending[pokemon_id] = self._executor.submit(self._run, pokemon_id)
+            return True
+
+    def wait(self, timeout: float = None):
+        """
+        Wait until the currently pending refreshes finish.
+        """
+
+        with self._lock:
+            futures = list(self._pending.values())
+
+        wait(futures, timeout=timeout)
+
+    def close(self):
+        """
+        Stop accepting refreshes, dropping the pending ones which haven't started yet.
+        """
+
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        """
+        :return: dictionary with number of submitted, dropped and currently pending refreshes
+        """
+
+        with self._lock:
+            return dict(submitted=self.submitted, dropped=self.dropped, pending=len(self._pending))
+
+    def _run(self, pokemon_id: int):
+        try:
+            self.refresh(pokemon_id)
+        except Exception:
+            logging.getLogger('PokemonAPI').exception(f'Pokemon {pokemon_id} could not be refreshed')
+        finally:
+            with self._lock:
+                self._pending.pop(pokemon_id, None)
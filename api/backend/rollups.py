@@ -0,0 +1,107 @@
+"""
+Encounter counters per place, hour and day, kept for every Pokemon and for all of them together
+"""
+
+from collections import Counter
+from typing import Iterable, List
+
+from pymongo import UpdateOne, InsertOne
+
+from api.mongo import Encounter, EncounterRollup
+
+
+def add_encounters(encounters: Iterable[Encounter]):
+    """
+    Increment rollups of given, already saved encounters with a single bulk write.
+    """
+
+    counts = Counter()
+
+    for encounter in encounters:
+        for dimension, key in _keys(encounter.place, encounter.timestamp):
+            counts[(str(encounter.pokemon_id), dimension, key)] += 1
+            counts[(EncounterRollup.GLOBAL, dimension, key)] += 1
+
+    if counts:
+        EncounterRollup._get_collection().bulk_write(
+            [UpdateOne(dict(scope=scope, dimension=dimension, key=key), {'$inc': {'count': count}}, upsert=True)
+             for (scope, dimension, key), count in counts.items()],
+            ordered=False
+        )
+
+
+def get_counts(scope: str, dimension: str, since: int = None, until: int = None, limit: int = None) -> List[dict]:
+    """
+    :param scope: id of a Pokemon (as a string) or EncounterRollup.GLOBAL
+    :param dimension: 'place', 'hour' or 'day'
+    :param since: for hours and days, the first returned period has to end after this timestamp
+    :param until: for hours and days, the last returned period has to start before this timestamp
+    :param limit: maximal number of returned counters
+    :return: list of {'key', 'count'} dictionaries. Places are ordered from the most frequent, hours and days
+    chronologically.
+    """
+
+    query = dict(scope=scope, dimension=dimension)
+
+    if dimension in EncounterRollup.PERIODS:
+        bounds = {}
+        if since is not None:
+            bounds['$gt'] = since - EncounterRollup.PERIODS[dimension]
+        if until is not None:
+            bounds['$lt'] = until
+        if bounds:
+            query['key'] = bounds
+        order = [('key', 1)]
+    else:
+        order = [('count', -1), ('key', 1)]
+
+    rollups = EncounterRollup._get_collection().find(query, {'_id': 0, 'key': 1, 'count': 1}).sort(order)
+
+    if limit is not None:
+        rollups = rollups.limit(limit)
+
+    return list(rollups)
+
+
+def rebuild(batch_size: int = 1000) -> int:
+    """
+    Recompute all rollups from the encounter collection with aggregation pipelines, replacing the current ones.
+    Encounters saved while the rebuild runs may be counted twice or not at all, so it should run when encounters
+    aren't written, e.g. after api.mongo.migrations.migrate_embedded_encounters.
+    :param batch_size: maximal number of rollups inserted in a single round trip
+    :return: number of written rollups
+    """
+
+    counts = Counter()
+    keys = {
+        'place': '$place',
+        **{dimension: {'$subtract': ['$timestamp', {'$mod': ['$timestamp', period]}]}
+           for dimension, period in EncounterRollup.PERIODS.items()}
+    }
+
+    for dimension, key in keys.items():
+        pipeline = [{'$group': {'_id': {'pokemon_id': '$pokemon_id', 'key': key}, 'count': {'$sum': 1}}}]
+
+        for group in Encounter._get_collection().aggregate(pipeline, allowDiskUse=True):
+            group_key = group['_id']['key']
+            group_key = int(group_key) if dimension in EncounterRollup.PERIODS else group_key
+
+            counts[(str(group['_id']['pokemon_id']), dimension, group_key)] += group['count']
+            counts[(EncounterRollup.GLOBAL, dimension, group_key)] += group['count']
+
+    collection = EncounterRollup._get_collection()
+    collection.delete_many({})
+
+    operations = [InsertOne(dict(scope=scope, dimension=dimension, key=key, count=count))
+                  for (scope, dimension, key), count in counts.items()]
+    for start in range(0, len(operations), batch_size):
+        collection.bulk_write(operations[start:start + batch_size], ordered=False)
+
+    return len(operations)
+
+
+def _keys(place: str, timestamp: int):
+    yield 'place', place
+
+    for dimension, period in EncounterRollup.PERIODS.items():
+        yield dimension, timestamp - timestamp % period
@@ -0,0 +1,235 @@
+"""
+Caches shared by all processes of PokemonAPI, e.g. gunicorn workers, with the interface of PokemonCache.
+Values are stored encoded with BSON, so they have to be BSON serializable, like raw documents.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+import bson
+
+from api.utils.sqlite import LocalConnection
+
+
+class SQLitePokemonCache:
+
+    def __init__(self, path: str, maxsize: int = 1024, ttl: float = 300, touch_interval: float = 1):
+        """
+        LRU cache with TTL expiration kept in SQLite database in WAL mode, shared by all processes of a host.
+        :param path: file of the database, created if it doesn't exist
+        :param maxsize: maximal number of stored entries. Least recently used entries are evicted first.
+        :param ttl: number of seconds after which an entry expires. None means that entries never expire.
+        :param touch_interval: entries are marked as used at most once per this many seconds, so most hits are
+        read only
+        """
+
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.touch_interval = touch_interval
+        self.hits = 0
+        self.misses = 0
+
+        self._connection = LocalConnection(path)
+        self._lock = threading.Lock()
+
+        with self._transaction() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS pokemon_cache '
+                               '(key TEXT PRIMARY KEY, value BLOB, expires_at REAL, used_at REAL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS pokemon_cache_used_at ON pokemon_cache (used_at)')
+
+    def get(self, key):
+        """
+        Return value stored under given key or None if it is missing or expired.
+        """
+
+        key, now = _encode_key(key), time.time()
+        row = self._connection.get().execute('SELECT value, expires_at, used_at FROM pokemon_cache WHERE key = ?',
+                                             (key,)).fetchone()
+
+        if row is None or (row[1] is not None and row[1] < now):
+            self._count(hit=False)
+            return None
+
+        if row[2] < now - self.touch_interval:
+            with self._transaction() as connection:
+                connection.execute('UPDATE pokemon_cache SET used_at = ? WHERE key = ?', (now, key))
+
+        self._count(hit=True)
+        return _decode_value(row[0])
+
+    def set(self, key, value):
+        """
+        Store value under given key, evicting expired and the least recently used entries if the cache is full.
+        """
+
+        if self.maxsize <= 0:
+            return
+
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl is not None else None
+
+        with self._transaction() as connection:
+            connection.execute('INSERT OR REPLACE INTO pokemon_cache VALUES (?, ?, ?, ?)',
+                               (_encode_key(key), _encode_value(value), expires_at, now))
+            connection.execute('DELETE FROM pokemon_cache WHERE expires_at < ?', (now,))
+            connection.execute('DELETE FROM pokemon_cache WHERE key IN '
+                               '(SELECT key FROM pokemon_cache ORDER BY used_at DESC LIMIT -1 OFFSET ?)',
+                               (self.maxsize,))
+
+    def invalidate(self, *keys):
+        """
+        Remove given keys from the cache of all processes. Missing keys are ignored.
+        """
+
+        if keys:
+            with self._transaction() as connection:
+                connection.executemany('DELETE FROM pokemon_cache WHERE key = ?',
+                                       [(_encode_key(key),) for key in keys])
+
+    def clear(self):
+        """
+        Remove all entries and reset hit/miss counters of this process.
+        """
+
+        with self._transaction() as connection:
+            connection.execute('DELETE FROM pokemon_cache')
+
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        :return: dictionary with hit/miss counters of this process and the current size of the shared cache
+        """
+
+        size = self._connection.get().execute('SELECT COUNT(*) FROM pokemon_cache').fetchone()[0]
+
+        with self._lock:
+            return dict(hits=self.hits, misses=self.misses, size=size, maxsize=self.maxsize)
+
+    def _transaction(self):
+        return _Transaction(self._connection.get())
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+class RedisPokemonCache:
+
+    def __init__(self, client, ttl: float = 300, prefix: str = 'pokemon_api:cache:'):
+        """
+        Cache kept in Redis (or another server with its interface), shared by all processes of all hosts.
+        Its size is limited by the server, e.g. with maxmemory and allkeys-lru eviction policy.
+        :param client: redis.Redis or a compatible client
+        :param ttl: number of seconds after which an entry expires. None means that entries never expire.
+        :param prefix: prefix of all keys stored by the cache
+        """
+
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.maxsize = None
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> 'RedisPokemonCache':
+        """
+        Connect to Redis server with given url, e.g. redis://localhost:6379/0. Requires redis package.
+        """
+
+        import redis
+
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key):
+        """
+        Return value stored under given key or None if it is missing or expired.
+        """
+
+        value = self.client.get(self.prefix + _encode_key(key))
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        return _decode_value(value)
+
+    def set(self, key, value):
+        """
+        Store value under given key.
+        """
+
+        self.client.set(self.prefix + _encode_key(key), _encode_value(value),
+                        px=int(self.ttl * 1000) if self.ttl is not None else None)
+
+    def invalidate(self, *keys):
+        """
+        Remove given keys from the cache of all processes. Missing keys are ignored.
+        """
+
+        if keys:
+            self.client.delete(*[self.prefix + _encode_key(key) for key in keys])
+
+    def clear(self):
+        """
+        Remove all entries and reset hit/miss counters of this process.
+        """
+
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        :return: dictionary with hit/miss counters of this process and the current size of the shared cache
+        """
+
+        size = sum(1 for _ in self.client.scan_iter(match=self.prefix + '*'))
+
+        with self._lock:
+            return dict(hits=self.hits, misses=self.misses, size=size, maxsize=self.maxsize)
+
+
+class _Transaction:
+    """
+    Write transaction taking the database lock up front, so concurrent writers wait instead of failing on upgrade.
+    """
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.execute('COMMIT' if exc_type is None else 'ROLLBACK')
+
+
+def _encode_key(key) -> str:
+    return json.dumps(key)
+
+
+def _encode_value(value) -> bytes:
+    return bson.encode({'value': value})
+
+
+def _decode_value(data: bytes):
+    return bson.decode(data)['value']
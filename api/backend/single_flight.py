@@ -0,0 +1,101 @@
+"""
+Coalescing of concurrent calls doing the same work, e.g. fetching the same Pokemon from the external API
+"""
+
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows, cross-process locking is not available
+    fcntl = None
+
+
+class _Call:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+
+    def __init__(self, lock_dir: str = None, lock_files: int = 64):
+        """
+        :param lock_dir: directory for lock files shared by all processes on the host, e.g. all gunicorn workers.
+        If not given, calls are coalesced only between threads of the current process.
+        :param lock_files: number of lock files in lock_dir. Keys are spread between them, so calls for different keys
+        sharing a file run one after another too, but the number of files doesn't grow with the number of keys.
+        """
+
+        if lock_dir is not None:
+            if fcntl is None:
+                raise RuntimeError("Cross-process locking requires fcntl module, which is not available here.")
+            os.makedirs(lock_dir, exist_ok=True)
+
+        self.lock_dir = lock_dir
+        self.lock_files = lock_files
+
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function, *args, **kwargs):
+        """
+        Run function for given key, unless the same key is already being processed by another thread. In that case
+        wait for the running call and return its result or raise its error.
+        With lock_dir set, calls for the same key from different processes run one after another.
+        :param key: hashable identifier of the work done by the function
+        :return: result of the function
+        """
+
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+
+            if is_leader:
+                call = self._calls[key] = _Call()
+
+        if not is_leader:
+            call.done.wait()
+
+            if call.error is not None:
+                raise call.error
+
+            return call.result
+
+        try:
+            with self._process_lock(key):
+                call.result = function(*args, **kwargs)
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+    @contextmanager
+    def _process_lock(self, key):
+        """
+        Hold an exclusive lock on the file assigned to given key. No-op if lock_dir is not set.
+        """
+
+        if self.lock_dir is None:
+            yield
+            return
+
+        # Hash of the key is stable between processes, unlike hash()
+        slot = int.from_bytes(hashlib.sha1(str(key).encode()).digest()[:8], 'big') % self.lock_files
+        file_name = f'{slot}.lock'
+
+        with open(os.path.join(self.lock_dir, file_name), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
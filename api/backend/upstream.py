@@ -0,0 +1,134 @@
+"""
+Pooled HTTP client of the external Pokemon API (https://pokeapi.co/) with timeouts, retries and a circuit breaker
+"""
+
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from api.backend.providers import PokemonProvider
+from api.utils.exceptions import NonExistingPokemon, UpstreamUnavailable
+from api.utils.metrics import UPSTREAM_LATENCY, UPSTREAM_ERRORS
+from api.utils.timing import span
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class UpstreamClient(PokemonProvider):
+
+    def __init__(self, base_url: str = 'https://pokeapi.co/api/v2', connect_timeout: float = 3.05,
+                 read_timeout: float = 10, retries: int = 2, backoff: float = 0.2, max_backoff: float = 2,
+                 pool_size: int = 10, breaker_threshold: int = 5, breaker_cooldown: float = 30):
+        """
+        :param base_url: root of the API, can point to a local stub server in tests
+        :param connect_timeout: seconds to wait for establishing a connection
+        :param read_timeout: seconds to wait for the response
+        :param retries: number of repeated attempts after connection errors, timeouts and 429/5xx responses
+        :param backoff: base of the exponential delay between attempts, randomized with full jitter
+        :param max_backoff: upper bound of a single delay between attempts
+        :param pool_size: number of keep-alive connections kept open to the API
+        :param breaker_threshold: number of consecutive failed calls after which the circuit opens
+        :param breaker_cooldown: seconds during which calls fail fast once the circuit is open
+        """
+
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def get_pokemon(self, pokemon_name_or_id) -> dict:
+        """
+        Fetch Pokemon json from the API. Raise NonExistingPokemon error if the API doesn't know it and
+        UpstreamUnavailable error if the API couldn't be reached.
+        :param pokemon_name_or_id: name or id of the pokemon that needs to be fetched
+        :return: dictionary with Pokemon information in the API format
+        """
+
+        response = self._get(f'{self.base_url}/pokemon/{pokemon_name_or_id}/')
+
+        if response.status_code == 404:
+            raise NonExistingPokemon
+
+        return response.json()
+
+    def _get(self, url: str) -> requests.Response:
+        """
+        GET given url, retrying transient failures with jittered exponential backoff.
+        """
+
+        self._check_circuit()
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1))))
+
+            started = time.perf_counter()
+            try:
+                with span('upstream'):
+                    response = self.session.get(url, timeout=self.timeout)
+            except requests.RequestException as exc:
+                UPSTREAM_LATENCY.labels(status='error').observe(time.perf_counter() - started)
+                UPSTREAM_ERRORS.labels(reason=type(exc).__name__).inc()
+                error = f'{type(exc).__name__}: {exc}'
+                continue
+
+            UPSTREAM_LATENCY.labels(status=response.status_code).observe(time.perf_counter() - started)
+
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                break
+
+            UPSTREAM_ERRORS.labels(reason=f'status_{response.status_code}').inc()
+            error = f'status code {response.status_code}'
+        else:
+            self._record_failure()
+            raise UpstreamUnavailable(f'{url} failed after {self.retries + 1} attempts, last error: {error}')
+
+        if response.status_code not in (200, 404):
+            UPSTREAM_ERRORS.labels(reason=f'status_{response.status_code}').inc()
+            self._record_failure()
+            raise UpstreamUnavailable(f'{url} returned unexpected status code {response.status_code}')
+
+        self._record_success()
+        return response
+
+    def _check_circuit(self):
+        """
+        Fail fast if the circuit is open. After the cooldown calls are let through again; the first failure
+        opens the circuit once more, the first success closes it.
+        """
+
+        with self._lock:
+            if self._opened_at is not None and time.monotonic() - self._opened_at < self.breaker_cooldown:
+                UPSTREAM_ERRORS.labels(reason='circuit_open').inc()
+                raise UpstreamUnavailable('Circuit breaker of the external API is open.')
+
+    def _record_failure(self):
+        with self._lock:
+            self._consecutive_failures += 1
+
+            if self._consecutive_failures >= self.breaker_threshold:
+                if self._opened_at is None:
+                    logging.getLogger('PokemonAPI').warning(f'External API circuit breaker opened after '
+                                                            f'{self._consecutive_failures} failed calls')
+                self._opened_at = time.monotonic()
+
+    def _record_success(self):
+        with self._lock:
+            self._consecutive_failures = 0
+            self._opened_at = None
@@ -0,0 +1,118 @@
+"""
+Bulk preloading of the Pokemon catalog, so cold deployments don't serve first requests at external API latency
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, List
+
+from mongoengine import Q
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from api.backend.pokemon_service import PokemonService
+from api.backend.providers import load_dump
+from api.mongo import Pokemon
+from api.utils.exceptions import NonExistingPokemon, UpstreamUnavailable
+
+
+def warm_up(ids: Iterable[int] = (), names: Iterable[str] = (), dump: str = None, workers: int = 8,
+            chunk_size: int = 100) -> dict:
+    """
+    Load Pokemons with given ids and names from the external API, and Pokemons from a local JSON dump, into the
+    database. Pokemons which are already stored are skipped. Fetches run concurrently on a bounded pool of workers,
+    fetched Pokemons are written in chunks with a single bulk upsert per chunk.
+    :param ids: ids of Pokemons that need to be fetched
+    :param names: names of Pokemons that need to be fetched
+    :param dump: path to a JSON file with a list of Pokemons in the external API format
+    :param workers: maximal number of concurrent requests to the external API
+    :param chunk_size: maximal number of Pokemons written to the database in a single round trip
+    :return: dictionary with counts of requested, skipped, fetched, saved, missing and failed Pokemons, along with
+    elapsed seconds and throughput of saved Pokemons per second
+    """
+
+    started = time.perf_counter()
+    stats = dict(requested=0, skipped=0, fetched=0, saved=0, missing=0, failed=0)
+
+    # Names are normalized like in requests, so any spelling of a stored name is skipped
+    ids = list(dict.fromkeys(int(pokemon_id) for pokemon_id in ids))
+    names = list(dict.fromkeys(Pokemon.normalize_name(name) for name in names))
+    dumped = load_dump(dump) if dump else []
+    stats['requested'] = len(ids) + len(names) + len(dumped)
+
+    stored_ids = set(Pokemon.objects(id__in=ids + [pokemon['id'] for pokemon in dumped]).distinct('id'))
+    # Documents saved before name_key was introduced are still found by their name, until they are backfilled
+    stored_names = {pokemon.get('name_key', pokemon['name']) for pokemon in
+                    Pokemon.objects(Q(name_key__in=names) | Q(name__in=names)).only('name', 'name_key').as_pymongo()}
+
+    dumped = [pokemon for pokemon in dumped if pokemon['id'] not in stored_ids]
+    queries = [pokemon_id for pokemon_id in ids if pokemon_id not in stored_ids] + \
+              [name for name in names if name not in stored_names]
+    stats['skipped'] = stats['requested'] - len(dumped) - len(queries)
+
+    pending = []
+
+    def flush():
+        stats['saved'] += _bulk_save(pending)
+        pending.clear()
+
+    for pokemon in dumped:
+        pending.append(pokemon)
+        if len(pending) >= chunk_size:
+            flush()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(PokemonService.upstream.get_pokemon, query): query for query in queries}
+
+        for future in as_completed(futures):
+            try:
+                pending.append(future.result())
+            except NonExistingPokemon:
+                stats['missing'] += 1
+                continue
+            except UpstreamUnavailable as exc:
+                logging.getLogger('PokemonAPI').warning(f"Warm-up of {futures[future]} failed: {exc}")
+                stats['failed'] += 1
+                continue
+
+            stats['fetched'] += 1
+            if len(pending) >= chunk_size:
+                flush()
+
+    flush()
+
+    stats['seconds'] = round(time.perf_counter() - started, 3)
+    stats['per_second'] = round(stats['saved'] / stats['seconds'], 1) if stats['seconds'] else 0.0
+
+    logging.getLogger('PokemonAPI').info(f"Catalog warm-up finished: {stats}")
+
+    return stats
+
+
+def _bulk_save(pokemons: List[dict]) -> int:
+    """
+    Insert Pokemons which are not stored yet, using one unordered bulk write.
+    :return: number of inserted Pokemons
+    """
+
+    operations = {}
+
+    for pokemon in pokemons:
+        document = PokemonService.build_pokemon(pokemon)
+        document.validate()
+        operations[document.id] = UpdateOne({'_id': document.id}, {'$setOnInsert': document.to_mongo()}, upsert=True)
+
+    if not operations:
+        return 0
+
+    try:
+        result = Pokemon._get_collection().bulk_write(list(operations.values()), ordered=False)
+        inserted = result.upserted_count
+    except BulkWriteError as exc:
+        logging.getLogger('PokemonAPI').warning(f"Warm-up chunk partially failed: {exc.details['writeErrors']}")
+        inserted = exc.details['nUpserted']
+
+    PokemonService.after_pokemons_saved({pokemon['id']: pokemon['name'] for pokemon in pokemons})
+
+    return inserted
@@ -0,0 +1,153 @@
+"""
+Bounded in-process queue of accepted encounters, written to the database in batches by background workers
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from api.utils.exceptions import EncounterQueueFull
+from api.utils.metrics import ENCOUNTER_QUEUE_DEPTH, QUEUED_ENCOUNTERS
+
+_STOP = object()
+
+
+class EncounterQueue:
+
+    def __init__(self, writer, maxsize: int = 10000, batch_size: int = 500, workers: int = 1,
+                 shutdown_timeout: float = 30):
+        """
+        :param writer: function saving a dictionary of {position: Encounter}, returning a list of errors in the
+        format of PokemonService.save_encounters
+        :param maxsize: maximal number of encounters waiting in the queue, further submits are rejected
+        :param batch_size: maximal number of encounters saved by a single writer call
+        :param workers: number of background threads draining the queue
+        :param shutdown_timeout: maximal number of seconds spent on flushing the queue when the process exits
+        """
+
+        self.writer = writer
+        self.batch_size = batch_size
+
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.failed = 0
+
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._closed = False
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._work, name=f'encounter-writer-{number}', daemon=True)
+                         for number in range(workers)]
+
+        for thread in self._threads:
+            thread.start()
+
+        # Flush accepted encounters when the process shuts down
+        atexit.register(self.close, shutdown_timeout)
+
+    def submit(self, encounter):
+        """
+        Put validated Encounter into the queue. Raise EncounterQueueFull error if the queue is full or closed.
+        """
+
+        # Counted before it's put, so a worker taking it right away never brings the gauge below zero
+        ENCOUNTER_QUEUE_DEPTH.inc()
+
+        try:
+            if self._closed:
+                raise queue.Full
+            self._queue.put_nowait(encounter)
+        except queue.Full:
+            ENCOUNTER_QUEUE_DEPTH.dec()
+            with self._lock:
+                self.rejected += 1
+            QUEUED_ENCOUNTERS.labels(outcome='rejected').inc()
+            raise EncounterQueueFull
+
+        with self._lock:
+            self.accepted += 1
+        QUEUED_ENCOUNTERS.labels(outcome='accepted').inc()
+
+    def close(self, timeout: float = None):
+        """
+        Stop accepting encounters and wait until the already accepted ones are written. Can be called many times.
+        :param timeout: maximal number of seconds to wait, unlimited if not given
+        """
+
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+
+        atexit.unregister(self.close)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+
+        def remaining():
+            return max(0, deadline - time.monotonic()) if deadline is not None else None
+
+        try:
+            # Stop markers are queued behind all accepted encounters, so the workers drain the queue first
+            for _ in self._threads:
+                self._queue.put(_STOP, timeout=remaining())
+
+            for thread in self._threads:
+                thread.join(remaining())
+        except queue.Full:
+            pass
+
+        if any(thread.is_alive() for thread in self._threads):
+            logging.getLogger('PokemonAPI').warning(f'Encounter queue was not flushed in {timeout}s, '
+                                                    f'{self._queue.qsize()} encounters were not written')
+
+    def stats(self) -> dict:
+        """
+        :return: dictionary with queue depth and counters of accepted, rejected, written and failed encounters
+        """
+
+        with self._lock:
+            return dict(depth=self._queue.qsize(), maxsize=self._queue.maxsize, accepted=self.accepted,
+                        rejected=self.rejected, written=self.written, failed=self.failed)
+
+    def _work(self):
+        stop = False
+
+        while not stop:
+            batch = []
+
+            # Block for the first encounter only, then take whatever is already waiting, up to batch_size
+            while len(batch) < self.batch_size:
+                try:
+                    encounter = self._queue.get(block=not batch)
+                except queue.Empty:
+                    break
+
+                if encounter is _STOP:
+                    stop = True
+                    break
+
+                batch.append(encounter)
+
+            if batch:
+                ENCOUNTER_QUEUE_DEPTH.dec(len(batch))
+                self._write(batch)
+
+    def _write(self, batch: list):
+        try:
+            errors = self.writer(dict(enumerate(batch)))
+        except Exception:
+            logging.getLogger('PokemonAPI').exception(f'Writing {len(batch)} queued encounters failed')
+            errors = [dict(index=index) for index in range(len(batch))]
+
+        for error in errors:
+            if 'message' in error:
+                logging.getLogger('PokemonAPI').warning(f"Queued encounter {batch[error['index']].to_json()} "
+                                                        f"rejected: {error['message']}")
+
+        with self._lock:
+            self.written += len(batch) - len(errors)
+            self.failed += len(errors)
+
+        QUEUED_ENCOUNTERS.labels(outcome='written').inc(len(batch) - len(errors))
+        QUEUED_ENCOUNTERS.labels(outcome='failed').inc(len(errors))
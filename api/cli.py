@@ -0,0 +1,143 @@
+"""
+Management commands available through the flask command line interface, e.g. `FLASK_APP=heroku:app flask <command>`
+"""
+
+import click
+from flask.cli import with_appcontext
+
+from api.backend import PokemonService, rollups
+from api.backend.providers import load_dump, write_sqlite_mirror
+from api.backend.warmup import warm_up
+from api.mongo.migrations import migrate_embedded_encounters, backfill_name_keys, compact_sprites
+from api.utils.exceptions import NonExistingPokemon
+
+
+def register_commands(app):
+    """
+    Attach all management commands to the Flask application.
+    :param app: Flask application instance
+    """
+
+    app.cli.add_command(migrate_encounters)
+    app.cli.add_command(warm_up_catalog)
+    app.cli.add_command(rebuild_encounter_stats)
+    app.cli.add_command(backfill_pokemon_name_keys)
+    app.cli.add_command(compact_pokemon_sprites)
+    app.cli.add_command(add_pokemon_alias)
+    app.cli.add_command(build_mirror)
+
+
+def parse_ids(ctx, param, value):
+    """
+    Turn comma separated ids and id ranges, e.g. "1-151,251", into a list of ids.
+    """
+
+    ids = []
+
+    for part in filter(None, (value or '').split(',')):
+        try:
+            first, _, last = part.partition('-')
+            ids.extend(range(int(first), int(last or first) + 1))
+        except ValueError:
+            raise click.BadParameter(f'{part} is neither an id nor a range of ids.')
+
+    return ids
+
+
+@click.command('migrate-encounters')
+@click.option('--batch-size', default=1000, show_default=True, help='Number of encounters inserted at once.')
+@with_appcontext
+def migrate_encounters(batch_size):
+    """
+    Move encounters embedded in Pokemon documents to the encounter collection.
+    """
+
+    moved = migrate_embedded_encounters(batch_size=batch_size)
+    click.echo(f'{moved} encounters migrated.')
+
+    if moved:
+        click.echo('Run rebuild-encounter-stats to count them in encounter statistics.')
+
+
+@click.command('warm-up')
+@click.option('--ids', callback=parse_ids, help='Comma separated ids or ranges of ids, e.g. 1-151,251.')
+@click.option('--names', default='', help='Comma separated names of Pokemons.')
+@click.option('--dump', type=click.Path(exists=True, dir_okay=False), help='JSON file with a list of Pokemons.')
+@click.option('--workers', default=8, show_default=True, help='Number of concurrent requests to the external API.')
+@click.option('--chunk-size', default=100, show_default=True, help='Number of Pokemons written at once.')
+@with_appcontext
+def warm_up_catalog(ids, names, dump, workers, chunk_size):
+    """
+    Preload Pokemons from the external API or a local dump into the database.
+    """
+
+    stats = warm_up(ids=ids, names=[name for name in names.split(',') if name], dump=dump, workers=workers,
+                    chunk_size=chunk_size)
+    click.echo(f"{stats['saved']} Pokemons saved in {stats['seconds']}s ({stats['per_second']}/s), "
+               f"{stats['skipped']} already stored, {stats['missing']} not found, {stats['failed']} failed.")
+
+
+@click.command('rebuild-encounter-stats')
+@click.option('--batch-size', default=1000, show_default=True, help='Number of counters inserted at once.')
+@with_appcontext
+def rebuild_encounter_stats(batch_size):
+    """
+    Recompute encounter counters per place, hour and day from all saved encounters.
+    """
+
+    written = rollups.rebuild(batch_size=batch_size)
+    click.echo(f'{written} encounter counters written.')
+
+
+@click.command('backfill-name-keys')
+@click.option('--batch-size', default=1000, show_default=True, help='Number of Pokemons updated at once.')
+@with_appcontext
+def backfill_pokemon_name_keys(batch_size):
+    """
+    Set normalized names of Pokemons saved before they were introduced.
+    """
+
+    stats = backfill_name_keys(batch_size=batch_size)
+    click.echo(f"{stats['updated']} Pokemons updated, {stats['conflicting']} with a name taken by another Pokemon.")
+
+
+@click.command('compact-sprites')
+@click.option('--batch-size', default=1000, show_default=True, help='Number of Pokemons updated at once.')
+@with_appcontext
+def compact_pokemon_sprites(batch_size):
+    """
+    Store sprites of Pokemons saved before as a mask of available variants.
+    """
+
+    compacted = compact_sprites(batch_size=batch_size)
+    click.echo(f'Sprites of {compacted} Pokemons compacted.')
+
+
+@click.command('add-alias')
+@click.argument('alias')
+@click.argument('pokemon')
+@with_appcontext
+def add_pokemon_alias(alias, pokemon):
+    """
+    Make ALIAS resolve to the stored POKEMON (name or id) in lookups by name.
+    """
+
+    try:
+        pokemon = PokemonService.add_alias(alias, pokemon)
+    except NonExistingPokemon:
+        raise click.ClickException(f'{pokemon} is not in the database.')
+
+    click.echo(f"{alias} is an alias of {pokemon['name']} now.")
+
+
+@click.command('build-mirror')
+@click.argument('database', type=click.Path(dir_okay=False))
+@click.argument('dumps', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+def build_mirror(database, dumps):
+    """
+    Write Pokemons from JSON DUMPS into SQLite DATABASE, usable as POKEMON_MIRROR_PATH.
+    """
+
+    pokemons = [pokemon for dump in dumps for pokemon in load_dump(dump)]
+    write_sqlite_mirror(database, pokemons)
+    click.echo(f'{len(pokemons)} Pokemons written to {database}.')
@@ -0,0 +1,94 @@
+"""
+Default settings of the PokemonAPI. Every value can be overridden with create_app(config=...).
+"""
+
+
+class DefaultConfig:
+
+    # Read-through cache of PokemonService lookups
+    POKEMON_CACHE_SIZE = 1024
+    POKEMON_CACHE_TTL = 300
+    # 'memory' keeps the cache in every process. 'sqlite' shares it between processes of a host (e.g. gunicorn
+    # workers) through POKEMON_CACHE_PATH database. 'redis' shares it between hosts through POKEMON_CACHE_URL server,
+    # requires redis package and leaves size limits to the server (POKEMON_CACHE_SIZE is ignored).
+    POKEMON_CACHE_BACKEND = 'memory'
+    POKEMON_CACHE_PATH = 'pokemon_cache.sqlite3'
+    POKEMON_CACHE_URL = 'redis://localhost:6379/0'
+
+    # Directory for lock files coalescing external API fetches between processes (e.g. gunicorn workers).
+    # If None, fetches are coalesced only between threads of a single process.
+    POKEMON_FETCH_LOCK_DIR = None
+
+    # Client of the external Pokemon API
+    POKEAPI_URL = 'https://pokeapi.co/api/v2'
+    POKEAPI_CONNECT_TIMEOUT = 3.05
+    POKEAPI_READ_TIMEOUT = 10
+    POKEAPI_RETRIES = 2
+    POKEAPI_BACKOFF = 0.2
+    POKEAPI_POOL_SIZE = 10
+    POKEAPI_BREAKER_THRESHOLD = 5
+    POKEAPI_BREAKER_COOLDOWN = 30
+
+    # Local mirror of the external API: JSON file with a list of Pokemons, directory of such files, or SQLite database
+    # written by api.backend.providers.write_sqlite_mirror. Pokemons missing in the mirror are fetched from the
+    # external API, unless POKEMON_MIRROR_FALLBACK is off.
+    POKEMON_MIRROR_PATH = None
+    POKEMON_MIRROR_FALLBACK = True
+
+    # Maximal number of concurrent external API fetches of a single batch lookup
+    POKEMON_BATCH_WORKERS = 8
+
+    # Pre-encoded (and compressed) response of the full Pokemon list, rebuilt in the background
+    # POKEMON_SNAPSHOT_DEBOUNCE seconds after Pokemons are added
+    POKEMON_SNAPSHOT_ENABLED = True
+    POKEMON_SNAPSHOT_DEBOUNCE = 1
+
+    # Stored Pokemons fetched from the external API more than POKEMON_REFRESH_TTL seconds ago are fetched again in
+    # the background when they're read, by at most POKEMON_REFRESH_WORKERS threads. None disables the refresh.
+    POKEMON_REFRESH_TTL = None
+    POKEMON_REFRESH_WORKERS = 2
+    POKEMON_REFRESH_QUEUE_SIZE = 100
+
+    # Names and ids confirmed as missing in the external API. With POKEMON_NEGATIVE_CACHE_PERSISTENT they are also
+    # stored in the database, so they survive restarts and are shared by all processes.
+    POKEMON_NEGATIVE_CACHE_SIZE = 10000
+    POKEMON_NEGATIVE_CACHE_TTL = 3600
+    POKEMON_NEGATIVE_CACHE_PERSISTENT = False
+
+    # Prometheus metrics of requests, database commands and external API calls
+    METRICS_ENABLED = True
+    METRICS_PATH = '/metrics'
+
+    # Server-Timing header with time spent in MongoDB, the external API, validation and marshalling, optionally also
+    # logged as a json line per request
+    SERVER_TIMING_ENABLED = True
+    SERVER_TIMING_LOG = False
+
+    # cProfile dumps of sampled requests, requests carrying PROFILING_HEADER with PROFILING_TOKEN, and requests slower
+    # than PROFILING_SLOW_THRESHOLD seconds. Setting the threshold makes every request profiled, which slows it down.
+    PROFILING_ENABLED = False
+    PROFILING_DIR = 'profiles'
+    PROFILING_SAMPLE_RATE = 0.0
+    PROFILING_HEADER = 'X-Profile'
+    PROFILING_TOKEN = None
+    PROFILING_SLOW_THRESHOLD = None
+    PROFILING_KEEP = 100
+
+    # Token bucket limits of clients as (requests per second, burst) pairs, None for no limit. RATE_LIMIT_DEFAULT
+    # applies to every route, unless RATE_LIMIT_ROUTES has a limit for it, e.g. {'POST /api/pokemon/batch': (1, 5)}.
+    # Requests which fetch a Pokemon from the external API also take a token from RATE_LIMIT_UPSTREAM of the client
+    # and RATE_LIMIT_UPSTREAM_TOTAL of all clients. With RATE_LIMIT_STORAGE (SQLite database file) the limits are
+    # shared by all processes of the host. Behind a proxy, RATE_LIMIT_CLIENT_HEADER tells client addresses apart.
+    RATE_LIMIT_ENABLED = False
+    RATE_LIMIT_STORAGE = None
+    RATE_LIMIT_DEFAULT = (10, 50)
+    RATE_LIMIT_ROUTES = {}
+    RATE_LIMIT_UPSTREAM = (0.5, 10)
+    RATE_LIMIT_UPSTREAM_TOTAL = (20, 50)
+    RATE_LIMIT_CLIENT_HEADER = None
+
+    # Accept encounter POSTs with 202 and write them to the database in batches, in background threads
+    ENCOUNTER_WRITE_BEHIND = False
+    ENCOUNTER_QUEUE_SIZE = 10000
+    ENCOUNTER_QUEUE_BATCH_SIZE = 500
+    ENCOUNTER_QUEUE_WORKERS = 1
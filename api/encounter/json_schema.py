@@ -1,4 +1,4 @@
-from flask_restx import fields
+from flask_restx import fields, Model
 
 encounter_post = {
     'place': fields.String(required=True),
@@ -10,3 +10,33 @@ encounter_get = {
     'note': fields.String(),
     'timestamp': fields.Integer(required=True)
 }
+
+MAX_BULK_SIZE = 1000
+
+encounter_bulk_post = {
+    'encounters': fields.List(fields.Raw(), required=True, min_items=1, max_items=MAX_BULK_SIZE,
+                              description="Encounters along with 'pokemon_id' of encountered Pokemon")
+}
+
+encounter_bulk_error = Model('EncounterBulkError', {
+    'index': fields.Integer(description='Position of the rejected record'),
+    'status': fields.Integer(description='400 for invalid record, 404 for non-existing Pokemon, 429 if too many '
+                                         'Pokemons were fetched by the client, 503 if the external API is '
+                                         'unavailable'),
+    'message': fields.String()
+})
+
+encounter_bulk_result = {
+    'inserted': fields.Integer(),
+    'errors': fields.List(fields.Nested(encounter_bulk_error))
+}
+
+encounter_count = Model('EncounterCount', {
+    'key': fields.Raw(description='Place, or timestamp of the beginning of the hour or day'),
+    'count': fields.Integer()
+})
+
+encounter_stats = {
+    'dimension': fields.String(enum=['place', 'hour', 'day']),
+    'counts': fields.List(fields.Nested(encounter_count))
+}
@@ -2,24 +2,58 @@ import logging
 from collections.abc import Mapping
 
 from flask import request
-from flask_restx import Resource, Namespace
+from flask_restx import Resource, Namespace, marshal, reqparse, inputs
 
 import api.encounter.json_schema as schema
 from api.backend import PokemonService
-from api.utils.exceptions import NonExistingPokemon, InvalidPayload
+from api.utils.conditional import conditional
+from api.utils.exceptions import NonExistingPokemon, InvalidPayload, UpstreamUnavailable, EncounterQueueFull
+from api.utils.metrics import record_error, STATUS_ERRORS
+from api.utils.serializer import Serializer
+from api.utils.timing import span
 
 encounter_api = Namespace('Encounters', description='Pokemon encounters', path='/pokemon', validate=True)
 
 model_encounter_post = encounter_api.model('EncounterPost', schema.encounter_post)
 model_encounter_get = encounter_api.model('EncounterGet', schema.encounter_get)
+model_encounter_bulk_post = encounter_api.model('EncounterBulkPost', schema.encounter_bulk_post)
+model_encounter_bulk_error = encounter_api.model('EncounterBulkError', schema.encounter_bulk_error)
+model_encounter_bulk_result = encounter_api.model('EncounterBulkResult', schema.encounter_bulk_result)
+model_encounter_count = encounter_api.model('EncounterCount', schema.encounter_count)
+model_encounter_stats = encounter_api.model('EncounterStats', schema.encounter_stats)
+
+serialize_encounter = Serializer(model_encounter_get, skip_none=True)
+
+MAX_STATS_SIZE = 1000
+
+encounter_stats_parser = reqparse.RequestParser()
+encounter_stats_parser.add_argument('dimension', choices=('place', 'hour', 'day'), location='args', default='place',
+                                    help='Count encounters per place, hour or day.')
+encounter_stats_parser.add_argument('since', type=int, location='args',
+                                    help='Return only hours or days ending after this timestamp.')
+encounter_stats_parser.add_argument('until', type=int, location='args',
+                                    help='Return only hours or days starting before this timestamp.')
+encounter_stats_parser.add_argument('limit', type=inputs.int_range(1, MAX_STATS_SIZE), location='args',
+                                    help=f'Maximal number of returned counters (1-{MAX_STATS_SIZE}).')
+
+
+def get_encounter_stats(pokemon_id=None):
+    args = encounter_stats_parser.parse_args()
+
+    counts = PokemonService.get_encounter_stats(args['dimension'], pokemon_id=pokemon_id, since=args['since'],
+                                                until=args['until'], limit=args['limit'])
+
+    with span('marshal'):
+        return marshal(dict(dimension=args['dimension'], counts=counts), model_encounter_stats)
 
 
 @encounter_api.route('/<id>/encounters')
 @encounter_api.doc(params={'id': 'Pokemon ID'})
 class Encounters(Resource):
 
-    @encounter_api.marshal_with(model_encounter_get, as_list=True, skip_none=True)
-    @encounter_api.response(200, model=model_encounter_get, description="Encounters successfully obtained.")
+    @conditional(lambda id: PokemonService.get_encounters_version(id))
+    @encounter_api.response(200, model=[model_encounter_get], description="Encounters successfully obtained.")
+    @encounter_api.response(304, description="Encounters didn't change since the version from If-None-Match header.")
     @encounter_api.doc(responses={404: "Pokemon with given ID doesn't exist in the database"})
     def get(self, id):
         """
@@ -27,20 +61,28 @@ class Encounters(Resource):
         """
 
         try:
-            encounters = PokemonService.get_all_encounters(pokemon_id=id)
+            encounters = PokemonService.get_all_encounters(pokemon_id=id, projection=serialize_encounter.projection)
         except NonExistingPokemon:
+            record_error('NonExistingPokemon')
             encounter_api.abort(404)
         else:
-            return encounters
+            with span('marshal'):
+                return serialize_encounter.many(encounters)
 
     @encounter_api.expect(model_encounter_post, validate=True)
     @encounter_api.doc(responses={201: 'Encounter was successfully attached to the Pokemon.',
+                                  202: 'Encounter was accepted and will be attached to the Pokemon in the background.',
                                   400: 'Payload has not met validation schema of Encounter object',
-                                  404: 'Pokemon was not found. Confirm if its name exists.'})
+                                  404: 'Pokemon was not found. Confirm if its name exists.',
+                                  429: 'Too many requests of the client, or too many Pokemons fetched from the '
+                                       'external API. Retry-After header tells when to try again.',
+                                  503: 'Pokemon is not in the database and the external API is unavailable, '
+                                       'or the server is overloaded with encounters.'})
     def post(self, id):
         """
         Attach new encounter to the Pokemon with given id.
         If pokemon doesn't exist in the database, it will be fetched from the external API.
+        If the server works in write-behind mode, valid encounter is accepted immediately and saved in the background.
         """
 
         encounter_json = request.get_json()
@@ -51,12 +93,33 @@ class Encounters(Resource):
         # Informing the server about the encounter
         logging.getLogger("PokemonAPI").info(f'Pokemon encounter has been posted to the server: {request.get_json()}')
 
+        if PokemonService.encounter_queue is not None:
+            try:
+                PokemonService.queue_pokemon_encounter(pokemon_id=id, encounter_json=encounter_json)
+            except InvalidPayload as exc:
+                record_error('InvalidPayload')
+                encounter_api.abort(400, message=exc.args[0])
+            except NonExistingPokemon:
+                record_error('NonExistingPokemon')
+                encounter_api.abort(404, message="Pokemon was never encountered.")
+            except EncounterQueueFull:
+                record_error('EncounterQueueFull')
+                return {'message': 'Too many encounters are waiting to be saved, try again later.'}, 503, \
+                       {'Retry-After': '1'}
+            else:
+                return None, 202
+
         try:
             PokemonService.add_pokemon_encounter(pokemon_id=id, encounter_json=encounter_json)
         except InvalidPayload as exc:
+            record_error('InvalidPayload')
             encounter_api.abort(400, message=exc.args[0])
         except NonExistingPokemon:
+            record_error('NonExistingPokemon')
             encounter_api.abort(404, message="Pokemon was never encountered.")
+        except UpstreamUnavailable:
+            record_error('UpstreamUnavailable')
+            encounter_api.abort(503, message="Pokemon is not in the database and external API is unavailable.")
         else:
             return None, 201
 
@@ -71,3 +134,67 @@ class Encounters(Resource):
     @encounter_api.hide
     def patch(self, id):
         encounter_api.abort(405)
+
+
+@encounter_api.route('/encounters')
+class EncountersBulk(Resource):
+
+    @encounter_api.expect(model_encounter_bulk_post, validate=True)
+    @encounter_api.response(201, model=model_encounter_bulk_result, description='All encounters were saved.')
+    @encounter_api.response(207, model=model_encounter_bulk_result, description='Some of encounters were rejected.')
+    @encounter_api.doc(responses={400: f'Payload must contain a list of 1-{schema.MAX_BULK_SIZE} encounters.'})
+    def post(self):
+        """
+        Save many encounters at once. Each of them has to carry 'pokemon_id' of encountered Pokemon.
+        Pokemons which don't exist in the database will be fetched from the external API.
+        Records which can't be saved are reported with their position, status and message.
+        """
+
+        json_data = request.get_json()
+
+        if not isinstance(json_data, Mapping):
+            encounter_api.abort(400, "Payload must be a JSON type.")
+
+        records = json_data['encounters']
+        errors = PokemonService.add_pokemon_encounters(records)
+
+        for error in errors:
+            record_error(STATUS_ERRORS[error['status']])
+        with span('marshal'):
+            result = marshal(dict(inserted=len(records) - len(errors), errors=errors), model_encounter_bulk_result)
+
+        return result, 207 if errors else 201
+
+
+@encounter_api.route('/<id>/encounters/stats')
+@encounter_api.doc(params={'id': 'Pokemon ID'})
+class EncounterStats(Resource):
+
+    @encounter_api.expect(encounter_stats_parser)
+    @encounter_api.response(200, model=model_encounter_stats, description="Encounter counters successfully obtained.")
+    @encounter_api.doc(responses={404: "Pokemon with given ID doesn't exist in the database"})
+    def get(self, id):
+        """
+        Return numbers of encounters of the Pokemon per place, hour or day.
+        Places are ordered from the most frequent one, hours and days chronologically.
+        """
+
+        try:
+            return get_encounter_stats(pokemon_id=id)
+        except NonExistingPokemon:
+            record_error('NonExistingPokemon')
+            encounter_api.abort(404)
+
+
+@encounter_api.route('/encounters/stats')
+class AllEncounterStats(Resource):
+
+    @encounter_api.expect(encounter_stats_parser)
+    @encounter_api.response(200, model=model_encounter_stats, description="Encounter counters successfully obtained.")
+    def get(self):
+        """
+        Return numbers of encounters of all Pokemons per place, hour or day.
+        Places are ordered from the most frequent one, hours and days chronologically.
+        """
+
+        return get_encounter_stats()
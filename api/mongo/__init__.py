@@ -1 +1,2 @@
-from .mongo_objects import Pokemon, Sprite, Encounter
+from .mongo_objects import Pokemon, PokemonAlias, Sprite, Encounter, MissingPokemon, Version, EncounterRollup, \
+    ensure_indexes
@@ -0,0 +1,136 @@
+"""
+Data migrations of documents saved with older versions of the schema
+"""
+
+import hashlib
+import logging
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from api.mongo.mongo_objects import Pokemon, Encounter, Sprite, Version
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def migrate_embedded_encounters(batch_size: int = 1000) -> int:
+    """
+    Move encounters embedded in Pokemon.encounters lists to the encounter collection and remove the lists afterwards.
+    Migrated encounters get ids derived from the Pokemon id and their position in the list, so an interrupted
+    migration can be safely run again without duplicating already moved encounters. Pokemon.encounter_count is set
+    to the number of encounters of the Pokemon in the collection.
+    :param batch_size: maximal number of encounters inserted in a single round trip
+    :return: number of encounters moved to the encounter collection
+    """
+
+    pokemon_collection = Pokemon._get_collection()
+    encounter_collection = Encounter._get_collection()
+    moved = 0
+
+    for pokemon in pokemon_collection.find({'encounters': {'$exists': True}}, {'encounters': 1}):
+        encounters = [
+            dict(encounter,
+                 _id=ObjectId(hashlib.md5(f"{pokemon['_id']}:{position}".encode()).digest()[:12]),
+                 pokemon_id=pokemon['_id'])
+            for position, encounter in enumerate(pokemon['encounters'])
+        ]
+
+        for start in range(0, len(encounters), batch_size):
+            try:
+                encounter_collection.insert_many(encounters[start:start + batch_size], ordered=False)
+            except BulkWriteError as exc:
+                if any(error['code'] != DUPLICATE_KEY_ERROR for error in exc.details['writeErrors']):
+                    raise
+
+        pokemon_collection.update_one({'_id': pokemon['_id']}, {
+            '$unset': {'encounters': ''},
+            '$set': {'encounter_count': encounter_collection.count_documents({'pokemon_id': pokemon['_id']})}
+        })
+        Version.bump(Version.ENCOUNTERS.format(pokemon['_id']))
+        moved += len(encounters)
+
+    logging.getLogger('PokemonAPI').info(f"{moved} embedded encounters moved to the encounter collection")
+
+    return moved
+
+
+def backfill_name_keys(batch_size: int = 1000) -> dict:
+    """
+    Set Pokemon.name_key of documents saved before it was introduced. Documents whose normalized name is already
+    taken by another Pokemon are left without it and logged.
+    :param batch_size: maximal number of documents updated in a single round trip
+    :return: dictionary with numbers of 'updated' and 'conflicting' Pokemons
+    """
+
+    collection = Pokemon._get_collection()
+    stats = dict(updated=0, conflicting=0)
+
+    def write(pokemons):
+        try:
+            stats['updated'] += collection.bulk_write(
+                [UpdateOne({'_id': pokemon['_id']}, {'$set': {'name_key': Pokemon.normalize_name(pokemon['name'])}})
+                 for pokemon in pokemons],
+                ordered=False
+            ).modified_count
+        except BulkWriteError as exc:
+            if any(error['code'] != DUPLICATE_KEY_ERROR for error in exc.details['writeErrors']):
+                raise
+
+            stats['updated'] += exc.details['nModified']
+            stats['conflicting'] += len(exc.details['writeErrors'])
+
+            for error in exc.details['writeErrors']:
+                logging.getLogger('PokemonAPI').warning(f"Name key of {pokemons[error['index']]['name']} is already "
+                                                        f"taken by another Pokemon")
+
+    batch = []
+    for pokemon in collection.find({'name_key': {'$exists': False}}, {'name': 1}).batch_size(batch_size):
+        batch.append(pokemon)
+
+        if len(batch) == batch_size:
+            write(batch)
+            batch = []
+
+    if batch:
+        write(batch)
+
+    return stats
+
+
+def compact_sprites(batch_size: int = 1000) -> int:
+    """
+    Replace full sprites of Pokemons saved before they were compacted with sprite_mask and sprite_overrides.
+    Both forms are served the same way, so the migration can run while the application is up.
+    :param batch_size: maximal number of documents updated in a single round trip
+    :return: number of compacted Pokemons
+    """
+
+    collection = Pokemon._get_collection()
+    compacted = 0
+
+    def write(pokemons):
+        operations = []
+        for pokemon in pokemons:
+            mask, overrides = Sprite.compact(pokemon['_id'], pokemon.get('sprites') or {})
+            operations.append(UpdateOne({'_id': pokemon['_id']},
+                                        {'$set': {'sprite_mask': mask, 'sprite_overrides': overrides},
+                                         '$unset': {'sprites': ''}}))
+
+        return collection.bulk_write(operations, ordered=False).modified_count
+
+    batch = []
+    query = {'sprites': {'$exists': True}, 'sprite_mask': {'$exists': False}}
+    for pokemon in collection.find(query, {'sprites': 1}).batch_size(batch_size):
+        batch.append(pokemon)
+
+        if len(batch) == batch_size:
+            compacted += write(batch)
+            batch = []
+
+    if batch:
+        compacted += write(batch)
+
+    logging.getLogger('PokemonAPI').info(f"Sprites of {compacted} Pokemons compacted")
+
+    return compacted
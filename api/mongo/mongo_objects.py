@@ -1,4 +1,8 @@
+import re
+from datetime import datetime
+
 import mongoengine as me
+from pymongo import UpdateOne
 
 
 class Sprite(me.EmbeddedDocument):
@@ -19,21 +23,193 @@ class Sprite(me.EmbeddedDocument):
         """
         return {sprite: sprite_url for sprite, sprite_url in sprite_dict.items() if sprite in cls._fields}
 
+    # Location of sprites of the external API. Bit n of Pokemon.sprite_mask means that the n-th variant is available
+    # under BASE_URL + pattern.
+    BASE_URL = 'https://raw.githubusercontent.com/PokeAPI/sprites/master/sprites/pokemon/'
+    URL_PATTERNS = {
+        'back_default': 'back/{}.png',
+        'back_female': 'back/female/{}.png',
+        'back_shiny': 'back/shiny/{}.png',
+        'back_shiny_female': 'back/shiny/female/{}.png',
+        'front_default': '{}.png',
+        'front_female': 'female/{}.png',
+        'front_shiny': 'shiny/{}.png',
+        'front_shiny_female': 'shiny/female/{}.png',
+    }
+
+    @classmethod
+    def compact(cls, pokemon_id: int, sprite_dict: dict) -> tuple:
+        """
+        Turn sprites of the Pokemon into a bitmask of variants available under their usual URLs, and a dictionary
+        of variants with other URLs.
+        :return: tuple of (mask, overrides)
+        """
+
+        mask, overrides = 0, {}
+
+        for bit, (sprite, pattern) in enumerate(cls.URL_PATTERNS.items()):
+            sprite_url = sprite_dict.get(sprite)
+
+            if sprite_url == cls.BASE_URL + pattern.format(pokemon_id):
+                mask |= 1 << bit
+            elif sprite_url is not None:
+                overrides[sprite] = sprite_url
+
+        return mask, overrides
+
+    @classmethod
+    def expand(cls, pokemon_id: int, mask: int, overrides: dict = None) -> dict:
+        """
+        Build dictionary of all sprites from the result of compact.
+        """
+
+        overrides = overrides or {}
+
+        return {sprite: cls.BASE_URL + pattern.format(pokemon_id) if mask >> bit & 1 else overrides.get(sprite)
+                for bit, (sprite, pattern) in enumerate(cls.URL_PATTERNS.items())}
 
-class Encounter(me.EmbeddedDocument):
 
+class Encounter(me.Document):
+
+    pokemon_id = me.IntField(required=True)
     note = me.StringField()
     place = me.StringField(required=True)
     timestamp = me.IntField(required=True)
 
+    meta = {"db_alias": "pokemon_api", 'collection': 'encounter', 'indexes': [('pokemon_id', 'timestamp')]}
+
 
 class Pokemon(me.Document):
     base_experience = me.IntField(required=True)
     height = me.IntField(required=True)
     id = me.IntField(me_field='id', primary_key=True)
     name = me.StringField(unique=True, required=True)
+    name_key = me.StringField()
+    sprite_mask = me.IntField()
+    sprite_overrides = me.DictField()
     sprites = me.EmbeddedDocumentField(Sprite)
     weight = me.IntField(required=True)
-    encounters = me.ListField(me.EmbeddedDocumentField(Encounter))
+    encounter_count = me.IntField(default=0)
+    fetched_at = me.DateTimeField()
+
+    # Sprites are stored in sprite_mask and sprite_overrides (see Sprite.compact). Documents saved before may still
+    # contain the full sprites, until api.mongo.migrations.compact_sprites converts them.
+    # Documents without fetched_at were saved before it was introduced, and are considered stale.
+    # Documents saved before encounters got their own collection may still contain an embedded 'encounters' list,
+    # until api.mongo.migrations.migrate_embedded_encounters moves it.
+    meta = {"db_alias": "pokemon_api", 'collection': 'pokemon', 'strict': False,
+            'indexes': [{'fields': ['name_key'], 'unique': True, 'sparse': True}]}
+
+    def clean(self):
+        self.name_key = self.normalize_name(self.name)
+
+    @staticmethod
+    def sprites_of(pokemon: dict) -> dict:
+        """
+        :param pokemon: raw Pokemon document
+        :return: dictionary of sprites of the Pokemon, whether they are stored compacted or not
+        """
+
+        if pokemon.get('sprite_mask') is None:
+            return pokemon.get('sprites')
+
+        return Sprite.expand(pokemon['_id'], pokemon['sprite_mask'], pokemon.get('sprite_overrides'))
+
+    @staticmethod
+    def normalize_name(name: str) -> str:
+        """
+        Turn any spelling of a Pokemon name into the form used by the external API, e.g. " Mr. Mime" into "mr-mime".
+        """
+
+        return re.sub(r"[\s_-]+", '-', re.sub(r"['.:]", '', str(name))).strip('-').casefold()
+
+
+class PokemonAlias(me.Document):
+    """
+    Alternate form of a Pokemon name, e.g. "nidoran♀" of "nidoran-f", stored in the normalized form.
+    """
+
+    id = me.StringField(primary_key=True)
+    pokemon_id = me.IntField(required=True)
+
+    meta = {"db_alias": "pokemon_api", 'collection': 'pokemon_alias'}
+
+
+class MissingPokemon(me.Document):
+    """
+    Name or id which doesn't exist in the external API. Expired documents are removed by the TTL index.
+    """
+
+    id = me.StringField(primary_key=True)
+    expires_at = me.DateTimeField(required=True)
+
+    meta = {"db_alias": "pokemon_api", 'collection': 'missing_pokemon',
+            'indexes': [{'fields': ['expires_at'], 'expireAfterSeconds': 0}]}
+
+
+class Version(me.Document):
+    """
+    Counter and modification time of a part of the data, e.g. the Pokemon list, used for conditional requests.
+    """
+
+    id = me.StringField(primary_key=True)
+    version = me.IntField(default=0)
+    modified = me.DateTimeField()
+
+    meta = {"db_alias": "pokemon_api", 'collection': 'version'}
+
+    # Keys of versioned data
+    POKEMONS = 'pokemons'
+    ENCOUNTERS = 'encounters:{}'
+
+    @classmethod
+    def get(cls, key: str) -> 'Version':
+        """
+        Return Version with given key. Data which was never modified has version 0 and no modification time.
+        """
+
+        return cls.objects(id=key).first() or cls(id=key)
+
+    @classmethod
+    def bump(cls, *keys: str):
+        """
+        Increment versions with given keys and set their modification time to now, with a single bulk write.
+        """
+
+        if keys:
+            now = datetime.utcnow().replace(microsecond=0)
+            cls._get_collection().bulk_write(
+                [UpdateOne({'_id': key}, {'$inc': {'version': 1}, '$set': {'modified': now}}, upsert=True)
+                 for key in keys],
+                ordered=False
+            )
+
+
+class EncounterRollup(me.Document):
+    """
+    Number of encounters of a Pokemon (or of all of them) per place, per hour or per day. Hour and day keys are
+    timestamps of the beginnings of their UTC periods.
+    """
+
+    scope = me.StringField(required=True)
+    dimension = me.StringField(required=True, choices=('place', 'hour', 'day'))
+    key = me.DynamicField(required=True)
+    count = me.IntField(default=0)
+
+    meta = {"db_alias": "pokemon_api", 'collection': 'encounter_rollup',
+            'indexes': [{'fields': ['scope', 'dimension', 'key'], 'unique': True}]}
+
+    # Scope of rollups counting encounters of all Pokemons
+    GLOBAL = 'global'
+
+    # Lengths in seconds of time periods of rollups
+    PERIODS = {'hour': 3600, 'day': 86400}
+
+
+def ensure_indexes():
+    """
+    Create indexes of all documents, so they are in place before the first request instead of the first use.
+    """
 
-    meta = {"db_alias": "pokemon_api", 'collection': 'pokemon'}
+    for document in (Pokemon, PokemonAlias, Encounter, MissingPokemon, Version, EncounterRollup):
+        document.ensure_indexes()
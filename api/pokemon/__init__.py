@@ -1 +1 @@
-from .routes import pokemon_api, Pokemons
+from .routes import pokemon_api, Pokemons, init_snapshot
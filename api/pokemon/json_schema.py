@@ -1,5 +1,7 @@
 from flask_restx import fields, Model
 
+from api.mongo import Pokemon
+
 pokemon_post = {
     'name': fields.String(required=True)
 }
@@ -15,11 +17,48 @@ pokemon_sprites = Model("Sprites", {
     "front_shiny_female": fields.String()
 })
 
+
+class Sprites(fields.Nested):
+    """
+    Sprites of a raw Pokemon document, expanded from sprite_mask and sprite_overrides if the document is compacted.
+    """
+
+    # Attributes of the document the sprites are built from
+    source_attributes = ('_id', 'sprite_mask', 'sprite_overrides', 'sprites')
+
+    @staticmethod
+    def source(document: dict) -> dict:
+        return Pokemon.sprites_of(document)
+
+    def output(self, key, obj, ordered=False, **kwargs):
+        return super().output(key, {key: self.source(obj)}, ordered=ordered, **kwargs)
+
+
 pokemon_get = {
     'base_experience': fields.Integer(),
     'height': fields.Integer(),
     'id': fields.Integer(attribute='_id'),
     'name': fields.String(),
-    'sprites': fields.Nested(pokemon_sprites),
+    'sprites': Sprites(pokemon_sprites),
     'weight': fields.Integer
 }
+
+
+class NameOrId(fields.Raw):
+    __schema_type__ = ['string', 'integer']
+
+
+MAX_BATCH_SIZE = 100
+
+pokemon_batch_post = {
+    'names': fields.List(NameOrId(), required=True, min_items=1, max_items=MAX_BATCH_SIZE,
+                         description='Names or ids of Pokemons')
+}
+
+pokemon_batch_get = {
+    'query': NameOrId(description='Requested name or id'),
+    'status': fields.Integer(description='200 if Pokemon was in the database, 201 if it was fetched from the external '
+                                         'API, 404 if it does not exist, 429 if too many Pokemons were fetched by the '
+                                         'client, 503 if the external API is unavailable'),
+    'pokemon': fields.Nested(Model('PokemonsGet', pokemon_get), allow_null=True)
+}
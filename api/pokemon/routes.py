@@ -1,35 +1,105 @@
+import json
 from collections.abc import Mapping
+from urllib.parse import urlencode
 
-from flask import request
-from flask_restx import Resource, Namespace, marshal
+from flask import current_app, g, request, Response, stream_with_context
+from flask_restx import Resource, Namespace, marshal, reqparse, inputs
 
 import api.pokemon.json_schema as schema
 from api.backend import PokemonService
-from api.utils.exceptions import NonExistingPokemon
+from api.utils.conditional import conditional
+from api.utils.exceptions import NonExistingPokemon, UpstreamUnavailable
+from api.utils.metrics import record_error, STATUS_ERRORS
+from api.utils.serializer import Serializer
+from api.utils.snapshot import EncodedSnapshot
+from api.utils.timing import span
 
 pokemon_api = Namespace('Pokemons', description='Pokemon details', path='/api/pokemon', validate=True)
 
 model_pokemon_post = pokemon_api.model('PokemonsPost', schema.pokemon_post)
 model_pokemon_sprites = pokemon_api.model('Sprites', schema.pokemon_sprites)
 model_pokemon_get = pokemon_api.model('PokemonsGet', schema.pokemon_get)
+model_pokemon_batch_post = pokemon_api.model('PokemonsBatchPost', schema.pokemon_batch_post)
+model_pokemon_batch_get = pokemon_api.model('PokemonsBatchGet', schema.pokemon_batch_get)
+
+# Raw documents of list responses skip mongoengine and marshal, and are serialized with the precompiled model
+serialize_pokemon = Serializer(model_pokemon_get)
+
+MAX_PAGE_SIZE = 1000
+
+
+def init_snapshot(app):
+    """
+    Serve the full Pokemon list of the application from a pre-encoded snapshot, according to POKEMON_SNAPSHOT_*
+    settings. The snapshot is rebuilt in the background whenever Pokemons are saved.
+    :param app: Flask application instance
+    """
+
+    if app.config['POKEMON_SNAPSHOT_ENABLED']:
+        app.extensions['pokemon_snapshot'] = snapshot = EncodedSnapshot(
+            build=lambda: serialize_pokemon.many(PokemonService.iter_pokemons(projection=serialize_pokemon.projection)),
+            get_version=lambda: PokemonService.get_pokemons_version().version,
+            debounce=app.config['POKEMON_SNAPSHOT_DEBOUNCE']
+        )
+        PokemonService.on_pokemons_saved.append(snapshot.schedule)
+
+
+pokemon_list_parser = reqparse.RequestParser()
+pokemon_list_parser.add_argument('limit', type=inputs.int_range(1, MAX_PAGE_SIZE), location='args',
+                                 help=f'Maximal number of returned Pokemons (1-{MAX_PAGE_SIZE}).')
+pokemon_list_parser.add_argument('after_id', type=int, location='args',
+                                 help='Return only Pokemons with id greater than given one.')
+pokemon_list_parser.add_argument('stream', type=inputs.boolean, location='args', default=False,
+                                 help='Stream Pokemons as newline delimited JSON.')
 
 
 @pokemon_api.route("/")
 class Pokemons(Resource):
 
-    @pokemon_api.marshal_with(model_pokemon_get, as_list=True, code=200)
-    @pokemon_api.response(200, model=model_pokemon_get, description="All pokemons saved in the database successfully "
-                                                                    "returned.")
+    @conditional(PokemonService.get_pokemons_version)
+    @pokemon_api.expect(pokemon_list_parser)
+    @pokemon_api.response(200, model=[model_pokemon_get], description="All pokemons saved in the database "
+                                                                      "successfully returned.")
+    @pokemon_api.response(304, description="Pokemons didn't change since the version from If-None-Match header.")
     def get(self):
         """
         Return a list of all pokemons in the database. If there is none Pokemons in the database, return empty list.
+        The list can be paginated with limit and after_id parameters. If the page is full, Link header points to the
+        next one. With stream=true Pokemons are sent one by one as newline delimited JSON. The whole list is sent
+        from a pre-encoded snapshot, compressed with brotli or gzip if the client accepts it.
         """
-        return PokemonService.get_all_pokemons()
+        args = pokemon_list_parser.parse_args()
+
+        if args['stream']:
+            pokemons = PokemonService.iter_pokemons(limit=args['limit'], after_id=args['after_id'],
+                                                    projection=serialize_pokemon.projection)
+            lines = (json.dumps(serialize_pokemon(pokemon)) + '\n' for pokemon in pokemons)
+            return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+
+        snapshot = current_app.extensions.get('pokemon_snapshot')
+        if snapshot is not None and args['limit'] is None and args['after_id'] is None:
+            response = snapshot.response(g.version.version)
+            if response is not None:
+                return response
+
+        pokemons = PokemonService.get_all_pokemons(limit=args['limit'], after_id=args['after_id'],
+                                                   projection=serialize_pokemon.projection)
+
+        headers = {}
+        if args['limit'] is not None and len(pokemons) == args['limit']:
+            next_page = urlencode(dict(limit=args['limit'], after_id=pokemons[-1]['_id']))
+            headers['Link'] = f'<{request.base_url}?{next_page}>; rel="next"'
+
+        with span('marshal'):
+            return serialize_pokemon.many(pokemons), 200, headers
 
     @pokemon_api.expect(model_pokemon_post, validate=True)
     @pokemon_api.doc(responses={200: 'Pokemon with posted name exists in the database and was returned to the client',
                                 201: 'Pokemon with posted name was created in the database.',
-                                404: 'Pokemon was not found. Confirm if its name exists.'})
+                                404: 'Pokemon was not found. Confirm if its name exists.',
+                                429: 'Too many requests of the client, or too many Pokemons fetched from the external '
+                                     'API. Retry-After header tells when to try again.',
+                                503: 'Pokemon is not in the database and the external API is unavailable.'})
     def post(self):
         """
         Return the pokemon from the database or fetch it from the external api and save to the database.
@@ -40,14 +110,22 @@ class Pokemons(Resource):
             pokemon_api.abort(400, "Payload must be a JSON type.")
 
         try:
-            return marshal(PokemonService.get_by_name(json_data['name']), model_pokemon_get), 200
+            pokemon = PokemonService.get_by_name(json_data['name'])
         except NonExistingPokemon:
             try:
                 PokemonService.add_pokemon_from_external_api(json_data['name'])
             except NonExistingPokemon:
+                record_error('NonExistingPokemon')
                 pokemon_api.abort(404, f"{json_data['name']} was not found in the database and external API.")
+            except UpstreamUnavailable:
+                record_error('UpstreamUnavailable')
+                pokemon_api.abort(503, f"{json_data['name']} was not found in the database and external API is "
+                                       f"unavailable.")
             return None, 201
 
+        with span('marshal'):
+            return marshal(pokemon, model_pokemon_get), 200
+
     @pokemon_api.hide
     def delete(self):
         pokemon_api.abort(405)
@@ -59,3 +137,30 @@ class Pokemons(Resource):
     @pokemon_api.hide
     def patch(self):
         pokemon_api.abort(405)
+
+
+@pokemon_api.route("/batch")
+class PokemonsBatch(Resource):
+
+    @pokemon_api.expect(model_pokemon_batch_post, validate=True)
+    @pokemon_api.response(200, model=[model_pokemon_batch_get], description='Pokemons in the order of the payload.')
+    @pokemon_api.doc(responses={400: f'Payload must contain a list of 1-{schema.MAX_BATCH_SIZE} names or ids.'})
+    def post(self):
+        """
+        Return many pokemons at once, in the order of posted names or ids.
+        Pokemons missing in the database are fetched from the external api concurrently. Every item of the response
+        carries its own status code.
+        """
+        json_data = request.get_json()
+
+        if not isinstance(json_data, Mapping):
+            pokemon_api.abort(400, "Payload must be a JSON type.")
+
+        pokemons = PokemonService.get_many(json_data['names'])
+
+        for pokemon in pokemons:
+            if pokemon['status'] in STATUS_ERRORS:
+                record_error(STATUS_ERRORS[pokemon['status']])
+
+        with span('marshal'):
+            return marshal(pokemons, model_pokemon_batch_get), 200
@@ -0,0 +1,81 @@
+"""
+Conditional GET support - ETag and Last-Modified headers and 304 Not Modified responses
+"""
+
+import hashlib
+from datetime import timezone
+from functools import wraps
+
+from flask import g, request, Response
+from flask_restx.utils import unpack
+from werkzeug.http import http_date, quote_etag
+
+
+def conditional(get_version):
+    """
+    Decorator of Resource methods serving versioned data.
+    If the client already has the current representation, 304 response is returned before the method is called,
+    so no document is loaded or marshalled. Otherwise ETag and Last-Modified headers are added to the response.
+    It has to be applied on top of marshalling decorators.
+    :param get_version: function called with keyword arguments of the decorated method, returning Version object
+    of the served data. The object is available to the decorated method as flask.g.version. If it returns None,
+    e.g. for an invalid id, or a version which was never bumped, the method is called without conditional handling.
+    """
+
+    def decorator(method):
+
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            version = g.version = get_version(**kwargs)
+
+            # Data which was never modified has no version to tell its representations apart
+            if version is None or not version.version:
+                return method(*args, **kwargs)
+
+            # Query string is a part of the tag, as it selects a different representation, e.g. another page
+            etag = hashlib.md5(f'{version.id}:{version.version}:{request.query_string.decode()}'.encode()).hexdigest()
+            headers = {'ETag': quote_etag(etag, weak=True)}
+
+            if version.modified:
+                headers['Last-Modified'] = http_date(version.modified.replace(tzinfo=timezone.utc))
+
+            if _is_not_modified(etag, version.modified):
+                return Response(status=304, headers=headers)
+
+            result = method(*args, **kwargs)
+
+            if isinstance(result, Response):
+                if result.status_code == 200:
+                    result.headers.extend(headers)
+                return result
+
+            data, code, result_headers = unpack(result)
+
+            if code == 200:
+                result_headers = dict(headers, **result_headers)
+
+            return data, code, result_headers
+
+        return wrapper
+
+    return decorator
+
+
+def _is_not_modified(etag: str, modified) -> bool:
+    """
+    Check If-None-Match and If-Modified-Since headers of the current request. If-None-Match takes precedence, as
+    Last-Modified has a resolution of a second and several writes may share it.
+    """
+
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+
+    since = request.if_modified_since
+
+    if since and modified:
+        if since.tzinfo:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        # Modified in the second of the header may be newer than the representation of the client
+        return modified < since
+
+    return False
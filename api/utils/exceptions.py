@@ -9,3 +9,19 @@ class NonExistingPokemon(LookupError):
 
 class InvalidPayload(AttributeError):
     pass
+
+
+class UpstreamUnavailable(ConnectionError):
+    pass
+
+
+class EncounterQueueFull(OverflowError):
+    pass
+
+
+class RateLimited(RuntimeError):
+
+    def __init__(self, retry_after: float):
+        super().__init__(retry_after)
+        # Number of seconds after which the request would be allowed
+        self.retry_after = retry_after
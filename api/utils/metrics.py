@@ -0,0 +1,132 @@
+"""
+Prometheus metrics of requests, MongoDB commands and external API calls, exposed at /metrics.
+
+With several gunicorn workers, PROMETHEUS_MULTIPROC_DIR environment variable has to point to an empty directory
+shared by the workers (see gunicorn.conf.py), so /metrics aggregates the values of all of them.
+"""
+
+import os
+import threading
+import time
+
+from flask import Response, g, request
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, \
+    Histogram, generate_latest, multiprocess
+from pymongo import monitoring
+
+REQUEST_LATENCY = Histogram('pokemon_api_request_duration_seconds', 'Latency of HTTP requests',
+                            ['namespace', 'route', 'method', 'status'])
+
+MONGO_LATENCY = Histogram('pokemon_api_mongo_command_duration_seconds', 'Latency of MongoDB commands',
+                          ['command', 'collection', 'outcome'],
+                          buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, float('inf')))
+
+UPSTREAM_LATENCY = Histogram('pokemon_api_upstream_request_duration_seconds',
+                             'Latency of single HTTP requests to the external API', ['status'])
+
+UPSTREAM_FETCHES = Histogram('pokemon_api_upstream_fetch_duration_seconds',
+                             'Latency of fetching a Pokemon from the external API, including retries and waiting for '
+                             'concurrent fetches', ['outcome'])
+
+REFRESHES = Counter('pokemon_api_refreshes_total', 'Background refreshes of stored Pokemons', ['outcome'])
+
+UPSTREAM_ERRORS = Counter('pokemon_api_upstream_errors_total', 'Failed requests to the external API', ['reason'])
+
+ERRORS = Counter('pokemon_api_errors_total', 'Errors reported to clients', ['error'])
+
+QUEUED_ENCOUNTERS = Counter('pokemon_api_queued_encounters_total', 'Encounters of the write-behind queue',
+                            ['outcome'])
+
+ENCOUNTER_QUEUE_DEPTH = Gauge('pokemon_api_encounter_queue_depth', 'Encounters waiting in the write-behind queue',
+                              multiprocess_mode='livesum')
+
+RATE_LIMITED = Counter('pokemon_api_rate_limited_total', 'Requests rejected by rate limits', ['budget', 'route'])
+
+# Error names of statuses reported per item by the batch and bulk endpoints
+STATUS_ERRORS = {400: 'InvalidPayload', 404: 'NonExistingPokemon', 429: 'RateLimited', 503: 'UpstreamUnavailable'}
+
+
+def init_app(app, api):
+    """
+    Measure requests of the application and expose the metrics at METRICS_PATH. No-op if METRICS_ENABLED is off.
+    :param app: Flask application instance
+    :param api: flask_restx Api with already added namespaces, used for the namespace label
+    """
+
+    if not app.config['METRICS_ENABLED']:
+        return
+
+    namespaces = {resource.resource: namespace.name for namespace in api.namespaces
+                  for resource in namespace.resources}
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        started = g.pop('request_started', None)
+
+        if started is not None:
+            view = app.view_functions.get(request.endpoint)
+            REQUEST_LATENCY.labels(namespace=namespaces.get(getattr(view, 'view_class', None), ''),
+                                   route=request.url_rule.rule if request.url_rule else 'unmatched',
+                                   method=request.method,
+                                   status=response.status_code).observe(time.perf_counter() - started)
+
+        return response
+
+    app.add_url_rule(app.config['METRICS_PATH'], 'metrics', metrics)
+
+
+def metrics():
+    """
+    Render all metrics in the Prometheus text format, aggregated over all processes in multiprocess mode.
+    """
+
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ or 'prometheus_multiproc_dir' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def record_error(error: str, count: int = 1):
+    """
+    Count an error reported to the client, e.g. NonExistingPokemon turned into 404 response.
+    :param error: name of the error
+    """
+
+    ERRORS.labels(error=error).inc(count)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """
+    Observe duration of every command sent by pymongo clients.
+    """
+
+    def __init__(self):
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+
+        with self._lock:
+            self._collections[(event.connection_id, event.request_id)] = \
+                collection if isinstance(collection, str) else ''
+
+    def succeeded(self, event):
+        self._observe(event, 'success')
+
+    def failed(self, event):
+        self._observe(event, 'failure')
+
+    def _observe(self, event, outcome):
+        with self._lock:
+            collection = self._collections.pop((event.connection_id, event.request_id), '')
+
+        MONGO_LATENCY.labels(command=event.command_name, collection=collection,
+                             outcome=outcome).observe(event.duration_micros / 1e6)
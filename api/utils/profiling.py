@@ -0,0 +1,98 @@
+"""
+Opt-in cProfile profiling of single requests, written as pstats files per route.
+
+A request is profiled if it's sampled (PROFILING_SAMPLE_RATE), or carries PROFILING_HEADER with PROFILING_TOKEN.
+With PROFILING_SLOW_THRESHOLD every request is profiled, and the ones slower than the threshold are kept as well.
+Files can be read with pstats, snakeviz, flameprof or gprof2dot.
+"""
+
+import cProfile
+import hmac
+import logging
+import os
+import random
+import re
+import time
+
+from flask import g, request
+
+
+def init_app(app):
+    """
+    Profile requests of the application according to PROFILING_* settings. No-op if PROFILING_ENABLED is off.
+    :param app: Flask application instance
+    """
+
+    if not app.config['PROFILING_ENABLED']:
+        return
+
+    directory = app.config['PROFILING_DIR']
+    sample_rate = app.config['PROFILING_SAMPLE_RATE']
+    header, token = app.config['PROFILING_HEADER'], app.config['PROFILING_TOKEN']
+    slow_threshold = app.config['PROFILING_SLOW_THRESHOLD']
+    keep = app.config['PROFILING_KEEP']
+
+    @app.before_request
+    def start_profiler():
+        reason = None
+
+        # Compared as bytes, as compare_digest doesn't accept non-ASCII strings
+        if token and hmac.compare_digest(request.headers.get(header, '').encode(), token.encode()):
+            reason = 'requested'
+        elif sample_rate and random.random() < sample_rate:
+            reason = 'sampled'
+        elif slow_threshold is None:
+            return
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active, e.g. in a concurrent request on Python 3.12+
+            return
+
+        g.profiling = (profiler, reason, time.perf_counter())
+
+    @app.after_request
+    def stop_profiler(response):
+        profiling = g.pop('profiling', None)
+
+        if profiling is None:
+            return response
+
+        profiler, reason, started = profiling
+        profiler.disable()
+        elapsed = time.perf_counter() - started
+
+        if reason is None and elapsed >= slow_threshold:
+            reason = 'slow'
+
+        if reason is not None:
+            path = _dump(profiler, directory, elapsed, reason, keep)
+            logging.getLogger('PokemonAPI').info(f'{request.method} {request.path} took {elapsed * 1000:.1f}ms, '
+                                                 f'profile saved to {path}')
+
+        return response
+
+
+def _dump(profiler, directory: str, elapsed: float, reason: str, keep: int) -> str:
+    """
+    Write profile into the directory of the current route, removing the oldest ones above keep files.
+    :return: path of the written file
+    """
+
+    rule = request.url_rule.rule if request.url_rule else 'unmatched'
+    route_directory = os.path.join(directory, f"{request.method}_{re.sub(r'[^0-9A-Za-z]+', '_', rule).strip('_')}")
+    os.makedirs(route_directory, exist_ok=True)
+
+    path = os.path.join(route_directory, f'{time.time_ns()}-{reason}-{elapsed * 1000:.0f}ms-{os.getpid()}.pstats')
+    profiler.dump_stats(path)
+
+    profiles = sorted(os.listdir(route_directory))
+    for name in profiles[:max(0, len(profiles) - keep)]:
+        try:
+            os.remove(os.path.join(route_directory, name))
+        except FileNotFoundError:  # Removed by another process
+            pass
+
+    return path
@@ -0,0 +1,230 @@
+"""
+Token bucket rate limits of clients, per route and for requests which have to fetch Pokemons from the external API.
+
+Every limit is a (rate, burst) pair: a bucket holds up to burst tokens, refilled at rate tokens per second, and every
+request takes one. With RATE_LIMIT_STORAGE the buckets are kept in a SQLite database, so they are shared by all
+processes of the host (e.g. gunicorn workers). Otherwise every process counts separately.
+"""
+
+import math
+import threading
+import time
+
+from flask import current_app, has_request_context, jsonify, request
+
+from api.utils.exceptions import RateLimited
+from api.utils.metrics import RATE_LIMITED, record_error
+from api.utils.sqlite import LocalConnection
+
+# Buckets are pruned once per this many taken tokens
+PRUNE_INTERVAL = 1000
+
+
+def init_app(app, api):
+    """
+    Apply RATE_LIMIT_* settings to requests of the application. No-op if RATE_LIMIT_ENABLED is off.
+    :param app: Flask application instance
+    :param api: flask_restx Api, whose error handler turns RateLimited errors into 429 responses
+    """
+
+    if not app.config['RATE_LIMIT_ENABLED']:
+        return
+
+    storage = app.config['RATE_LIMIT_STORAGE']
+    app.extensions['rate_limit'] = limiter = RateLimiter(
+        buckets=SQLiteBuckets(storage) if storage else MemoryBuckets(),
+        default=app.config['RATE_LIMIT_DEFAULT'],
+        routes=app.config['RATE_LIMIT_ROUTES'],
+        upstream=app.config['RATE_LIMIT_UPSTREAM'],
+        upstream_total=app.config['RATE_LIMIT_UPSTREAM_TOTAL'],
+        client_header=app.config['RATE_LIMIT_CLIENT_HEADER']
+    )
+
+    @app.before_request
+    def limit_route():
+        try:
+            limiter.check_route()
+        except RateLimited as exc:
+            data, code, headers = too_many_requests(exc)
+            return jsonify(data), code, headers
+
+    @api.errorhandler(RateLimited)
+    def handle_rate_limited(exc):
+        return too_many_requests(exc)
+
+
+def check_upstream():
+    """
+    Take a token from the external API budgets of the current client. Raise RateLimited error if any of them is
+    empty. Ignored outside of requests (e.g. in management commands) and if rate limits are disabled.
+    """
+
+    if has_request_context():
+        limiter = current_app.extensions.get('rate_limit')
+
+        if limiter is not None:
+            limiter.check_upstream()
+
+
+def too_many_requests(exc: RateLimited) -> tuple:
+    """
+    :return: data, status code and headers of 429 response telling the client when to try again
+    """
+
+    record_error('RateLimited')
+
+    return {'message': 'Too many requests, try again later.'}, 429, \
+        {'Retry-After': str(max(1, math.ceil(exc.retry_after)))}
+
+
+class RateLimiter:
+
+    def __init__(self, buckets, default: tuple = None, routes: dict = None, upstream: tuple = None,
+                 upstream_total: tuple = None, client_header: str = None):
+        """
+        :param buckets: MemoryBuckets or SQLiteBuckets
+        :param default: limit of every client on every route, None for no limit
+        :param routes: limits of every client on given routes, e.g. {'POST /api/pokemon/': (1, 10)}. Routes are
+        the method and the rule of the route, so all Pokemons share the limit of '/pokemon/<id>/encounters'.
+        :param upstream: limit of every client on requests fetching a Pokemon from the external API
+        :param upstream_total: limit of all clients together on requests fetching a Pokemon from the external API
+        :param client_header: header with the client address added by a proxy, e.g. X-Forwarded-For on Heroku.
+        The last address is used, as the previous ones are sent by the client. Without it, the address of the
+        connection is used.
+        """
+
+        self.buckets = buckets
+        self.default = default
+        self.routes = routes or {}
+        self.upstream = upstream
+        self.upstream_total = upstream_total
+        self.client_header = client_header
+
+    def client(self) -> str:
+        if self.client_header and request.headers.get(self.client_header):
+            return request.headers[self.client_header].split(',')[-1].strip()
+
+        return request.remote_addr or 'unknown'
+
+    def check_route(self):
+        """
+        Take a token from the route budget of the current client. Raise RateLimited error if it's empty.
+        """
+
+        if request.url_rule is None:
+            return
+
+        route = f'{request.method} {request.url_rule.rule}'
+        self._take('route', route, f'route:{self.client()}:{route}', self.routes.get(route, self.default))
+
+    def check_upstream(self):
+        """
+        Take a token from the external API budgets of the current client and of all clients. Raise RateLimited
+        error if any of them is empty.
+        """
+
+        route = f'{request.method} {request.url_rule.rule}' if request.url_rule else 'unmatched'
+        self._take('upstream', route, f'upstream:{self.client()}', self.upstream)
+        self._take('upstream_total', route, 'upstream', self.upstream_total)
+
+    def _take(self, budget: str, route: str, key: str, limit: tuple):
+        if limit is None:
+            return
+
+        retry_after = self.buckets.take(key, *limit)
+
+        if retry_after:
+            RATE_LIMITED.labels(budget=budget, route=route).inc()
+            raise RateLimited(retry_after)
+
+
+class MemoryBuckets:
+    """
+    Token buckets of a single process.
+    """
+
+    def __init__(self):
+        self._buckets = {}
+        self._taken = 0
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        """
+        Take a token from the bucket with given key.
+        :return: 0 if the token was taken, otherwise number of seconds until the bucket has one
+        """
+
+        now = time.time()
+
+        with self._lock:
+            tokens, updated_at, _ = self._buckets.get(key, (burst, now, now))
+            tokens, retry_after = _take(tokens, now - updated_at, rate, burst)
+            self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+
+            self._taken += 1
+            if self._taken % PRUNE_INTERVAL == 0:
+                # Full buckets are equal to missing ones
+                self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[2] > now}
+
+        return retry_after
+
+
+class SQLiteBuckets:
+    """
+    Token buckets kept in SQLite database in WAL mode, shared by all processes of a host.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: file of the database, created if it doesn't exist
+        """
+
+        self.path = path
+        self._connection = LocalConnection(path)
+        self._taken = 0
+
+        self._connection.get().execute('CREATE TABLE IF NOT EXISTS rate_limit '
+                                   '(key TEXT PRIMARY KEY, tokens REAL, updated_at REAL, full_at REAL)')
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        """
+        Take a token from the bucket with given key. Concurrent calls of all processes are serialized.
+        :return: 0 if the token was taken, otherwise number of seconds until the bucket has one
+        """
+
+        connection = self._connection.get()
+        connection.execute('BEGIN IMMEDIATE')
+
+        try:
+            now = time.time()
+            row = connection.execute('SELECT tokens, updated_at FROM rate_limit WHERE key = ?', (key,)).fetchone()
+            tokens, updated_at = row if row is not None else (burst, now)
+
+            tokens, retry_after = _take(tokens, now - updated_at, rate, burst)
+            connection.execute('INSERT OR REPLACE INTO rate_limit VALUES (?, ?, ?, ?)',
+                               (key, tokens, now, now + (burst - tokens) / rate))
+
+            self._taken += 1
+            if self._taken % PRUNE_INTERVAL == 0:
+                connection.execute('DELETE FROM rate_limit WHERE full_at < ?', (now,))
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+        connection.execute('COMMIT')
+
+        return retry_after
+
+
+def _take(tokens: float, elapsed: float, rate: float, burst: float) -> tuple:
+    """
+    :return: tuple of tokens left in the refilled bucket and 0 if a token was taken, or number of seconds until
+    the bucket has one
+    """
+
+    tokens = min(burst, tokens + max(elapsed, 0) * rate)
+
+    if tokens >= 1:
+        return tokens - 1, 0
+
+    return tokens, (1 - tokens) / rate
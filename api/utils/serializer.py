@@ -0,0 +1,110 @@
+"""
+Precompiled equivalent of flask_restx.marshal for raw documents read straight from pymongo
+"""
+
+from flask_restx import fields
+
+# Field types whose formatting is a plain conversion of the stored value
+_CONVERTERS = {fields.String: str, fields.Integer: int}
+
+
+class Serializer:
+
+    def __init__(self, model: dict, skip_none: bool = False):
+        """
+        Resolve given flask_restx model once, so serializing a document is a loop over prepared getters instead of
+        a field by field walk of the model.
+        :param model: flask_restx model or dictionary of fields, e.g. api.pokemon.json_schema.pokemon_get
+        :param skip_none: drop keys with None values, like marshal(..., skip_none=True)
+        """
+
+        self.skip_none = skip_none
+        self._fields = [(key, _compile(key, field)) for key, field in model.items()]
+
+        # Only top level attributes read by the model have to be fetched from the database
+        self._projection = {root: 1 for key, field in model.items() if isinstance(_attribute(key, field), str)
+                            for root in getattr(field, 'source_attributes', (_attribute(key, field).split('.')[0],))}
+        self._projection.setdefault('_id', 0)
+
+    @property
+    def projection(self) -> dict:
+        """
+        :return: projection of the attributes read by the model. A new dictionary is returned every time, as drivers
+        may modify it during the query, e.g. mongomock, and queries run concurrently in requests and background threads.
+        """
+
+        return dict(self._projection)
+
+    def __call__(self, document) -> dict:
+        """
+        :param document: raw document, e.g. returned by pymongo or QuerySet.as_pymongo()
+        :return: dictionary equal to marshal(document, model)
+        """
+
+        if self.skip_none:
+            output = {}
+            for key, getter in self._fields:
+                value = getter(document)
+                if value is not None and value != {}:
+                    output[key] = value
+            return output
+
+        return {key: getter(document) for key, getter in self._fields}
+
+    def many(self, documents) -> list:
+        """
+        :param documents: iterable of raw documents
+        :return: list of serialized documents
+        """
+
+        return [self(document) for document in documents]
+
+
+def _attribute(key, field):
+    field = field() if isinstance(field, type) else field
+    return key if field.attribute is None else field.attribute
+
+
+def _compile(key, field):
+    """
+    :return: function returning the marshalled value of the field from a raw document
+    """
+
+    if isinstance(field, type):
+        field = field()
+
+    attribute = _attribute(key, field)
+
+    # Dotted and callable attributes, masks and unknown field types keep the original, slower implementation
+    if not isinstance(attribute, str) or '.' in attribute or getattr(field, 'mask', None):
+        return lambda document: field.output(key, document)
+
+    if isinstance(field, fields.Nested):
+        nested = Serializer(field.nested, skip_none=field.skip_none)
+        # Fields built from several attributes of the document, e.g. api.pokemon.json_schema.Sprites
+        source = getattr(field, 'source', None) or (lambda document: document.get(attribute))
+
+        def nested_getter(document):
+            value = source(document)
+            if value is None:
+                if field.allow_null:
+                    return None
+                if field.default is not None:
+                    return field.default
+                return nested({})
+            return nested(value)
+
+        return nested_getter
+
+    convert = _CONVERTERS.get(type(field))
+
+    if convert is None or getattr(field, 'enum', None) or callable(field.default):
+        return lambda document: field.output(key, document)
+
+    default = field.output(key, {})
+
+    def getter(document):
+        value = document.get(attribute)
+        return default if value is None else convert(value)
+
+    return getter
@@ -0,0 +1,129 @@
+"""
+Pre-encoded JSON response of versioned data, kept with gzip and brotli variants, so serving it is a byte copy
+"""
+
+import gzip
+import json
+import logging
+import threading
+from typing import Callable, NamedTuple, Optional
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # Optional, without it only gzip variant is kept
+    brotli = None
+
+
+class Snapshot(NamedTuple):
+    version: int
+    # Encoded bodies by Content-Encoding, in the order of preference
+    bodies: dict
+
+    @classmethod
+    def encode(cls, version: int, data) -> 'Snapshot':
+        identity = json.dumps(data).encode() + b'\n'
+        bodies = {}
+
+        # Snapshot is encoded again after every write, so the levels favour speed over the last few percent of size
+        if brotli is not None:
+            bodies['br'] = brotli.compress(identity, quality=5)
+        bodies['gzip'] = gzip.compress(identity, compresslevel=6, mtime=0)
+        bodies['identity'] = identity
+
+        return cls(version, bodies)
+
+
+class EncodedSnapshot:
+
+    def __init__(self, build: Callable, get_version: Callable[[], int], debounce: float = 1):
+        """
+        Snapshot is never built by requests. It's rebuilt in a background thread debounce seconds after it was
+        scheduled, by a modification of the data (see schedule) or by a request which found it outdated, so a burst
+        of modifications is encoded only once. Requests are served without the snapshot in the meantime.
+        :param build: function returning data of the response, e.g. list of serialized Pokemons
+        :param get_version: function returning current version of the data
+        :param debounce: number of seconds between scheduling and rebuilding the snapshot
+        """
+
+        self._build = build
+        self._get_version = get_version
+        self.debounce = debounce
+
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._timer = None
+        self._timer_lock = threading.Lock()
+
+    def get(self, version: int) -> Optional[Snapshot]:
+        """
+        :param version: version of the data the request is served from
+        :return: Snapshot of the given version or None if it's not available (yet)
+        """
+
+        snapshot = self._snapshot
+
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+
+        # Modified in another process, or the scheduled rebuild hasn't finished yet
+        self.schedule()
+
+        return None
+
+    def response(self, version: int) -> Optional[Response]:
+        """
+        :param version: version of the data the request is served from
+        :return: response with the body in the best encoding accepted by the client, or None if Snapshot of the given
+        version is not available
+        """
+
+        snapshot = self.get(version)
+
+        if snapshot is None:
+            return None
+
+        encoding = request.accept_encodings.best_match(list(snapshot.bodies), default='identity')
+        response = Response(snapshot.bodies[encoding], mimetype='application/json')
+        response.vary.add('Accept-Encoding')
+
+        if encoding != 'identity':
+            response.content_encoding = encoding
+
+        return response
+
+    def rebuild(self) -> Snapshot:
+        """
+        Encode the current version of the data, unless it's already encoded. Concurrent calls build it only once.
+        """
+
+        with self._lock:
+            # Version is read before the data, so data modified during the build gets a newer version than the
+            # Snapshot and is encoded again later
+            version = self._get_version()
+
+            if self._snapshot is None or self._snapshot.version != version:
+                self._snapshot = Snapshot.encode(version, self._build())
+
+            return self._snapshot
+
+    def schedule(self):
+        """
+        Rebuild the snapshot in the background after debounce seconds, unless it's already scheduled.
+        """
+
+        with self._timer_lock:
+            if self._timer is None:
+                self._timer = threading.Timer(self.debounce, self._rebuild_scheduled)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _rebuild_scheduled(self):
+        with self._timer_lock:
+            self._timer = None
+
+        try:
+            self.rebuild()
+        except Exception:
+            logging.getLogger('PokemonAPI').exception('Snapshot could not be rebuilt')
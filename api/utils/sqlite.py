@@ -0,0 +1,35 @@
+"""
+SQLite databases shared by all processes of a host, e.g. gunicorn workers
+"""
+
+import os
+import sqlite3
+import threading
+
+
+class LocalConnection:
+
+    def __init__(self, path: str, timeout: float = 10):
+        """
+        Connection to SQLite database in WAL mode, opened per thread, and again in processes forked after it was
+        opened, as SQLite connections can be used neither by other threads nor across fork.
+        :param path: file of the database, created if it doesn't exist
+        :param timeout: number of seconds a write waits for the lock held by another connection
+        """
+
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def get(self) -> sqlite3.Connection:
+        """
+        :return: connection of the current thread, in autocommit mode
+        """
+
+        if getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection, self._local.pid = connection, os.getpid()
+
+        return self._local.connection
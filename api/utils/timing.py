@@ -0,0 +1,90 @@
+"""
+Per-request breakdown of time spent in MongoDB, the external API, validation and marshalling, returned in
+Server-Timing response header.
+"""
+
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from pymongo import monitoring
+
+
+def init_app(app):
+    """
+    Collect spans of every request and add Server-Timing header to its response. No-op if SERVER_TIMING_ENABLED
+    is off. With SERVER_TIMING_LOG the spans are also logged as a json line.
+    :param app: Flask application instance
+    """
+
+    if not app.config['SERVER_TIMING_ENABLED']:
+        return
+
+    log = app.config['SERVER_TIMING_LOG']
+
+    @app.before_request
+    def start_timing():
+        g.timing_started = time.perf_counter()
+        g.timings = {}
+
+    @app.after_request
+    def add_server_timing(response):
+        timings = g.pop('timings', None)
+
+        if timings is None:
+            return response
+
+        total = time.perf_counter() - g.pop('timing_started')
+        spans = [f'{name};dur={duration * 1000:.2f};desc="{count}x"' for name, (duration, count) in timings.items()]
+        spans.append(f'total;dur={total * 1000:.2f}')
+        response.headers.add('Server-Timing', ', '.join(spans))
+
+        if log:
+            logging.getLogger('PokemonAPI').info(json.dumps(dict(
+                method=request.method, path=request.path, status=response.status_code, total_ms=round(total * 1000, 2),
+                **{f'{name}_ms': round(duration * 1000, 2) for name, (duration, _) in timings.items()})))
+
+        return response
+
+
+def record(name: str, seconds: float):
+    """
+    Add duration to the span with given name. Ignored outside of requests, e.g. in background threads.
+    """
+
+    if has_request_context():
+        timings = g.get('timings')
+
+        if timings is not None:
+            duration, count = timings.get(name, (0, 0))
+            timings[name] = (duration + seconds, count + 1)
+
+
+@contextmanager
+def span(name: str):
+    """
+    Measure the block as a part of the span with given name.
+    """
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+class MongoTimingListener(monitoring.CommandListener):
+    """
+    Add duration of every MongoDB command to 'mongo' span of the request which sent it.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        record('mongo', event.duration_micros / 1e6)
+
+    def failed(self, event):
+        record('mongo', event.duration_micros / 1e6)
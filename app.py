@@ -1,23 +1,53 @@
 from flask import Flask
 from flask_mongoengine import MongoEngine
 from flask_restx import Api
+from pymongo import monitoring
 
+from api.backend import PokemonService
+from api.cli import register_commands
+from api.config import DefaultConfig
+from api.mongo import ensure_indexes
 from api.encounter import encounter_api
-from api.pokemon import pokemon_api
-from api.utils import create_logger
+from api.pokemon import pokemon_api, init_snapshot
+from api.utils import create_logger, metrics, profiling, rate_limit, timing
 
 
-def create_app(logger=True, mongo_config=None):
+_command_listeners = []
+
+
+def register_command_listeners():
+    """
+    Register pymongo listeners measuring MongoDB commands for metrics and Server-Timing header. pymongo applies global
+    listeners only to clients created afterwards, so it has to be called before any connection. Listeners are
+    registered once per process, however many applications are created.
+    """
+
+    if not _command_listeners:
+        _command_listeners.extend([metrics.MongoCommandListener(), timing.MongoTimingListener()])
+
+        for listener in _command_listeners:
+            monitoring.register(listener)
+
+
+def create_app(logger=True, mongo_config=None, config=None):
     if logger:
         create_logger('PokemonAPI')
 
     app = Flask(__name__)
+    app.config.from_object(DefaultConfig)
 
     # Setting MongoDB instance
     if mongo_config:
         app.config.update(mongo_config)
 
+    if config:
+        app.config.update(config)
+
+    register_command_listeners()
     MongoEngine(app)
+    ensure_indexes()
+    PokemonService.init_app(app)
+    register_commands(app)
 
     api = Api(app,
               title='PokemonAPI',
@@ -26,6 +56,12 @@ def create_app(logger=True, mongo_config=None):
 
     api.add_namespace(pokemon_api)
     api.add_namespace(encounter_api)
+    init_snapshot(app)
+
+    metrics.init_app(app, api)
+    rate_limit.init_app(app, api)
+    profiling.init_app(app)
+    timing.init_app(app)
 
     return app
 
@@ -0,0 +1,138 @@
+"""
+Local stand-in of https://pokeapi.co/ serving Pokemon jsons over HTTP, used by tests and benchmarks
+"""
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_pokemon(pokemon_id: int, name: str = None, **fields) -> dict:
+    """
+    Build a Pokemon json in the format of the external API, including some of the fields PokemonAPI doesn't store.
+    """
+
+    sprites_url = 'https://raw.githubusercontent.com/PokeAPI/sprites/master/sprites/pokemon'
+    pokemon = {
+        "abilities": [],
+        "base_experience": 50 + pokemon_id % 200,
+        "height": 1 + pokemon_id % 30,
+        "id": pokemon_id,
+        "name": name or f"pokemon-{pokemon_id}",
+        "sprites": {
+            "back_default": f"{sprites_url}/back/{pokemon_id}.png",
+            "back_female": None,
+            "back_shiny": f"{sprites_url}/back/shiny/{pokemon_id}.png",
+            "back_shiny_female": None,
+            "front_default": f"{sprites_url}/{pokemon_id}.png",
+            "front_female": None,
+            "front_shiny": f"{sprites_url}/shiny/{pokemon_id}.png",
+            "front_shiny_female": None,
+            "other": {}
+        },
+        "weight": 10 + pokemon_id % 1000
+    }
+    pokemon.update(fields)
+
+    return pokemon
+
+
+DEFAULT_POKEMONS = [make_pokemon(23, 'ekans', base_experience=58, height=20, weight=69),
+                    make_pokemon(106, 'hitmonlee', base_experience=159, height=15, weight=498),
+                    make_pokemon(143, 'snorlax', base_experience=189, height=21, weight=4600)]
+
+
+class FakePokeApi:
+    """
+    HTTP server answering GET /api/v2/pokemon/<name or id>/ from an in-memory list of Pokemons.
+
+        with FakePokeApi() as pokeapi:
+            requests.get(f'{pokeapi.url}/pokemon/ekans/')
+    """
+
+    def __init__(self, pokemons=None, delay: float = 0):
+        """
+        :param pokemons: Pokemon jsons served by the server, DEFAULT_POKEMONS if not given
+        :param delay: seconds the server waits before answering each request
+        """
+
+        self.pokemons = {}
+        self.delay = delay
+        self.requests = []
+        self.connections = 0
+        self.failures = []
+
+        for pokemon in DEFAULT_POKEMONS if pokemons is None else pokemons:
+            self.add(pokemon)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self._server.server_port}/api/v2'
+
+    def add(self, pokemon: dict):
+        self.pokemons[str(pokemon['id'])] = self.pokemons[pokemon['name']] = pokemon
+
+    def fail_next(self, count: int = 1, status: int = 503):
+        """
+        Answer next count requests with given status code.
+        """
+
+        self.failures.extend([status] * count)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                fake.connections += 1
+
+            def do_GET(self):
+                fake.requests.append(self.path)
+
+                if fake.delay:
+                    time.sleep(fake.delay)
+
+                match = re.fullmatch(r'/api/v2/pokemon/([^/]+)/?', self.path)
+
+                if fake.failures:
+                    self._respond(fake.failures.pop(0), b'Service Unavailable')
+                elif match and match.group(1) in fake.pokemons:
+                    self._respond(200, json.dumps(fake.pokemons[match.group(1)]).encode(), 'application/json')
+                else:
+                    self._respond(404, b'Not Found')
+
+            def _respond(self, status, body, content_type='text/plain'):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,274 @@
+"""
+Benchmark of all PokemonAPI endpoints against a seeded, mocked MongoDB and a local stand-in of the external API.
+
+    python -m benchmarks.run --catalog 10000 --encounters 5000 --output results.json
+    python -m benchmarks.run --catalog 10000 --compare results.json
+
+Requests are sent through the Flask test client one after another, so the numbers describe the CPU cost of the
+application itself, without network and web server overhead. Results are written as JSON, comparable between commits.
+"""
+
+import argparse
+import json
+import math
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+from mongoengine.connection import get_db
+from pymongo import InsertOne, UpdateOne
+
+from api.backend import PokemonService, rollups
+from api.mongo import Pokemon, Encounter, Version
+from app import create_app
+from benchmarks.fake_pokeapi import FakePokeApi, make_pokemon
+
+# Pokemons with encounter histories, listed by the encounter scenarios
+HOT_POKEMONS = 10
+
+SEED_CHUNK_SIZE = 5000
+
+
+class Scenario:
+
+    def __init__(self, name: str, request, expected: tuple = (200,), heavy: bool = False):
+        """
+        :param name: name of the scenario in the results
+        :param request: function taking the iteration number and returning (method, url, kwargs of the test client)
+        :param expected: status codes of successful responses
+        :param heavy: scenario reads the whole catalog, so it's repeated --heavy-requests times only
+        """
+
+        self.name = name
+        self.request = request
+        self.expected = expected
+        self.heavy = heavy
+
+
+def seed(catalog: int, encounters: int):
+    """
+    Fill the database with Pokemons 1..catalog and spread encounters between the first HOT_POKEMONS of them, along
+    with their rollups.
+    """
+
+    for start in range(1, catalog + 1, SEED_CHUNK_SIZE):
+        ids = range(start, min(start + SEED_CHUNK_SIZE, catalog + 1))
+        Pokemon._get_collection().insert_many(
+            [PokemonService.build_pokemon(make_pokemon(pokemon_id)).to_mongo() for pokemon_id in ids])
+
+    counts = Counter(1 + number % min(HOT_POKEMONS, catalog) for number in range(encounters))
+
+    if counts:
+        Encounter._get_collection().bulk_write(
+            [InsertOne(dict(pokemon_id=1 + number % min(HOT_POKEMONS, catalog), place=f'place-{number % 50}',
+                            note='seeded', timestamp=1600000000 + number)) for number in range(encounters)],
+            ordered=False)
+        Pokemon._get_collection().bulk_write([UpdateOne({'_id': pokemon_id}, {'$set': {'encounter_count': count}})
+                                              for pokemon_id, count in counts.items()])
+        rollups.rebuild()
+
+    Version.bump(Version.POKEMONS, *[Version.ENCOUNTERS.format(pokemon_id) for pokemon_id in counts])
+
+
+def scenarios(catalog: int, client) -> list:
+    """
+    :return: list of Scenarios covering every route of api/pokemon/routes.py and api/encounter/routes.py
+    """
+
+    def random_id():
+        return random.randint(1, catalog)
+
+    def random_page():
+        return f'/api/pokemon/?limit=100&after_id={random.randint(0, max(catalog - 100, 0))}'
+
+    def etag(url):
+        return client.get(url).headers['ETag']
+
+    pokemons_etag = etag('/api/pokemon/')
+    encounters_etag = etag('/pokemon/1/encounters')
+
+    # Pokemons beyond the catalog are known only to the external API, so every POST of them fetches a new one
+    return [
+        Scenario('pokemons_list_all', lambda i: ('get', '/api/pokemon/', {}), heavy=True),
+        Scenario('pokemons_stream_all', lambda i: ('get', '/api/pokemon/?stream=true', {}), heavy=True),
+        Scenario('pokemons_list_page', lambda i: ('get', random_page(), {})),
+        Scenario('pokemons_list_not_modified',
+                 lambda i: ('get', '/api/pokemon/', dict(headers={'If-None-Match': pokemons_etag})), expected=(304,)),
+        Scenario('pokemon_post_stored',
+                 lambda i: ('post', '/api/pokemon/', dict(json={'name': f'pokemon-{random_id()}'}))),
+        Scenario('pokemon_post_fetched',
+                 lambda i: ('post', '/api/pokemon/', dict(json={'name': f'pokemon-{catalog + 1 + i}'})),
+                 expected=(201,)),
+        Scenario('pokemon_post_missing', lambda i: ('post', '/api/pokemon/', dict(json={'name': f'missing-{i}'})),
+                 expected=(404,)),
+        Scenario('pokemons_batch',
+                 lambda i: ('post', '/api/pokemon/batch', dict(json={'names': [random_id() for _ in range(100)]}))),
+        Scenario('encounters_list', lambda i: ('get', f'/pokemon/{1 + i % HOT_POKEMONS}/encounters', {})),
+        Scenario('encounters_list_not_modified',
+                 lambda i: ('get', '/pokemon/1/encounters', dict(headers={'If-None-Match': encounters_etag})),
+                 expected=(304,)),
+        Scenario('encounter_stats_pokemon', lambda i: ('get', f'/pokemon/{1 + i % HOT_POKEMONS}/encounters/stats', {})),
+        Scenario('encounter_stats_all', lambda i: ('get', '/pokemon/encounters/stats?dimension=hour', {})),
+        Scenario('encounter_post',
+                 lambda i: ('post', f'/pokemon/{random_id()}/encounters', dict(json={'place': 'city'})),
+                 expected=(201, 202)),
+        Scenario('encounters_bulk',
+                 lambda i: ('post', '/pokemon/encounters', dict(json={'encounters': [
+                     dict(pokemon_id=random_id(), place='city') for _ in range(100)]})), expected=(201,)),
+    ]
+
+
+def measure(client, scenario: Scenario, count: int, warmup: int) -> dict:
+    """
+    Send count requests of the scenario after warmup ones which are not measured.
+    :return: dictionary with throughput, latency percentiles (in milliseconds) and number of unexpected responses
+    """
+
+    for iteration in range(warmup):
+        method, url, kwargs = scenario.request(-1 - iteration)
+        getattr(client, method)(url, **kwargs)
+
+    latencies, errors = [], 0
+    started = time.perf_counter()
+
+    for iteration in range(count):
+        method, url, kwargs = scenario.request(iteration)
+
+        request_started = time.perf_counter()
+        response = getattr(client, method)(url, **kwargs)
+        response.get_data()
+        latencies.append(time.perf_counter() - request_started)
+
+        errors += response.status_code not in scenario.expected
+
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    return dict(requests=count, errors=errors, seconds=round(elapsed, 4),
+                throughput=round(count / elapsed, 2) if elapsed else None,
+                mean_ms=round(statistics.mean(latencies) * 1000, 3),
+                p50_ms=round(percentile(latencies, 50) * 1000, 3),
+                p99_ms=round(percentile(latencies, 99) * 1000, 3))
+
+
+def percentile(values: list, percent: float) -> float:
+    """
+    Nearest-rank percentile of sorted values.
+    """
+
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+def run(catalog: int, encounters: int, requests: int, heavy_requests: int, warmup: int, only: list = None,
+        seed_value: int = 0) -> dict:
+    """
+    Seed a fresh database and measure all (or only given) scenarios.
+    :return: results in the format written by --output
+    """
+
+    random.seed(seed_value)
+
+    with FakePokeApi(pokemons=[make_pokemon(pokemon_id)
+                               for pokemon_id in range(catalog + 1, catalog + 1 + requests + warmup)]) as pokeapi:
+        app = create_app(logger=False,
+                         config=dict(POKEAPI_URL=pokeapi.url, POKEAPI_BACKOFF=0),
+                         mongo_config=dict(MONGODB_DB='pokemon_api_benchmark', MONGODB_HOST='mongomock://localhost',
+                                           MONGODB_ALIAS='pokemon_api'))
+
+        with app.app_context():
+            seed(catalog, encounters)
+            client = app.test_client()
+            snapshot = app.extensions.get('pokemon_snapshot')
+
+            results = {}
+            for scenario in scenarios(catalog, client):
+                if only and scenario.name not in only:
+                    continue
+
+                # Otherwise the full list is served without the snapshot until its background rebuild finishes
+                if scenario.heavy and snapshot is not None:
+                    snapshot.rebuild()
+
+                results[scenario.name] = measure(client, scenario, heavy_requests if scenario.heavy else requests,
+                                                 warmup)
+                print(f"{scenario.name:<30} {results[scenario.name]['throughput']:>10} req/s  "
+                      f"p50 {results[scenario.name]['p50_ms']:>9} ms  p99 {results[scenario.name]['p99_ms']:>9} ms",
+                      file=sys.stderr)
+
+            # Every collection of the application, so the next run starts from an empty database
+            database = get_db('pokemon_api')
+            database.client.drop_database(database.name)
+
+    return dict(meta=dict(commit=_commit(), python=platform.python_version(), platform=platform.platform(),
+                          date=datetime.utcnow().isoformat(timespec='seconds'), catalog=catalog,
+                          encounters=encounters, requests=requests, heavy_requests=heavy_requests, warmup=warmup,
+                          seed=seed_value),
+                results=results)
+
+
+def compare(baseline: dict, current: dict) -> str:
+    """
+    :return: table with relative changes of throughput and p99 latency of scenarios present in both results
+    """
+
+    lines = [f"{'scenario':<30} {'throughput':>12} {'p99':>12}"]
+
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            continue
+
+        before = baseline['results'][name]
+        lines.append(f"{name:<30} {_change(before['throughput'], result['throughput']):>12} "
+                     f"{_change(before['p99_ms'], result['p99_ms']):>12}")
+
+    return '\n'.join(lines)
+
+
+def _change(before, after) -> str:
+    return f'{(after - before) / before * 100:+.1f}%' if before else 'n/a'
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--catalog', type=int, default=1000, help='Number of seeded Pokemons.')
+    parser.add_argument('--encounters', type=int, default=10000,
+                        help=f'Number of seeded encounters, spread between {HOT_POKEMONS} Pokemons.')
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario.')
+    parser.add_argument('--heavy-requests', type=int, default=10,
+                        help='Measured requests of scenarios reading the whole catalog.')
+    parser.add_argument('--warmup', type=int, default=5, help='Requests sent before measuring each scenario.')
+    parser.add_argument('--only', nargs='+', help='Names of scenarios to run.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator.')
+    parser.add_argument('--output', help='File for JSON results, standard output if not given.')
+    parser.add_argument('--compare', help='JSON results of a previous run to compare with.')
+    args = parser.parse_args(argv)
+
+    results = run(catalog=args.catalog, encounters=args.encounters, requests=args.requests,
+                  heavy_requests=args.heavy_requests, warmup=args.warmup, only=args.only, seed_value=args.seed)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            print(compare(json.load(baseline), results), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+"""
+Gunicorn settings, loaded automatically from the working directory.
+
+Metrics of all workers are aggregated when PROMETHEUS_MULTIPROC_DIR points to an empty directory shared by them,
+e.g. PROMETHEUS_MULTIPROC_DIR=/tmp/pokemon-api-metrics gunicorn heroku:app
+"""
+
+import os
+import shutil
+
+
+def on_starting(server):
+    # Values left by workers of a previous run would be added to the new ones
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,54 @@
+import pytest
+
+from api.backend import PokemonService
+from api.backend.upstream import UpstreamClient
+from api.mongo import Pokemon, Encounter, MissingPokemon, Version, EncounterRollup
+from app import create_app
+from benchmarks.fake_pokeapi import FakePokeApi
+
+# test_backend replaces the external API call with a stub when it's imported, the original is kept for tests of it
+add_pokemon_from_external_api = PokemonService.add_pokemon_from_external_api
+
+
+@pytest.fixture
+def app():
+    """
+    Flask application connected to the mocked MongoDB. Collections are dropped after each test.
+    :yield: Flask application with established application context
+    """
+
+    flask_app = create_app(logger=False, mongo_config=dict(
+                               MONGODB_DB='mongoengine_mock',
+                               MONGODB_HOST='mongomock://localhost',
+                               MONGODB_ALIAS='pokemon_api'
+                           ))
+
+    with flask_app.app_context():
+        yield flask_app
+
+    Pokemon.drop_collection()
+    Encounter.drop_collection()
+    MissingPokemon.drop_collection()
+    Version.drop_collection()
+    EncounterRollup.drop_collection()
+
+
+@pytest.fixture
+def external_api(monkeypatch):
+    """
+    Restore the real PokemonService.add_pokemon_from_external_api for a test.
+    """
+
+    monkeypatch.setattr(PokemonService, 'add_pokemon_from_external_api', staticmethod(add_pokemon_from_external_api))
+
+
+@pytest.fixture
+def fake_pokeapi(monkeypatch, external_api):
+    """
+    Local stand-in of the external API used by the real PokemonService.add_pokemon_from_external_api.
+    :yield: running FakePokeApi server
+    """
+
+    with FakePokeApi() as pokeapi:
+        monkeypatch.setattr(PokemonService, 'upstream', UpstreamClient(base_url=pokeapi.url, backoff=0))
+        yield pokeapi
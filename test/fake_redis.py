@@ -0,0 +1,38 @@
+"""
+In-memory stand-in of the part of redis.Redis client used by api.backend.shared_cache.RedisPokemonCache
+"""
+
+import fnmatch
+import threading
+import time
+
+
+class FakeRedis:
+
+    def __init__(self):
+        self.data = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            value, expires_at = self.data.get(name, (None, None))
+
+            if expires_at is not None and expires_at < time.monotonic():
+                del self.data[name]
+                return None
+
+            return value
+
+    def set(self, name, value, px=None):
+        with self._lock:
+            self.data[name] = (value, time.monotonic() + px / 1000 if px is not None else None)
+
+    def delete(self, *names):
+        with self._lock:
+            return sum(self.data.pop(name, None) is not None for name in names)
+
+    def scan_iter(self, match='*'):
+        with self._lock:
+            names = [name for name in self.data if fnmatch.fnmatchcase(name, match)]
+
+        return iter(names)
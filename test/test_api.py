@@ -2,7 +2,7 @@ import json
 
 import pytest
 
-from api.mongo import Pokemon
+from api.mongo import Pokemon, Encounter, EncounterRollup
 from app import create_app
 
 
@@ -22,6 +22,8 @@ def test_client():
             yield testing_client
 
     Pokemon.drop_collection()
+    Encounter.drop_collection()
+    EncounterRollup.drop_collection()
 
 
 def test_get_all_pokemons(test_client):
@@ -44,6 +46,38 @@ def test_post_new_pokemon(test_client):
     assert pokemon_in_db[0]['name'] == 'ekans'
 
 
+def test_get_pokemons_page(test_client):
+    for pokemon_id in (1, 2, 3):
+        Pokemon(id=pokemon_id, name=f'pokemon_{pokemon_id}', weight=1, height=1, base_experience=1).save()
+
+    response = test_client.get('/api/pokemon/?limit=2')
+    assert [pokemon['id'] for pokemon in json.loads(response.data)] == [1, 2]
+    assert 'after_id=2' in response.headers['Link']
+
+    response = test_client.get('/api/pokemon/?limit=2&after_id=2')
+    assert [pokemon['id'] for pokemon in json.loads(response.data)] == [3]
+    assert 'Link' not in response.headers
+
+
+@pytest.mark.parametrize('query', ['limit=0', 'limit=abc', 'after_id=abc'])
+def test_get_pokemons_page_with_invalid_parameters(test_client, query):
+    response = test_client.get(f'/api/pokemon/?{query}')
+    assert response.status_code == 400
+
+
+def test_stream_pokemons(test_client):
+    for pokemon_id in (1, 2, 3):
+        Pokemon(id=pokemon_id, name=f'pokemon_{pokemon_id}', weight=1, height=1, base_experience=1).save()
+
+    response = test_client.get('/api/pokemon/?stream=true&after_id=1')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+
+    pokemons = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [pokemon['name'] for pokemon in pokemons] == ['pokemon_2', 'pokemon_3']
+    assert set(pokemons[0]) == {'base_experience', 'name', 'height', 'weight', 'sprites', 'id'}
+
+
 def test_post_new_pokemon_which_doesnt_exist(test_client):
     assert Pokemon.objects().count() == 0
 
@@ -79,6 +113,35 @@ def test_post_new_pokemon_with_invalid_payload(test_client, payload):
     assert response.status_code == 400
 
 
+def test_post_pokemons_batch(test_client):
+    test_client.post('/api/pokemon/', json={"name": "ekans"})
+
+    response = test_client.post('/api/pokemon/batch', json={"names": ["ekans", 23, "doesnt_exist"]})
+    assert response.status_code == 200
+
+    returned_data = json.loads(response.data)
+    assert [item['query'] for item in returned_data] == ["ekans", 23, "doesnt_exist"]
+    assert [item['status'] for item in returned_data] == [200, 200, 404]
+    assert returned_data[0]['pokemon'] == returned_data[1]['pokemon']
+    assert returned_data[0]['pokemon']['id'] == 23
+    assert returned_data[2]['pokemon'] is None
+
+
+@pytest.mark.parametrize(
+    'payload',
+    [
+        {"names": []},
+        {"names": [{"name": "ekans"}]},
+        {"names": ["ekans"] * 101},
+        {"name": "ekans"},
+        ["ekans"]
+    ]
+)
+def test_post_pokemons_batch_with_invalid_payload(test_client, payload):
+    response = test_client.post('/api/pokemon/batch', json=payload)
+    assert response.status_code == 400
+
+
 def test_post_new_encounter(test_client):
     assert Pokemon.objects().count() == 0
 
@@ -86,7 +149,7 @@ def test_post_new_encounter(test_client):
     response = test_client.post('/pokemon/23/encounters', json={"place": "city"})
 
     assert response.status_code == 201
-    assert Pokemon.objects(name='ekans').first().encounters[0]['place'] == 'city'
+    assert Encounter.objects(pokemon_id=23).first().place == 'city'
 
 
 @pytest.mark.parametrize(
@@ -104,6 +167,31 @@ def test_post_new_encounter_with_invalid_payload(test_client, payload):
     assert response.status_code == 400
 
 
+def test_post_encounter_for_invalid_id(test_client):
+    response = test_client.post('/pokemon/abc/encounters', json={"place": "city"})
+
+    assert response.status_code == 404
+    assert response.status_code == test_client.get('/pokemon/abc/encounters').status_code
+
+
+@pytest.mark.parametrize('field', ['id', '_id', 'pokemon_id', 'timestamp'])
+def test_post_encounter_cannot_set_server_fields(test_client, field):
+    test_client.post('/api/pokemon/', json={"name": "ekans"})
+    test_client.post('/pokemon/23/encounters', json={"place": "city"})
+    encounter = Encounter.objects(pokemon_id=23).first()
+    value = str(encounter.id) if field in ('id', '_id') else 1
+
+    response = test_client.post('/pokemon/23/encounters', json={"place": "hijacked", field: value})
+    assert response.status_code == 400
+
+    if field != 'pokemon_id':  # Bulk records carry their Pokemon id
+        response = test_client.post('/pokemon/encounters', json={"encounters": [
+            {"pokemon_id": 23, "place": "hijacked", field: value}]})
+        assert response.status_code == 207 and response.json['errors'][0]['status'] == 400
+
+    assert [encounter.place for encounter in Encounter.objects(pokemon_id=23)] == ['city']
+
+
 def test_get_all_encounters(test_client):
     assert Pokemon.objects().count() == 0
 
@@ -125,9 +213,62 @@ def test_get_all_encounters_for_missing_id(test_client):
     response = test_client.get('/pokemon/23/encounters')
     assert response.status_code == 404
 
+    response = test_client.get('/pokemon/ekans/encounters')
+    assert response.status_code == 404
+
 
 def test_if_other_http_methods_are_not_usable(test_client):
     for method in ('delete', 'put', 'patch'):
         response_encounters = getattr(test_client, method)('/pokemon/23/encounters')
         response_pokemons = getattr(test_client, method)('api/pokemon/')
         assert response_encounters.status_code == response_pokemons.status_code == 405
+
+
+def test_post_encounters_in_bulk(test_client):
+    test_client.post('/api/pokemon/', json={"name": "ekans"})
+
+    response = test_client.post('/pokemon/encounters', json={"encounters": [
+        {"pokemon_id": 23, "place": "city"},
+        {"pokemon_id": 23, "place": 20},
+        {"place": "forest"},
+        {"pokemon_id": 9999, "place": "forest"},
+        {"pokemon_id": "23", "place": "forest", "note": "Sleeping"}
+    ]})
+
+    assert response.status_code == 207
+
+    returned_data = json.loads(response.data)
+    assert returned_data['inserted'] == 2
+    assert [(error['index'], error['status']) for error in returned_data['errors']] == [(1, 400), (2, 400), (3, 404)]
+
+    assert [encounter['place'] for encounter in json.loads(test_client.get('/pokemon/23/encounters').data)] == \
+           ['city', 'forest']
+    assert Pokemon.objects(id=23).first().encounter_count == 2
+
+
+@pytest.mark.parametrize('pokemon_id', [23.7, 23.0, True, '23.7', '', None, [23]])
+def test_post_encounters_in_bulk_rejects_non_integer_ids(test_client, pokemon_id):
+    test_client.post('/api/pokemon/', json={"name": "ekans"})
+
+    response = test_client.post('/pokemon/encounters', json={"encounters": [
+        {"pokemon_id": pokemon_id, "place": "city"}, {"pokemon_id": 23, "place": 20}]})
+
+    assert response.status_code == 207
+    assert response.json['errors'] == [
+        dict(index=0, status=400, message="Field 'pokemon_id' must be an integer."),
+        dict(index=1, status=400, message="Field 'place': StringField only accepts string values.")]
+    assert Encounter.objects(pokemon_id=23).count() == 0
+
+
+def test_post_encounters_in_bulk_fetches_missing_pokemon(test_client):
+    response = test_client.post('/pokemon/encounters', json={"encounters": [{"pokemon_id": 23, "place": "city"}] * 3})
+
+    assert response.status_code == 201
+    assert json.loads(response.data) == {'inserted': 3, 'errors': []}
+    assert Encounter.objects(pokemon_id=23).count() == 3
+
+
+@pytest.mark.parametrize('payload', [{"encounters": []}, {"encounters": ["city"]}, [{"place": "city"}], 'String'])
+def test_post_encounters_in_bulk_with_invalid_payload(test_client, payload):
+    response = test_client.post('/pokemon/encounters', json=payload)
+    assert response.status_code == 400
@@ -2,7 +2,8 @@ import pytest
 from mongoengine import connect
 
 from api.backend import PokemonService
-from api.mongo import Pokemon
+from api.mongo import Pokemon, Encounter, EncounterRollup
+from api.mongo.migrations import migrate_embedded_encounters
 from api.utils.exceptions import NonExistingPokemon, InvalidPayload
 
 
@@ -50,6 +51,9 @@ def db():
 
     # Teardown of created db
     Pokemon.drop_collection()
+    Encounter.drop_collection()
+    EncounterRollup.drop_collection()
+    PokemonService.cache.clear()
 
 
 @pytest.fixture
@@ -189,6 +193,37 @@ def test_get_pokemon_by_id_if_id_doesnt_exist():
         PokemonService.get_by_id(9999)
 
 
+def test_get_pokemon_by_name_is_cached(db, snorlax):
+    Pokemon(**snorlax).save()
+
+    PokemonService.get_by_name('snorlax')
+    Pokemon.objects(name='snorlax').update_one(set__weight=1)
+
+    assert PokemonService.get_by_name('snorlax')['weight'] == snorlax['weight']
+    assert PokemonService.cache.stats()['hits'] == 1
+
+
+def test_get_pokemon_by_id_returns_separate_cached_objects(db, snorlax):
+    Pokemon(**snorlax).save()
+
+    first, second = PokemonService.get_by_id(143), PokemonService.get_by_id(143)
+
+    assert first is not second
+    assert first.name == second.name == 'snorlax'
+    assert PokemonService.cache.stats()['hits'] == 1
+
+
+def test_add_pokemon_encounter_invalidates_cache(db, ekans, encounter):
+    Pokemon(**ekans).save()
+
+    PokemonService.get_by_name('ekans')
+    PokemonService.get_by_id(23)
+    PokemonService.add_pokemon_encounter(23, encounter)
+
+    assert ('id', '23') not in PokemonService.cache._entries
+    assert ('name', 'ekans') not in PokemonService.cache._entries
+
+
 def test_add_pokemon_encounter(db, ekans):
 
     Pokemon(**ekans).save()
@@ -197,7 +232,7 @@ def test_add_pokemon_encounter(db, ekans):
 
     PokemonService.add_pokemon_encounter(pokemon_id=23, encounter_json=encounter)
 
-    mongo_encounter = Pokemon.objects(name='ekans').first().encounters[0]
+    mongo_encounter = Encounter.objects(pokemon_id=23).first()
 
     assert mongo_encounter.place == encounter['place']
     assert mongo_encounter.note == encounter['note']
@@ -220,6 +255,52 @@ def test_add_pokemon_encounter_with_invalid_data(db, ekans, encounter_json):
         PokemonService.add_pokemon_encounter(pokemon_id=23, encounter_json=encounter_json)
 
 
+def test_invalid_encounter_error_names_the_field():
+    with pytest.raises(InvalidPayload, match="^Field 'place': StringField only accepts string values.$"):
+        PokemonService.build_encounter(23, {'place': 20})
+
+
+def test_add_pokemon_encounter_increments_encounter_count(db, ekans, encounter):
+    Pokemon(**ekans).save()
+
+    for _ in range(3):
+        PokemonService.add_pokemon_encounter(23, encounter)
+
+    assert Pokemon.objects(id=23).first().encounter_count == 3
+    assert Encounter.objects(pokemon_id=23).count() == 3
+
+
+def test_failed_encounter_insert_does_not_count(db, ekans, encounter, monkeypatch):
+    Pokemon(**ekans).save()
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('Insert failed')
+
+    monkeypatch.setattr(Encounter, 'save', fail)
+
+    with pytest.raises(RuntimeError):
+        PokemonService.add_pokemon_encounter(23, encounter)
+
+    assert Pokemon.objects(id=23).first().encounter_count == 0
+
+
+def test_add_pokemon_encounter_with_invalid_data_does_not_fetch_pokemon(db, monkeypatch):
+    fetched = []
+    monkeypatch.setattr(PokemonService, 'add_pokemon_from_external_api', fetched.append)
+
+    with pytest.raises(InvalidPayload):
+        PokemonService.add_pokemon_encounter(23, {'note': 'place is unknown'})
+
+    assert fetched == []
+
+
+def test_add_pokemon_encounter_for_pokemon_missing_in_external_api(db, encounter):
+    with pytest.raises(NonExistingPokemon):
+        PokemonService.add_pokemon_encounter(9999, encounter)
+
+    assert Encounter.objects().count() == 0
+
+
 def test_get_pokemon_encounters(db, ekans):
 
     Pokemon(**ekans).save()
@@ -243,3 +324,39 @@ def test_get_pokemon_encounters_if_id_doesnt_exist(db, encounter):
 
     assert Pokemon.objects().count() == 1
     assert Pokemon.objects().first().name == 'ekans'
+
+
+def test_get_pokemon_encounters_are_ordered_by_timestamp(db, ekans):
+    Pokemon(**ekans).save()
+
+    for timestamp in (30, 10, 20):
+        Encounter(pokemon_id=23, place='city', timestamp=timestamp).save()
+    Encounter(pokemon_id=143, place='forest', timestamp=0).save()
+
+    assert [encounter['timestamp'] for encounter in PokemonService.get_all_encounters(23)] == [10, 20, 30]
+
+
+def test_migrate_embedded_encounters(db, ekans):
+    Pokemon(**ekans).save()
+    embedded = [{'place': 'city', 'timestamp': 10}, {'place': 'forest', 'note': 'Sleeping', 'timestamp': 20}]
+    Pokemon._get_collection().update_one({'_id': 23}, {'$set': {'encounters': embedded}})
+
+    assert migrate_embedded_encounters(batch_size=1) == 2
+    assert migrate_embedded_encounters() == 0
+
+    assert 'encounters' not in Pokemon._get_collection().find_one({'_id': 23})
+    assert Pokemon.objects(id=23).first().encounter_count == 2
+    assert [(encounter['place'], encounter['timestamp']) for encounter in PokemonService.get_all_encounters(23)] == \
+           [('city', 10), ('forest', 20)]
+
+
+def test_migrate_embedded_encounters_can_be_resumed(db, ekans):
+    Pokemon(**ekans).save()
+    Pokemon._get_collection().update_one({'_id': 23}, {'$set': {'encounters': [{'place': 'city', 'timestamp': 10}]}})
+
+    migrate_embedded_encounters()
+    Pokemon._get_collection().update_one({'_id': 23}, {'$set': {'encounters': [{'place': 'city', 'timestamp': 10}]}})
+    migrate_embedded_encounters()
+
+    assert Encounter.objects(pokemon_id=23).count() == 1
+    assert Pokemon.objects(id=23).first().encounter_count == 1
@@ -0,0 +1,24 @@
+from benchmarks.run import run, compare, percentile
+
+
+def test_all_scenarios_get_expected_responses(external_api):
+    results = run(catalog=30, encounters=50, requests=3, heavy_requests=1, warmup=1)
+
+    assert len(results['results']) == 14
+    assert {name: result['errors'] for name, result in results['results'].items() if result['errors']} == {}
+    assert results['meta']['catalog'] == 30
+
+
+def test_percentile():
+    values = list(range(1, 101))
+
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([7], 99) == 7
+
+
+def test_compare():
+    baseline = dict(results=dict(list=dict(throughput=100, p99_ms=10), removed=dict(throughput=1, p99_ms=1)))
+    current = dict(results=dict(list=dict(throughput=150, p99_ms=5), added=dict(throughput=1, p99_ms=1)))
+
+    assert compare(baseline, current).splitlines()[1].split() == ['list', '+50.0%', '-50.0%']
@@ -0,0 +1,55 @@
+from unittest import mock
+
+from api.backend.cache import PokemonCache
+
+
+def test_cache_returns_stored_values_and_counts_hits():
+    cache = PokemonCache(maxsize=10, ttl=None)
+    cache.set(('name', 'ekans'), {'_id': 23})
+
+    assert cache.get(('name', 'ekans')) == {'_id': 23}
+    assert cache.get(('name', 'snorlax')) is None
+    assert cache.stats() == dict(hits=1, misses=1, size=1, maxsize=10)
+
+
+def test_cache_evicts_least_recently_used_entry():
+    cache = PokemonCache(maxsize=2, ttl=None)
+    cache.set('ekans', 1)
+    cache.set('snorlax', 2)
+    cache.get('ekans')
+    cache.set('hitmonlee', 3)
+
+    assert cache.get('snorlax') is None
+    assert cache.get('ekans') == 1
+    assert cache.get('hitmonlee') == 3
+
+
+def test_cache_entries_expire():
+    cache = PokemonCache(maxsize=10, ttl=60)
+
+    with mock.patch('api.backend.cache.time.monotonic', return_value=1000):
+        cache.set('ekans', 1)
+
+    with mock.patch('api.backend.cache.time.monotonic', return_value=1059):
+        assert cache.get('ekans') == 1
+
+    with mock.patch('api.backend.cache.time.monotonic', return_value=1061):
+        assert cache.get('ekans') is None
+
+    assert cache.stats()['size'] == 0
+
+
+def test_cache_invalidation():
+    cache = PokemonCache()
+    cache.set(('id', '23'), 1)
+    cache.set(('name', 'ekans'), 1)
+    cache.invalidate(('id', '23'), ('name', 'ekans'), ('name', 'missing'))
+
+    assert cache.stats()['size'] == 0
+
+
+def test_disabled_cache_does_not_store_values():
+    cache = PokemonCache(maxsize=0)
+    cache.set('ekans', 1)
+
+    assert cache.get('ekans') is None
@@ -0,0 +1,117 @@
+from datetime import timedelta
+
+from werkzeug.http import http_date, parse_date
+
+from api.backend import PokemonService
+from benchmarks.fake_pokeapi import make_pokemon
+
+
+def test_pokemon_list_is_not_sent_again_if_not_modified(app, monkeypatch):
+    client = app.test_client()
+    client.post('/api/pokemon/', json={"name": "ekans"})
+
+    response = client.get('/api/pokemon/')
+    assert response.status_code == 200
+    assert response.headers['Last-Modified']
+
+    def fail(*args, **kwargs):
+        raise AssertionError('Pokemons should not be loaded')
+
+    monkeypatch.setattr(PokemonService, 'iter_pokemons', fail)
+
+    not_modified = client.get('/api/pokemon/', headers={'If-None-Match': response.headers['ETag']})
+    assert not_modified.status_code == 304
+    assert not_modified.data == b''
+    assert not_modified.headers['ETag'] == response.headers['ETag']
+
+    later = http_date(parse_date(response.headers['Last-Modified']) + timedelta(seconds=1))
+    not_modified = client.get('/api/pokemon/', headers={'If-Modified-Since': later})
+    assert not_modified.status_code == 304
+
+
+def test_pokemon_list_modified_in_the_same_second_is_sent(app):
+    client = app.test_client()
+    PokemonService.save_pokemon(make_pokemon(1))
+    last_modified = client.get('/api/pokemon/').headers['Last-Modified']
+
+    PokemonService.save_pokemon(make_pokemon(2))
+    response = client.get('/api/pokemon/', headers={'If-Modified-Since': last_modified})
+
+    assert response.status_code == 200
+    assert len(response.json) == 2
+
+
+def test_pokemon_list_is_sent_after_modification(app):
+    client = app.test_client()
+    PokemonService.save_pokemon(make_pokemon(1))
+    etag = client.get('/api/pokemon/').headers['ETag']
+
+    client.post('/api/pokemon/', json={"name": "ekans"})
+    response = client.get('/api/pokemon/', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.json[1]['name'] == 'ekans'
+
+
+def test_never_modified_data_has_no_tag(app):
+    client = app.test_client()
+
+    assert 'ETag' not in client.get('/api/pokemon/').headers
+
+    client.post('/api/pokemon/', json={"name": "ekans"})
+    response = client.get('/pokemon/23/encounters', headers={'If-None-Match': '*'})
+
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+
+
+def test_pages_of_pokemon_list_have_different_tags(app):
+    client = app.test_client()
+    PokemonService.save_pokemon(make_pokemon(1))
+
+    assert client.get('/api/pokemon/?limit=1').headers['ETag'] != client.get('/api/pokemon/?limit=2').headers['ETag']
+
+
+def test_encounters_are_not_sent_again_if_not_modified(app):
+    client = app.test_client()
+    client.post('/api/pokemon/', json={"name": "ekans"})
+    client.post('/pokemon/23/encounters', json={"place": "city"})
+
+    etag = client.get('/pokemon/23/encounters').headers['ETag']
+    assert client.get('/pokemon/23/encounters', headers={'If-None-Match': etag}).status_code == 304
+
+    client.post('/pokemon/23/encounters', json={"place": "forest"})
+    response = client.get('/pokemon/23/encounters', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert len(response.json) == 2
+
+
+def test_missing_pokemon_encounters_have_no_tag(app):
+    response = app.test_client().get('/pokemon/9999/encounters')
+
+    assert response.status_code == 404
+    assert 'ETag' not in response.headers
+
+
+def test_encounters_version_ignores_id_spelling(app):
+    client = app.test_client()
+    client.post('/api/pokemon/', json={"name": "ekans"})
+    client.post('/pokemon/23/encounters', json={"place": "city"})
+
+    etag = client.get('/pokemon/023/encounters').headers['ETag']
+    assert client.get('/pokemon/023/encounters', headers={'If-None-Match': etag}).status_code == 304
+
+    client.post('/pokemon/23/encounters', json={"place": "forest"})
+    response = client.get('/pokemon/023/encounters', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert len(response.json) == 2
+
+
+def test_encounters_of_invalid_id_have_no_tag(app):
+    response = app.test_client().get('/pokemon/ekans/encounters')
+
+    assert response.status_code == 404
+    assert 'ETag' not in response.headers
@@ -0,0 +1,85 @@
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+from prometheus_client import REGISTRY
+
+from api.backend import PokemonService
+from api.backend.upstream import UpstreamClient
+from api.utils.metrics import MongoCommandListener
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_requests_are_measured_per_route(app):
+    labels = dict(namespace='Encounters', route='/pokemon/<id>/encounters', method='GET', status='404')
+    before = sample('pokemon_api_request_duration_seconds_count', **labels)
+    errors_before = sample('pokemon_api_errors_total', error='NonExistingPokemon')
+
+    app.test_client().get('/pokemon/23/encounters')
+
+    assert sample('pokemon_api_request_duration_seconds_count', **labels) == before + 1
+    assert sample('pokemon_api_errors_total', error='NonExistingPokemon') == errors_before + 1
+
+
+def test_metrics_endpoint(app):
+    app.test_client().get('/api/pokemon/')
+
+    response = app.test_client().get('/metrics')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert b'pokemon_api_request_duration_seconds_bucket{le="0.005",method="GET",namespace="Pokemons",' \
+           b'route="/api/pokemon/",status="200"}' in response.data
+
+
+def test_upstream_calls_are_measured(app, fake_pokeapi, monkeypatch):
+    monkeypatch.setattr(PokemonService, 'upstream', UpstreamClient(base_url=fake_pokeapi.url, backoff=0, retries=1))
+    fake_pokeapi.fail_next(2, status=502)
+    before = dict(errors=sample('pokemon_api_upstream_errors_total', reason='status_502'),
+                  requests=sample('pokemon_api_upstream_request_duration_seconds_count', status='502'),
+                  fetches=sample('pokemon_api_upstream_fetch_duration_seconds_count', outcome='unavailable'))
+
+    response = app.test_client().post('/api/pokemon/', json={'name': 'ekans'})
+
+    assert response.status_code == 503
+    assert sample('pokemon_api_upstream_errors_total', reason='status_502') == before['errors'] + 2
+    assert sample('pokemon_api_upstream_request_duration_seconds_count', status='502') == before['requests'] + 2
+    assert sample('pokemon_api_upstream_fetch_duration_seconds_count', outcome='unavailable') == \
+        before['fetches'] + 1
+
+
+def test_mongo_commands_are_measured():
+    listener = MongoCommandListener()
+    before = sample('pokemon_api_mongo_command_duration_seconds_count', command='find', collection='pokemon',
+                    outcome='success')
+
+    listener.started(SimpleNamespace(command={'find': 'pokemon', 'filter': {}}, command_name='find',
+                                     connection_id=('localhost', 27017), request_id=1))
+    listener.succeeded(SimpleNamespace(command_name='find', connection_id=('localhost', 27017), request_id=1,
+                                       duration_micros=1500))
+
+    assert sample('pokemon_api_mongo_command_duration_seconds_count', command='find', collection='pokemon',
+                  outcome='success') == before + 1
+
+
+def test_metrics_are_aggregated_over_processes(tmp_path):
+    script = """
+from app import create_app
+
+app = create_app(logger=False, mongo_config=dict(MONGODB_DB='mongoengine_mock', MONGODB_HOST='mongomock://localhost',
+                                                 MONGODB_ALIAS='pokemon_api'))
+app.test_client().get('/pokemon/23/encounters')
+print(app.test_client().get('/metrics').get_data(as_text=True))
+"""
+    environment = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    outputs = [subprocess.run([sys.executable, '-c', script], cwd=root, env=environment, capture_output=True,
+                              text=True, check=True).stdout for _ in range(2)]
+
+    counter = 'pokemon_api_errors_total{error="NonExistingPokemon"}'
+    assert f'{counter} 1.0' in outputs[0]
+    assert f'{counter} 2.0' in outputs[1]
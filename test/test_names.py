@@ -0,0 +1,80 @@
+import pytest
+
+from api.backend import PokemonService
+from api.mongo import Pokemon
+from api.mongo.migrations import backfill_name_keys
+from api.utils.exceptions import NonExistingPokemon
+from benchmarks.fake_pokeapi import make_pokemon
+
+
+@pytest.mark.parametrize('name, normalized', [('ekans', 'ekans'), (' EKANS ', 'ekans'), ('Mr. Mime', 'mr-mime'),
+                                              ("Farfetch'd", 'farfetchd'), ('Type: Null', 'type-null'),
+                                              ('ho_oh', 'ho-oh')])
+def test_normalize_name(name, normalized):
+    assert Pokemon.normalize_name(name) == normalized
+
+
+def test_name_index_is_created_at_startup(app):
+    indexes = Pokemon._get_collection().index_information()
+
+    assert any(index['key'] == [('name_key', 1)] and index.get('unique') for index in indexes.values())
+
+
+def test_every_spelling_of_stored_name_is_found(app, fake_pokeapi):
+    client = app.test_client()
+
+    assert client.post('/api/pokemon/', json={'name': ' Ekans'}).status_code == 201
+    assert Pokemon.objects(id=23).first().name_key == 'ekans'
+
+    for name in ('ekans', 'EKANS', ' ekans '):
+        assert client.post('/api/pokemon/', json={'name': name}).status_code == 200
+
+    assert len(fake_pokeapi.requests) == 1
+
+
+@pytest.mark.parametrize('name', ['²', '٣', '1²'])
+def test_non_ascii_digits_are_names(app, fake_pokeapi, name):
+    client = app.test_client()
+
+    assert client.post('/api/pokemon/', json={'name': name}).status_code == 404
+    assert [item['status'] for item in client.post('/api/pokemon/batch', json={'names': [name]}).json] == [404]
+
+
+def test_spellings_of_missing_name_share_negative_cache(app, fake_pokeapi):
+    for name in ('pikachu', 'Pikachu', 'PIKACHU '):
+        with pytest.raises(NonExistingPokemon):
+            PokemonService.add_pokemon_from_external_api(name)
+
+    assert len(fake_pokeapi.requests) == 1
+
+
+def test_alias(app):
+    PokemonService.save_pokemon(make_pokemon(32, 'nidoran-m'))
+
+    with pytest.raises(NonExistingPokemon):
+        PokemonService.get_by_name('Nidoran♂')
+
+    PokemonService.add_alias('Nidoran♂', 'nidoran-m')
+
+    assert PokemonService.get_by_name('nidoran♂')['_id'] == 32
+    assert [result['pokemon']['_id'] for result in PokemonService.get_many(['NIDORAN♂', 'Nidoran-M', 32])] == \
+        [32, 32, 32]
+
+    with pytest.raises(NonExistingPokemon):
+        PokemonService.add_alias('snake', 'ekans')
+
+
+def test_backfill_name_keys(app):
+    Pokemon._get_collection().insert_many([
+        dict(_id=25, name='pikachu', base_experience=112, height=4, weight=60),
+        dict(_id=26, name='raichu', base_experience=218, height=8, weight=300),
+        dict(_id=10025, name='Pikachu', base_experience=112, height=4, weight=60),
+    ])
+
+    assert PokemonService.get_by_name('Raichu')['_id'] == 26
+
+    stats = backfill_name_keys(batch_size=2)
+
+    assert stats == dict(updated=2, conflicting=1)
+    assert Pokemon.objects(name_key='pikachu').count() == 1
+    assert backfill_name_keys() == dict(updated=0, conflicting=1)
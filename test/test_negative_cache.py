@@ -0,0 +1,63 @@
+from unittest import mock
+
+import pytest
+
+from api.backend import PokemonService
+from api.backend.negative_cache import NegativeCache
+from api.utils.exceptions import NonExistingPokemon
+from benchmarks.fake_pokeapi import make_pokemon
+
+
+def test_negative_cache_entries_expire():
+    cache = NegativeCache(ttl=60)
+
+    with mock.patch('api.backend.negative_cache.time.time', return_value=1000):
+        cache.add('pikachuu')
+        cache.add(9999)
+
+    with mock.patch('api.backend.negative_cache.time.time', return_value=1059):
+        assert 'pikachuu' in cache
+        assert '9999' in cache
+
+    with mock.patch('api.backend.negative_cache.time.time', return_value=1061):
+        assert 'pikachuu' not in cache
+
+    assert cache.stats()['hits'] == 2
+
+
+def test_negative_cache_is_bounded():
+    cache = NegativeCache(maxsize=2)
+
+    for key in ('a', 'b', 'c'):
+        cache.add(key)
+
+    assert 'a' not in cache
+    assert 'b' in cache and 'c' in cache
+
+
+def test_persistent_negative_cache_is_shared(app):
+    NegativeCache(persistent=True).add('pikachuu')
+
+    other_worker = NegativeCache(persistent=True)
+    assert 'pikachuu' in other_worker
+
+    other_worker.discard('pikachuu')
+    assert 'pikachuu' not in NegativeCache(persistent=True)
+
+
+def test_missing_pokemon_is_fetched_once(app, fake_pokeapi):
+    for _ in range(3):
+        with pytest.raises(NonExistingPokemon):
+            PokemonService.add_pokemon_from_external_api('pikachuu')
+
+    assert fake_pokeapi.requests == ['/api/v2/pokemon/pikachuu/']
+
+
+def test_saved_pokemon_is_removed_from_negative_cache(app, fake_pokeapi):
+    with pytest.raises(NonExistingPokemon):
+        PokemonService.add_pokemon_from_external_api('pikachu')
+
+    PokemonService.save_pokemon(make_pokemon(25, 'pikachu'))
+
+    assert 'pikachu' not in PokemonService.negative_cache
+    assert '25' not in PokemonService.negative_cache
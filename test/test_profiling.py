@@ -0,0 +1,70 @@
+import os
+import pstats
+
+import pytest
+
+from app import create_app
+
+
+@pytest.fixture
+def profiled_app(app, tmp_path):
+    def make(**config):
+        return create_app(logger=False, config=dict(PROFILING_ENABLED=True, PROFILING_DIR=str(tmp_path), **config),
+                          mongo_config=dict(MONGODB_DB='mongoengine_mock', MONGODB_HOST='mongomock://localhost',
+                                            MONGODB_ALIAS='pokemon_api'))
+
+    return make
+
+
+def profiles(directory):
+    return {route: sorted(os.listdir(os.path.join(directory, route))) for route in os.listdir(directory)}
+
+
+def test_requests_are_not_profiled_by_default(profiled_app, tmp_path):
+    profiled_app().test_client().get('/api/pokemon/')
+
+    assert profiles(tmp_path) == {}
+
+
+def test_sampled_requests_are_profiled_per_route(profiled_app, tmp_path):
+    client = profiled_app(PROFILING_SAMPLE_RATE=1).test_client()
+
+    client.get('/api/pokemon/')
+    client.get('/pokemon/23/encounters')
+
+    saved = profiles(tmp_path)
+    assert set(saved) == {'GET_api_pokemon', 'GET_pokemon_id_encounters'}
+    assert '-sampled-' in saved['GET_api_pokemon'][0]
+
+    stats = pstats.Stats(os.path.join(tmp_path, 'GET_api_pokemon', saved['GET_api_pokemon'][0]))
+    assert any(function == 'iter_pokemons' for _, _, function in stats.stats)
+
+
+def test_requests_with_token_are_profiled(profiled_app, tmp_path):
+    client = profiled_app(PROFILING_TOKEN='secret').test_client()
+
+    client.get('/api/pokemon/', headers={'X-Profile': 'wrong'})
+    assert profiles(tmp_path) == {}
+
+    assert client.get('/api/pokemon/', headers={'X-Profile': 'sécret'}).status_code == 200
+    assert profiles(tmp_path) == {}
+
+    client.get('/api/pokemon/', headers={'X-Profile': 'secret'})
+    assert '-requested-' in profiles(tmp_path)['GET_api_pokemon'][0]
+
+
+def test_slow_requests_are_kept(profiled_app, tmp_path):
+    profiled_app(PROFILING_SLOW_THRESHOLD=60).test_client().get('/api/pokemon/')
+    assert profiles(tmp_path) == {}
+
+    profiled_app(PROFILING_SLOW_THRESHOLD=0).test_client().get('/api/pokemon/')
+    assert '-slow-' in profiles(tmp_path)['GET_api_pokemon'][0]
+
+
+def test_only_newest_profiles_are_kept(profiled_app, tmp_path):
+    client = profiled_app(PROFILING_SAMPLE_RATE=1, PROFILING_KEEP=2).test_client()
+
+    for _ in range(4):
+        client.get('/api/pokemon/')
+
+    assert len(profiles(tmp_path)['GET_api_pokemon']) == 2
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from api.backend.providers import LocalMirrorProvider, FallbackProvider, write_sqlite_mirror
+from api.backend.upstream import UpstreamClient
+from api.mongo import Pokemon
+from api.utils.exceptions import NonExistingPokemon
+from app import create_app
+from benchmarks.fake_pokeapi import make_pokemon
+
+MIRRORED = [make_pokemon(122, 'mr-mime'), make_pokemon(25, 'pikachu')]
+
+
+@pytest.fixture(params=['file', 'directory', 'sqlite'])
+def mirror_path(request, tmp_path):
+    if request.param == 'file':
+        path = tmp_path / 'pokemons.json'
+        path.write_text(json.dumps(MIRRORED))
+    elif request.param == 'directory':
+        path = tmp_path
+        for pokemon in MIRRORED:
+            (tmp_path / f"{pokemon['name']}.json").write_text(json.dumps(pokemon))
+    else:
+        path = tmp_path / 'pokemons.sqlite'
+        write_sqlite_mirror(str(path), MIRRORED)
+
+    return str(path)
+
+
+def test_local_mirror(mirror_path):
+    mirror = LocalMirrorProvider(mirror_path)
+
+    assert mirror.get_pokemon('mr-mime') == MIRRORED[0]
+    assert mirror.get_pokemon(25) == MIRRORED[1]
+
+    with pytest.raises(NonExistingPokemon):
+        mirror.get_pokemon('ekans')
+
+
+def test_fallback_provider(mirror_path, fake_pokeapi):
+    provider = FallbackProvider(LocalMirrorProvider(mirror_path), UpstreamClient(base_url=fake_pokeapi.url))
+
+    assert provider.get_pokemon('pikachu') == MIRRORED[1]
+    assert fake_pokeapi.requests == []
+
+    assert provider.get_pokemon('ekans')['id'] == 23
+    assert len(fake_pokeapi.requests) == 1
+
+    with pytest.raises(NonExistingPokemon):
+        provider.get_pokemon('missingno')
+
+
+@pytest.mark.parametrize('fallback', [True, False])
+def test_app_with_mirror(app, external_api, mirror_path, fallback):
+    # The external API is not reachable in this test
+    mirror_app = create_app(logger=False,
+                            config=dict(POKEMON_MIRROR_PATH=mirror_path, POKEMON_MIRROR_FALLBACK=fallback,
+                                        POKEAPI_URL='http://127.0.0.1:9/api/v2', POKEAPI_RETRIES=0),
+                            mongo_config=dict(MONGODB_DB='mongoengine_mock', MONGODB_HOST='mongomock://localhost',
+                                              MONGODB_ALIAS='pokemon_api'))
+    client = mirror_app.test_client()
+
+    assert client.post('/api/pokemon/', json={'name': 'Mr. Mime'}).status_code == 201
+    assert Pokemon.objects(name='mr-mime').count() == 1
+
+    assert client.post('/api/pokemon/', json={'name': 'ekans'}).status_code == (503 if fallback else 404)
@@ -0,0 +1,119 @@
+from unittest import mock
+
+import pytest
+
+from api.utils.rate_limit import MemoryBuckets, SQLiteBuckets
+from app import create_app
+from benchmarks.fake_pokeapi import make_pokemon
+
+
+@pytest.fixture
+def limited_app(app, fake_pokeapi):
+    def make(**config):
+        defaults = dict(RATE_LIMIT_ENABLED=True, RATE_LIMIT_DEFAULT=None, RATE_LIMIT_UPSTREAM=None,
+                        RATE_LIMIT_UPSTREAM_TOTAL=None, POKEAPI_URL=fake_pokeapi.url, POKEAPI_BACKOFF=0)
+        return create_app(logger=False, config=dict(defaults, **config),
+                          mongo_config=dict(MONGODB_DB='mongoengine_mock', MONGODB_HOST='mongomock://localhost',
+                                            MONGODB_ALIAS='pokemon_api'))
+
+    return make
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def buckets(request, tmp_path):
+    return MemoryBuckets() if request.param == 'memory' else SQLiteBuckets(str(tmp_path / 'limits.sqlite3'))
+
+
+def test_bucket_allows_bursts_and_refills(buckets):
+    with mock.patch('time.time', return_value=1000):
+        assert [buckets.take('client', 2, 3) for _ in range(4)] == [0, 0, 0, 0.5]
+        assert buckets.take('other', 2, 3) == 0
+
+    with mock.patch('time.time', return_value=1000.5):
+        assert buckets.take('client', 2, 3) == 0
+        assert buckets.take('client', 2, 3) == 0.5
+
+    with mock.patch('time.time', return_value=2000):
+        assert [buckets.take('client', 2, 3) for _ in range(4)] == [0, 0, 0, 0.5]
+
+
+def test_sqlite_buckets_are_shared_by_processes(tmp_path):
+    path = str(tmp_path / 'limits.sqlite3')
+
+    with mock.patch('time.time', return_value=1000):
+        assert SQLiteBuckets(path).take('client', 1, 1) == 0
+        assert SQLiteBuckets(path).take('client', 1, 1) == 1
+
+
+def test_route_limit_returns_429_with_retry_after(limited_app):
+    client = limited_app(RATE_LIMIT_DEFAULT=(0.1, 2), RATE_LIMIT_ROUTES={'GET /pokemon/<id>/encounters': (0.1, 1)},
+                         RATE_LIMIT_CLIENT_HEADER='X-Forwarded-For').test_client()
+
+    assert [client.get('/api/pokemon/').status_code for _ in range(3)] == [200, 200, 429]
+
+    response = client.get('/pokemon/23/encounters')
+    assert response.status_code == 404
+    response = client.get('/pokemon/143/encounters')
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '10'
+    assert response.json == {'message': 'Too many requests, try again later.'}
+
+    # Only the address added by the proxy identifies the client
+    assert client.get('/api/pokemon/', headers={'X-Forwarded-For': '1.2.3.4, 10.0.0.1'}).status_code == 200
+    assert client.get('/api/pokemon/', headers={'X-Forwarded-For': '5.6.7.8, 10.0.0.1'}).status_code == 200
+    assert client.get('/api/pokemon/', headers={'X-Forwarded-For': '10.0.0.1'}).status_code == 429
+
+
+def test_upstream_fetches_have_separate_budget(limited_app, fake_pokeapi):
+    client = limited_app(RATE_LIMIT_UPSTREAM=(0.01, 1)).test_client()
+
+    assert client.post('/api/pokemon/', json={'name': 'ekans'}).status_code == 201
+    assert client.post('/api/pokemon/', json={'name': 'ekans'}).status_code == 200
+
+    response = client.post('/api/pokemon/', json={'name': 'snorlax'})
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '100'
+
+    assert client.post('/pokemon/143/encounters', json={'place': 'city'}).status_code == 429
+    assert client.post('/pokemon/23/encounters', json={'place': 'city'}).status_code == 201
+    assert [item['status'] for item in client.post('/api/pokemon/batch', json={'names': ['ekans', 'snorlax']}).json] \
+        == [200, 429]
+    assert len(fake_pokeapi.requests) == 1
+
+
+def test_known_missing_pokemons_do_not_take_upstream_budget(limited_app, fake_pokeapi):
+    client = limited_app(RATE_LIMIT_UPSTREAM=(0.01, 2)).test_client()
+
+    assert client.post('/api/pokemon/batch', json={'names': ['missingno']}).json[0]['status'] == 404
+    assert [item['status'] for item in
+            client.post('/api/pokemon/batch', json={'names': ['MissingNo', 'missingno', 'ekans']}).json] \
+        == [404, 404, 201]
+    assert len(fake_pokeapi.requests) == 2
+
+
+def test_upstream_budget_is_shared_by_clients(limited_app, fake_pokeapi):
+    fake_pokeapi.add(make_pokemon(25, 'pikachu'))
+    client = limited_app(RATE_LIMIT_UPSTREAM_TOTAL=(0.01, 2), RATE_LIMIT_CLIENT_HEADER='X-Forwarded-For').test_client()
+
+    statuses = [client.post('/api/pokemon/', json={'name': name}, headers={'X-Forwarded-For': address}).status_code
+                for name, address in [('ekans', '1.1.1.1'), ('snorlax', '2.2.2.2'), ('pikachu', '3.3.3.3')]]
+
+    assert statuses == [201, 201, 429]
+
+
+def test_rejections_are_counted(limited_app):
+    client = limited_app(RATE_LIMIT_DEFAULT=(0.1, 1)).test_client()
+    client.get('/api/pokemon/')
+    client.get('/api/pokemon/')
+
+    metrics = client.get('/metrics').data.decode()
+
+    assert 'pokemon_api_rate_limited_total{budget="route",route="GET /api/pokemon/"}' in metrics
+    assert 'pokemon_api_errors_total{error="RateLimited"}' in metrics
+
+
+def test_rate_limits_are_disabled_by_default(app):
+    client = app.test_client()
+
+    assert 'rate_limit' not in app.extensions
+    assert all(client.get('/api/pokemon/').status_code == 200 for _ in range(100))
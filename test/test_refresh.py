@@ -0,0 +1,118 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from api.backend import PokemonService
+from api.backend.refresh import Refresher
+from api.mongo import Pokemon
+from app import create_app
+from benchmarks.fake_pokeapi import make_pokemon
+
+
+@pytest.fixture
+def refresher(app, fake_pokeapi, monkeypatch):
+    refresher = Refresher(PokemonService.refresh_pokemon, workers=2)
+    monkeypatch.setattr(PokemonService, 'refresh_ttl', 60)
+    monkeypatch.setattr(PokemonService, 'refresher', refresher)
+
+    yield refresher
+
+    refresher.close()
+
+
+def make_stale(pokemon_id):
+    Pokemon.objects(id=pokemon_id).update_one(set__fetched_at=datetime.utcnow() - timedelta(hours=1))
+    PokemonService.cache.clear()
+
+
+def test_saved_pokemon_has_fetch_time(app):
+    PokemonService.save_pokemon(make_pokemon(23, 'ekans'))
+
+    assert datetime.utcnow() - Pokemon.objects(id=23).first().fetched_at < timedelta(minutes=1)
+
+
+def test_stale_pokemon_is_returned_and_refreshed_in_background(refresher, fake_pokeapi):
+    PokemonService.add_pokemon_from_external_api('ekans')
+    Pokemon.objects(id=23).update_one(set__encounter_count=5)
+    make_stale(23)
+    version = PokemonService.get_pokemons_version().version
+    fake_pokeapi.add(make_pokemon(23, 'ekans', weight=70))
+
+    assert PokemonService.get_by_name('ekans')['weight'] == 69
+
+    refresher.wait()
+    pokemon = PokemonService.get_by_name('ekans')
+
+    assert pokemon['weight'] == 70
+    assert pokemon['encounter_count'] == 5
+    assert pokemon['fetched_at'] > datetime.utcnow() - timedelta(minutes=1)
+    assert PokemonService.get_pokemons_version().version == version + 1
+    assert len(fake_pokeapi.requests) == 2
+
+
+def test_fresh_pokemon_is_not_refreshed(refresher, fake_pokeapi):
+    PokemonService.add_pokemon_from_external_api('ekans')
+
+    PokemonService.get_by_name('ekans')
+    PokemonService.get_by_id(23)
+    PokemonService.get_many(['ekans', 23])
+    refresher.wait()
+
+    assert len(fake_pokeapi.requests) == 1
+    assert refresher.stats()['submitted'] == 0
+
+
+def test_unchanged_pokemon_keeps_version(refresher, fake_pokeapi):
+    PokemonService.add_pokemon_from_external_api('ekans')
+    make_stale(23)
+    version = PokemonService.get_pokemons_version().version
+
+    PokemonService.get_many(['ekans'])
+    refresher.wait()
+
+    assert len(fake_pokeapi.requests) == 2
+    assert not PokemonService.is_stale(Pokemon._get_collection().find_one({'_id': 23}))
+    assert PokemonService.get_pokemons_version().version == version
+
+
+def test_stored_pokemon_is_kept_if_upstream_fails(refresher, fake_pokeapi):
+    PokemonService.add_pokemon_from_external_api('ekans')
+    make_stale(23)
+    fake_pokeapi.fail_next(10)
+
+    PokemonService.get_by_id(23)
+    refresher.wait()
+
+    assert PokemonService.get_by_id(23).weight == 69
+    assert PokemonService.is_stale(Pokemon._get_collection().find_one({'_id': 23}))
+
+
+def test_refresher_bounds_pending_refreshes():
+    release = threading.Event()
+    refresher = Refresher(lambda pokemon_id: release.wait(5), workers=1, max_pending=2)
+
+    assert refresher.submit(1)
+    assert not refresher.submit(1)
+    assert refresher.submit(2)
+    assert not refresher.submit(3)
+    assert refresher.stats() == dict(submitted=2, dropped=1, pending=2)
+
+    release.set()
+    refresher.wait()
+
+    assert refresher.stats()['pending'] == 0
+    refresher.close()
+
+
+def test_refresh_is_disabled_by_default(app):
+    assert PokemonService.refresher is None
+
+    create_app(logger=False, config=dict(POKEMON_REFRESH_TTL=60),
+               mongo_config=dict(MONGODB_DB='mongoengine_mock', MONGODB_HOST='mongomock://localhost',
+                                 MONGODB_ALIAS='pokemon_api'))
+
+    try:
+        assert isinstance(PokemonService.refresher, Refresher)
+    finally:
+        PokemonService.init_app(app)
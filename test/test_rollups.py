@@ -0,0 +1,71 @@
+import pytest
+
+from api.backend import PokemonService, rollups
+from api.mongo import Encounter, EncounterRollup
+from api.utils.exceptions import NonExistingPokemon
+from benchmarks.fake_pokeapi import make_pokemon
+
+DAY = 86400
+
+
+@pytest.fixture
+def encounters(app):
+    for pokemon in (make_pokemon(23, 'ekans'), make_pokemon(143, 'snorlax')):
+        PokemonService.save_pokemon(pokemon)
+
+    records = [dict(pokemon_id=23, place='city', timestamp=DAY + 10),
+               dict(pokemon_id=23, place='city', timestamp=DAY + 3700),
+               dict(pokemon_id=23, place='forest', timestamp=2 * DAY + 5),
+               dict(pokemon_id=143, place='forest', timestamp=2 * DAY + 3600)]
+    encounters = {index: Encounter(**record) for index, record in enumerate(records)}
+
+    assert PokemonService.save_encounters(encounters) == []
+
+
+def test_rollups_are_updated_with_encounters(encounters):
+    assert PokemonService.get_encounter_stats('place', pokemon_id=23) == [dict(key='city', count=2),
+                                                                          dict(key='forest', count=1)]
+    assert PokemonService.get_encounter_stats('place') == [dict(key='city', count=2), dict(key='forest', count=2)]
+    assert PokemonService.get_encounter_stats('day') == [dict(key=DAY, count=2), dict(key=2 * DAY, count=2)]
+    assert PokemonService.get_encounter_stats('hour', pokemon_id='143') == [dict(key=2 * DAY + 3600, count=1)]
+
+
+def test_single_encounter_updates_rollups(encounters):
+    PokemonService.add_pokemon_encounter(143, dict(place='city'))
+
+    assert dict(key='city', count=1) in PokemonService.get_encounter_stats('place', pokemon_id=143)
+    assert PokemonService.get_encounter_stats('place', limit=1) == [dict(key='city', count=3)]
+
+
+def test_time_rollups_can_be_filtered(encounters):
+    assert PokemonService.get_encounter_stats('hour', since=DAY + 3600) == \
+        [dict(key=DAY + 3600, count=1), dict(key=2 * DAY, count=1), dict(key=2 * DAY + 3600, count=1)]
+    assert PokemonService.get_encounter_stats('hour', since=DAY + 3601, until=2 * DAY) == \
+        [dict(key=DAY + 3600, count=1)]
+
+
+def test_stats_of_missing_pokemon(app):
+    with pytest.raises(NonExistingPokemon):
+        PokemonService.get_encounter_stats('place', pokemon_id=1)
+
+
+def test_rebuild(encounters):
+    incremental = sorted(EncounterRollup.objects.exclude('id').as_pymongo(), key=str)
+    EncounterRollup._get_collection().update_many({}, {'$set': {'count': 100}})
+
+    assert rollups.rebuild(batch_size=3) == len(incremental)
+    assert sorted(EncounterRollup.objects.exclude('id').as_pymongo(), key=str) == incremental
+
+
+def test_stats_endpoints(encounters, app):
+    client = app.test_client()
+
+    response = client.get('/pokemon/23/encounters/stats')
+    assert response.status_code == 200
+    assert response.json == dict(dimension='place', counts=[dict(key='city', count=2), dict(key='forest', count=1)])
+
+    response = client.get('/pokemon/encounters/stats?dimension=day&limit=1')
+    assert response.json == dict(dimension='day', counts=[dict(key=DAY, count=2)])
+
+    assert client.get('/pokemon/1/encounters/stats').status_code == 404
+    assert client.get('/pokemon/encounters/stats?dimension=week').status_code == 400
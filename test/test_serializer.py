@@ -0,0 +1,50 @@
+import pytest
+from flask_restx import fields, marshal
+
+from api.encounter.json_schema import encounter_get
+from api.pokemon.json_schema import pokemon_get
+from api.utils.serializer import Serializer
+
+SPRITES = {'front_default': 'https://pokeapi.co/front.png', 'back_default': None}
+
+
+@pytest.mark.parametrize('document', [
+    dict(_id=143, name='snorlax', base_experience=189, height=21, weight=4600, sprites=SPRITES),
+    dict(_id=143, name='snorlax', base_experience=189, height=21, weight=4600, sprites=SPRITES, encounter_count=3),
+    dict(_id=143, name='snorlax'),
+    dict(_id='143', name='snorlax', height='21', sprites={}),
+    dict(_id=143, name='snorlax', sprite_mask=0b10001, sprite_overrides={'front_shiny': 'https://pokeapi.co/shiny.png'}),
+])
+def test_pokemon_is_serialized_like_marshal(document):
+    assert Serializer(pokemon_get)(document) == marshal(document, pokemon_get)
+
+
+@pytest.mark.parametrize('document', [
+    dict(place='city', note='found', timestamp=1600000000),
+    dict(place='city', timestamp=1600000000),
+    dict(place='city', note=None, timestamp=1600000000),
+])
+def test_encounter_is_serialized_like_marshal(document):
+    assert Serializer(encounter_get, skip_none=True)(document) == marshal(document, encounter_get, skip_none=True)
+
+
+def test_unsupported_fields_use_marshal():
+    model = {'names': fields.List(fields.String), 'flag': fields.Boolean(default=True), 'nested': fields.String(
+        attribute='a.b')}
+    document = dict(names=['ekans', 23], a=dict(b='c'))
+
+    assert Serializer(model)(document) == marshal(document, model)
+
+
+def test_projection_contains_only_serialized_fields():
+    assert Serializer(pokemon_get).projection == dict(base_experience=1, height=1, _id=1, name=1, weight=1, sprites=1,
+                                                      sprite_mask=1, sprite_overrides=1)
+    assert Serializer(encounter_get).projection == dict(place=1, note=1, timestamp=1, _id=0)
+
+
+def test_projection_is_not_shared_between_queries():
+    serializer = Serializer(encounter_get)
+    serializer.projection.pop('_id')
+
+    assert serializer.projection is not serializer.projection
+    assert serializer.projection['_id'] == 0
@@ -0,0 +1,105 @@
+import multiprocessing
+from unittest import mock
+
+import pytest
+
+from api.backend import PokemonService
+from api.backend.shared_cache import SQLitePokemonCache, RedisPokemonCache
+from app import create_app
+from benchmarks.fake_pokeapi import make_pokemon
+from test.fake_redis import FakeRedis
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def make_cache(request, tmp_path):
+    """
+    :return: function creating caches which share their entries, like the caches of separate processes
+    """
+
+    if request.param == 'sqlite':
+        return lambda **kwargs: SQLitePokemonCache(str(tmp_path / 'cache.sqlite3'), **kwargs)
+
+    client = FakeRedis()
+    return lambda maxsize=None, **kwargs: RedisPokemonCache(client, **kwargs)
+
+
+def test_shared_cache_stores_values_of_all_workers(make_cache):
+    first, second = make_cache(), make_cache()
+    first.set(('name', 'ekans'), {'_id': 23, 'sprites': {'front_default': None}})
+
+    assert second.get(('name', 'ekans')) == {'_id': 23, 'sprites': {'front_default': None}}
+    assert second.get(('name', 'snorlax')) is None
+    assert second.stats()['hits'] == 1 and second.stats()['misses'] == 1
+    assert first.stats()['size'] == 1
+
+
+def test_invalidation_reaches_all_workers(make_cache):
+    first, second = make_cache(), make_cache()
+    first.set(('id', '23'), 1)
+    first.set(('id', '143'), 2)
+
+    second.invalidate(('id', '23'), ('id', '404'))
+
+    assert first.get(('id', '23')) is None
+    assert first.get(('id', '143')) == 2
+
+    second.clear()
+    assert first.get(('id', '143')) is None
+
+
+def test_shared_cache_entries_expire(make_cache):
+    cache = make_cache(ttl=0.05)
+    cache.set('ekans', 1)
+
+    with mock.patch('time.time', return_value=10 ** 10), mock.patch('time.monotonic', return_value=10 ** 10):
+        assert cache.get('ekans') is None
+
+
+def test_sqlite_cache_evicts_least_recently_used_entry(tmp_path):
+    cache = SQLitePokemonCache(str(tmp_path / 'cache.sqlite3'), maxsize=2, ttl=None, touch_interval=0)
+    cache.set('ekans', 1)
+    cache.set('snorlax', 2)
+    cache.get('ekans')
+    cache.set('hitmonlee', 3)
+
+    assert cache.get('snorlax') is None
+    assert cache.get('ekans') == 1
+    assert cache.get('hitmonlee') == 3
+    assert cache.stats()['size'] == 2
+
+
+def fill_cache(path, pokemon_id):
+    SQLitePokemonCache(path).set(('id', str(pokemon_id)), {'_id': pokemon_id})
+
+
+def test_sqlite_cache_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    cache = SQLitePokemonCache(path)
+    processes = [multiprocessing.Process(target=fill_cache, args=(path, pokemon_id)) for pokemon_id in range(1, 5)]
+
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert [cache.get(('id', str(pokemon_id))) for pokemon_id in range(1, 5)] == \
+        [{'_id': pokemon_id} for pokemon_id in range(1, 5)]
+
+
+def test_service_uses_configured_backend(app, tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    create_app(logger=False, config=dict(POKEMON_CACHE_BACKEND='sqlite', POKEMON_CACHE_PATH=path),
+               mongo_config=dict(MONGODB_DB='mongoengine_mock', MONGODB_HOST='mongomock://localhost',
+                                 MONGODB_ALIAS='pokemon_api'))
+
+    try:
+        assert isinstance(PokemonService.cache, SQLitePokemonCache)
+
+        PokemonService.save_pokemon(make_pokemon(23, 'ekans'))
+        assert PokemonService.get_by_name('ekans')['_id'] == 23
+        assert SQLitePokemonCache(path).get(('name', 'ekans'))['_id'] == 23
+
+        PokemonService.after_pokemons_saved({23: 'ekans'})
+        assert SQLitePokemonCache(path).get(('name', 'ekans')) is None
+    finally:
+        PokemonService.init_app(app)
@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from api.backend import PokemonService
+from api.backend.single_flight import SingleFlight
+from api.mongo import Pokemon
+from api.utils.exceptions import NonExistingPokemon
+
+
+def test_concurrent_calls_for_the_same_key_are_coalesced():
+    single_flight = SingleFlight()
+    calls = []
+
+    def slow_call():
+        calls.append(1)
+        time.sleep(0.1)
+        return 'ekans'
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: single_flight.do('ekans', slow_call), range(8)))
+
+    assert results == ['ekans'] * 8
+    assert len(calls) == 1
+
+
+def test_error_is_shared_by_all_waiting_callers():
+    single_flight = SingleFlight()
+    started = threading.Event()
+
+    def failing_call():
+        started.set()
+        time.sleep(0.1)
+        raise NonExistingPokemon
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(single_flight.do, 'doesnt_exist', failing_call)
+        started.wait()
+        follower = executor.submit(single_flight.do, 'doesnt_exist', failing_call)
+
+        for future in (leader, follower):
+            with pytest.raises(NonExistingPokemon):
+                future.result()
+
+
+def test_finished_call_is_not_reused():
+    single_flight = SingleFlight()
+
+    assert single_flight.do('ekans', lambda: 1) == 1
+    assert single_flight.do('ekans', lambda: 2) == 2
+
+
+def test_calls_are_serialized_between_processes_with_lock_dir(tmp_path):
+    # Two instances sharing lock_dir behave like two gunicorn workers
+    first, second = SingleFlight(lock_dir=str(tmp_path)), SingleFlight(lock_dir=str(tmp_path))
+    release, order = threading.Event(), []
+
+    def holding_call():
+        order.append('first started')
+        release.wait()
+        order.append('first finished')
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        executor.submit(first.do, 'ekans', holding_call)
+        time.sleep(0.05)
+        waiting = executor.submit(second.do, 'ekans', order.append, 'second started')
+        time.sleep(0.05)
+        release.set()
+        waiting.result()
+
+    assert order == ['first started', 'first finished', 'second started']
+
+
+def test_number_of_lock_files_is_bounded(tmp_path):
+    single_flight = SingleFlight(lock_dir=str(tmp_path), lock_files=4)
+
+    for number in range(100):
+        single_flight.do(number, lambda: None)
+
+    assert len(os.listdir(tmp_path)) <= 4
+
+
+def test_concurrent_external_api_fetches_are_coalesced(app, fake_pokeapi):
+    fake_pokeapi.delay = 0.1
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(PokemonService.add_pokemon_from_external_api, ['ekans'] * 8))
+
+    assert fake_pokeapi.requests == ['/api/v2/pokemon/ekans/']
+    assert Pokemon.objects(name='ekans').count() == 1
+
+
+def test_external_api_is_not_called_for_stored_pokemon(app, fake_pokeapi):
+    Pokemon(id=23, name='ekans', weight=69, height=20, base_experience=58).save()
+
+    PokemonService.add_pokemon_from_external_api(23)
+
+    assert fake_pokeapi.requests == []
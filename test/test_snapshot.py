@@ -0,0 +1,97 @@
+import gzip
+import json
+import time
+
+import pytest
+
+from api.backend import PokemonService
+from api.utils.snapshot import EncodedSnapshot
+from app import create_app
+from benchmarks.fake_pokeapi import make_pokemon
+
+
+@pytest.fixture
+def loaded_app(app):
+    app.extensions['pokemon_snapshot'].debounce = 0.01
+
+    for pokemon_id in (1, 2, 3):
+        PokemonService.save_pokemon(make_pokemon(pokemon_id))
+
+    return app
+
+
+def wait_for_snapshot(snapshot: EncodedSnapshot, version: int):
+    deadline = time.monotonic() + 5
+    while snapshot.get(version) is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    return snapshot.get(version)
+
+
+def test_full_list_is_served_from_snapshot(loaded_app, monkeypatch):
+    client = loaded_app.test_client()
+    expected = client.get('/api/pokemon/?limit=1000').json
+    loaded_app.extensions['pokemon_snapshot'].rebuild()
+
+    response = client.get('/api/pokemon/')
+    assert response.json == expected
+    assert 'Content-Encoding' not in response.headers
+
+    def fail(*args, **kwargs):
+        raise AssertionError('Pokemons should not be loaded')
+
+    monkeypatch.setattr(PokemonService, 'iter_pokemons', fail)
+
+    compressed = client.get('/api/pokemon/', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert compressed.headers['Vary'] == 'Accept-Encoding'
+    assert compressed.headers['ETag'] == response.headers['ETag']
+    assert json.loads(gzip.decompress(compressed.data)) == expected
+
+
+def test_snapshot_is_rebuilt_after_pokemon_is_added(loaded_app):
+    client = loaded_app.test_client()
+    assert len(client.get('/api/pokemon/').json) == 3
+
+    PokemonService.save_pokemon(make_pokemon(4))
+    assert wait_for_snapshot(loaded_app.extensions['pokemon_snapshot'],
+                             PokemonService.get_pokemons_version().version) is not None
+
+    assert [pokemon['id'] for pokemon in client.get('/api/pokemon/').json] == [1, 2, 3, 4]
+
+
+def test_snapshot_of_another_version_is_not_returned():
+    snapshot = EncodedSnapshot(build=lambda: [1], get_version=lambda: 1)
+    snapshot.rebuild()
+
+    assert snapshot.get(1).bodies['identity'] == b'[1]\n'
+    assert snapshot.get(0) is None
+
+
+def test_snapshot_is_not_built_by_requests():
+    builds = []
+    snapshot = EncodedSnapshot(build=lambda: builds.append(None) or [], get_version=lambda: 1, debounce=60)
+
+    assert snapshot.get(1) is None
+    assert builds == []
+
+
+def test_debounced_rebuild():
+    builds = []
+    snapshot = EncodedSnapshot(build=lambda: builds.append(None) or len(builds), get_version=lambda: 1,
+                               debounce=0.05)
+
+    assert snapshot.get(1) is None
+    snapshot.schedule()
+
+    assert wait_for_snapshot(snapshot, 1).bodies['identity'] == b'1\n'
+    assert len(builds) == 1
+
+
+def test_snapshot_can_be_disabled(loaded_app):
+    app = create_app(logger=False, config=dict(POKEMON_SNAPSHOT_ENABLED=False),
+                     mongo_config=dict(MONGODB_DB='mongoengine_mock', MONGODB_HOST='mongomock://localhost',
+                                       MONGODB_ALIAS='pokemon_api'))
+
+    assert 'pokemon_snapshot' not in app.extensions
+    assert len(app.test_client().get('/api/pokemon/', headers={'Accept-Encoding': 'gzip'}).json) == 3
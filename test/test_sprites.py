@@ -0,0 +1,67 @@
+from flask_restx import marshal
+
+from api.backend import PokemonService
+from api.mongo import Pokemon, Sprite
+from api.mongo.migrations import compact_sprites
+from api.pokemon.json_schema import pokemon_sprites
+from benchmarks.fake_pokeapi import make_pokemon
+
+
+def test_sprites_following_the_pattern_are_stored_as_mask():
+    sprites = make_pokemon(143)['sprites']
+
+    mask, overrides = Sprite.compact(143, sprites)
+
+    assert mask == 0b1010101
+    assert overrides == {}
+    assert Sprite.expand(143, mask, overrides) == Sprite.pick_specified_fields(sprites)
+
+
+def test_sprites_not_following_the_pattern_are_kept():
+    sprites = dict(make_pokemon(143)['sprites'], front_default='https://example.com/143.png',
+                   back_shiny=Sprite.BASE_URL + 'back/shiny/1.png')
+
+    mask, overrides = Sprite.compact(143, sprites)
+
+    assert overrides == dict(front_default='https://example.com/143.png',
+                             back_shiny=Sprite.BASE_URL + 'back/shiny/1.png')
+    assert Sprite.expand(143, mask, overrides) == Sprite.pick_specified_fields(sprites)
+
+
+def test_saved_pokemon_has_compact_sprites(app):
+    pokemon = make_pokemon(143, 'snorlax')
+    PokemonService.save_pokemon(pokemon)
+
+    document = Pokemon._get_collection().find_one({'_id': 143})
+
+    assert 'sprites' not in document
+    assert document['sprite_mask'] == 0b1010101
+    assert Pokemon.sprites_of(document) == Sprite.pick_specified_fields(pokemon['sprites'])
+
+
+def test_api_returns_expanded_sprites(app, fake_pokeapi):
+    client = app.test_client()
+    expected = marshal(make_pokemon(23, 'ekans')['sprites'], pokemon_sprites)
+
+    assert client.post('/api/pokemon/', json={'name': 'ekans'}).status_code == 201
+    assert client.post('/api/pokemon/', json={'name': 'ekans'}).json['sprites'] == expected
+    assert client.get('/api/pokemon/').json[0]['sprites'] == expected
+    assert client.post('/api/pokemon/batch', json={'names': ['ekans']}).json[0]['pokemon']['sprites'] == expected
+
+
+def test_compact_sprites_migration(app):
+    documents = [dict(_id=pokemon_id, name=f'pokemon-{pokemon_id}',
+                      sprites=Sprite.pick_specified_fields(make_pokemon(pokemon_id)['sprites']))
+                 for pokemon_id in (1, 2, 3, 4)]
+    documents[3]['sprites']['front_female'] = 'https://example.com/f.png'
+    Pokemon._get_collection().insert_many(documents)
+    before = {pokemon['_id']: Pokemon.sprites_of(pokemon) for pokemon in Pokemon._get_collection().find()}
+
+    assert compact_sprites(batch_size=3) == 4
+    assert compact_sprites() == 0
+
+    documents = list(Pokemon._get_collection().find())
+
+    assert not any('sprites' in document for document in documents)
+    assert {document['_id']: Pokemon.sprites_of(document) for document in documents} == before
+    assert documents[3]['sprite_overrides'] == dict(front_female='https://example.com/f.png')
@@ -0,0 +1,58 @@
+import json
+import logging
+import re
+from types import SimpleNamespace
+
+from api.utils.timing import MongoTimingListener, record, span
+from app import create_app
+
+
+def spans(response):
+    return {match[0]: match[1] for match in re.findall(r'(\w+);dur=([\d.]+)', response.headers['Server-Timing'])}
+
+
+def test_server_timing_header(app, fake_pokeapi):
+    client = app.test_client()
+
+    assert set(spans(client.post('/api/pokemon/', json={'name': 'ekans'}))) == {'upstream', 'total'}
+    assert set(spans(client.post('/api/pokemon/', json={'name': 'ekans'}))) == {'marshal', 'total'}
+    assert set(spans(client.post('/pokemon/23/encounters', json={'place': 'city'}))) == {'validate', 'total'}
+
+
+def test_spans_are_summed(app):
+    with app.test_request_context():
+        app.preprocess_request()
+
+        MongoTimingListener().succeeded(SimpleNamespace(duration_micros=1500))
+        MongoTimingListener().failed(SimpleNamespace(duration_micros=500))
+        with span('marshal'):
+            pass
+
+        header = app.process_response(app.response_class()).headers['Server-Timing']
+
+    assert header.startswith('mongo;dur=2.00;desc="2x", marshal;dur=')
+
+
+def test_spans_outside_of_requests_are_ignored():
+    record('mongo', 1)
+
+
+def test_server_timing_log(app, caplog, monkeypatch):
+    monkeypatch.setattr(logging.getLogger('PokemonAPI'), 'propagate', True)
+    app = create_app(logger=False, config=dict(SERVER_TIMING_LOG=True),
+                     mongo_config=dict(MONGODB_DB='mongoengine_mock', MONGODB_HOST='mongomock://localhost',
+                                       MONGODB_ALIAS='pokemon_api'))
+
+    with caplog.at_level(logging.INFO, logger='PokemonAPI'):
+        app.test_client().get('/pokemon/23/encounters')
+
+    line = json.loads(caplog.records[-1].message)
+    assert line['path'] == '/pokemon/23/encounters' and line['status'] == 404 and 'total_ms' in line
+
+
+def test_server_timing_can_be_disabled():
+    app = create_app(logger=False, config=dict(SERVER_TIMING_ENABLED=False),
+                     mongo_config=dict(MONGODB_DB='mongoengine_mock', MONGODB_HOST='mongomock://localhost',
+                                       MONGODB_ALIAS='pokemon_api'))
+
+    assert 'Server-Timing' not in app.test_client().get('/api/pokemon/').headers
@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+from api.backend import PokemonService
+from api.backend.upstream import UpstreamClient
+from api.mongo import Pokemon
+from api.utils.exceptions import NonExistingPokemon, UpstreamUnavailable
+from benchmarks.fake_pokeapi import FakePokeApi
+
+
+@pytest.fixture
+def pokeapi():
+    with FakePokeApi() as server:
+        yield server
+
+
+def test_get_pokemon(pokeapi):
+    client = UpstreamClient(base_url=pokeapi.url)
+
+    assert client.get_pokemon('ekans')['id'] == 23
+
+    with pytest.raises(NonExistingPokemon):
+        client.get_pokemon('doesnt_exist')
+
+
+def test_connections_are_reused(pokeapi):
+    client = UpstreamClient(base_url=pokeapi.url)
+
+    for name in ('ekans', 'snorlax', 'hitmonlee'):
+        client.get_pokemon(name)
+
+    assert pokeapi.connections == 1
+
+
+def test_transient_failures_are_retried(pokeapi):
+    client = UpstreamClient(base_url=pokeapi.url, retries=2, backoff=0)
+    pokeapi.fail_next(2)
+
+    assert client.get_pokemon('ekans')['name'] == 'ekans'
+    assert len(pokeapi.requests) == 3
+
+
+def test_retries_are_bounded(pokeapi):
+    client = UpstreamClient(base_url=pokeapi.url, retries=1, backoff=0)
+    pokeapi.fail_next(3)
+
+    with pytest.raises(UpstreamUnavailable):
+        client.get_pokemon('ekans')
+
+    assert len(pokeapi.requests) == 2
+
+
+def test_read_timeout(pokeapi):
+    client = UpstreamClient(base_url=pokeapi.url, read_timeout=0.05, retries=0)
+    pokeapi.delay = 0.2
+
+    with pytest.raises(UpstreamUnavailable):
+        client.get_pokemon('ekans')
+
+
+def test_circuit_breaker_fails_fast_until_cooldown_passes(pokeapi):
+    client = UpstreamClient(base_url=pokeapi.url, retries=0, breaker_threshold=2, breaker_cooldown=0.2)
+    pokeapi.fail_next(2)
+
+    for _ in range(3):
+        with pytest.raises(UpstreamUnavailable):
+            client.get_pokemon('ekans')
+
+    assert len(pokeapi.requests) == 2
+
+    time.sleep(0.2)
+    assert client.get_pokemon('ekans')['name'] == 'ekans'
+
+
+def test_post_pokemon_when_external_api_is_unavailable(app, fake_pokeapi):
+    fake_pokeapi.fail_next(3)
+
+    response = app.test_client().post('/api/pokemon/', json={"name": "ekans"})
+
+    assert response.status_code == 503
+    assert Pokemon.objects().count() == 0
+
+
+def test_post_pokemon_fetched_from_external_api(app, fake_pokeapi):
+    response = app.test_client().post('/api/pokemon/', json={"name": "snorlax"})
+
+    assert response.status_code == 201
+    assert PokemonService.get_by_name('snorlax')['weight'] == 4600
+
+
+def test_get_many_fetches_missing_pokemons_concurrently(app, fake_pokeapi):
+    PokemonService.save_pokemon(fake_pokeapi.pokemons['ekans'])
+    fake_pokeapi.delay = 0.2
+
+    started = time.perf_counter()
+    pokemons = PokemonService.get_many(['ekans', 'snorlax', 106, 'doesnt_exist'])
+
+    assert time.perf_counter() - started < 0.4
+    assert [pokemon['status'] for pokemon in pokemons] == [200, 201, 201, 404]
+    assert [pokemon['pokemon'] and pokemon['pokemon']['name'] for pokemon in pokemons] == \
+           ['ekans', 'snorlax', 'hitmonlee', None]
+    assert len(fake_pokeapi.requests) == 3
@@ -0,0 +1,62 @@
+import json
+
+from api.backend import PokemonService
+from api.backend.warmup import warm_up
+from api.mongo import Pokemon
+from benchmarks.fake_pokeapi import make_pokemon
+
+
+def test_warm_up_fetches_ids_and_names(app, fake_pokeapi):
+    for pokemon_id in range(1, 11):
+        fake_pokeapi.add(make_pokemon(pokemon_id))
+
+    stats = warm_up(ids=range(1, 11), names=['ekans'], workers=4, chunk_size=3)
+
+    assert Pokemon.objects().count() == 11
+    assert stats['fetched'] == stats['saved'] == 11
+    assert stats['per_second'] > 0
+
+
+def test_warm_up_skips_stored_and_missing_pokemons(app, fake_pokeapi):
+    Pokemon(id=23, name='ekans', weight=69, height=20, base_experience=58, encounter_count=5).save()
+
+    stats = warm_up(ids=[23, 143, 9999], names=['ekans', 'hitmonlee'])
+
+    assert (stats['skipped'], stats['saved'], stats['missing']) == (2, 2, 1)
+    assert len(fake_pokeapi.requests) == 3
+    assert Pokemon.objects(id=23).first().encounter_count == 5
+
+
+def test_warm_up_normalizes_names(app, fake_pokeapi):
+    PokemonService.save_pokemon(make_pokemon(122, 'mr-mime'))
+
+    stats = warm_up(names=[' Mr. Mime', 'mr-mime', 'SNORLAX'])
+
+    assert (stats['requested'], stats['skipped'], stats['saved']) == (2, 1, 1)
+    assert fake_pokeapi.requests == ['/api/v2/pokemon/snorlax/']
+
+
+def test_warm_up_from_dump(app, fake_pokeapi, tmp_path):
+    dump = tmp_path / 'pokemons.json'
+    dump.write_text(json.dumps([make_pokemon(pokemon_id) for pokemon_id in range(1, 6)]))
+
+    stats = warm_up(dump=str(dump))
+
+    assert stats['saved'] == Pokemon.objects().count() == 5
+    assert fake_pokeapi.requests == []
+
+
+def test_warm_up_command(app, fake_pokeapi):
+    result = app.test_cli_runner().invoke(args=['warm-up', '--ids', '23,106-107', '--names', 'snorlax'])
+
+    assert result.exit_code == 0
+    assert '3 Pokemons saved' in result.output
+    assert '1 not found' in result.output
+    assert set(Pokemon.objects().distinct('name')) == {'ekans', 'hitmonlee', 'snorlax'}
+
+
+def test_warm_up_command_with_invalid_ids(app):
+    result = app.test_cli_runner().invoke(args=['warm-up', '--ids', '1-abc'])
+
+    assert result.exit_code != 0
+    assert 'is neither an id nor a range of ids' in result.output
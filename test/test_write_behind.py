@@ -0,0 +1,123 @@
+import threading
+import time
+
+import pytest
+from prometheus_client import REGISTRY
+
+from api.backend import PokemonService
+from api.backend.write_behind import EncounterQueue
+from api.mongo import Pokemon, Encounter
+from api.utils.exceptions import EncounterQueueFull
+from app import create_app
+from benchmarks.fake_pokeapi import FakePokeApi
+
+
+@pytest.fixture
+def write_behind_app(app, external_api):
+    with FakePokeApi() as pokeapi:
+        flask_app = create_app(logger=False,
+                               config=dict(ENCOUNTER_WRITE_BEHIND=True, ENCOUNTER_QUEUE_BATCH_SIZE=10,
+                                           POKEAPI_URL=pokeapi.url, POKEAPI_BACKOFF=0),
+                               mongo_config=dict(MONGODB_DB='mongoengine_mock', MONGODB_HOST='mongomock://localhost',
+                                                 MONGODB_ALIAS='pokemon_api'))
+        yield flask_app
+
+        PokemonService.encounter_queue.close()
+        PokemonService.encounter_queue = None
+
+
+def test_encounters_are_written_in_batches():
+    batches, release = [], threading.Event()
+    encounter_queue = EncounterQueue(writer=lambda batch: release.wait() and batches.append(len(batch)) or [],
+                                     batch_size=3)
+
+    # Writer is held until all encounters are waiting in the queue
+    for _ in range(8):
+        encounter_queue.submit(Encounter(place='city'))
+
+    release.set()
+    encounter_queue.close()
+
+    assert sum(batches) == 8
+    assert max(batches) == 3
+    assert len(batches) <= 4
+    assert encounter_queue.stats() == dict(depth=0, maxsize=10000, accepted=8, rejected=0, written=8, failed=0)
+
+
+def test_full_queue_rejects_encounters():
+    release = threading.Event()
+    encounter_queue = EncounterQueue(writer=lambda batch: release.wait() and [], maxsize=1)
+
+    encounter_queue.submit(Encounter(place='city'))
+
+    while encounter_queue.stats()['depth']:  # waiting until the worker takes it
+        time.sleep(0.01)
+
+    encounter_queue.submit(Encounter(place='city'))
+
+    with pytest.raises(EncounterQueueFull):
+        encounter_queue.submit(Encounter(place='city'))
+
+    release.set()
+    encounter_queue.close()
+
+    with pytest.raises(EncounterQueueFull):
+        encounter_queue.submit(Encounter(place='city'))
+
+    assert encounter_queue.stats()['rejected'] == 2
+
+
+def test_queue_is_measured():
+    def sample(name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    before = {outcome: sample('pokemon_api_queued_encounters_total', outcome=outcome)
+              for outcome in ('accepted', 'rejected', 'written', 'failed')}
+    depth = sample('pokemon_api_encounter_queue_depth')
+    release = threading.Event()
+    encounter_queue = EncounterQueue(writer=lambda batch: release.wait() and [dict(index=0)], maxsize=1)
+
+    encounter_queue.submit(Encounter(place='city'))
+    while encounter_queue.stats()['depth']:  # waiting until the worker takes it
+        time.sleep(0.01)
+    encounter_queue.submit(Encounter(place='city'))
+    with pytest.raises(EncounterQueueFull):
+        encounter_queue.submit(Encounter(place='city'))
+
+    assert sample('pokemon_api_encounter_queue_depth') == depth + 1
+
+    release.set()
+    encounter_queue.close()
+
+    assert sample('pokemon_api_encounter_queue_depth') == depth
+    assert {outcome: sample('pokemon_api_queued_encounters_total', outcome=outcome) - count
+            for outcome, count in before.items()} == dict(accepted=2, rejected=1, written=0, failed=2)
+
+
+def test_post_encounter_in_write_behind_mode(write_behind_app):
+    client = write_behind_app.test_client()
+
+    responses = [client.post('/pokemon/23/encounters', json={"place": "city"}) for _ in range(5)]
+    assert {response.status_code for response in responses} == {202}
+
+    PokemonService.encounter_queue.close()
+
+    assert Encounter.objects(pokemon_id=23).count() == 5
+    assert Pokemon.objects(id=23).first().encounter_count == 5
+    assert PokemonService.encounter_queue.stats()['written'] == 5
+
+
+def test_post_invalid_encounter_in_write_behind_mode(write_behind_app):
+    response = write_behind_app.test_client().post('/pokemon/23/encounters', json={"place": 20})
+
+    assert response.status_code == 400
+    assert PokemonService.encounter_queue.stats()['accepted'] == 0
+
+
+def test_post_encounter_when_queue_is_full(write_behind_app, monkeypatch):
+    monkeypatch.setattr(PokemonService.encounter_queue, '_closed', True)
+
+    response = write_behind_app.test_client().post('/pokemon/23/encounters', json={"place": "city"})
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'